@@ -0,0 +1,64 @@
+"""Benchmarks for hsntools.io."""
+
+import os
+import shutil
+import tempfile
+
+from hsntools.io.sorting import save_units, load_units
+from hsntools.io.collections import load_jsons_to_df
+
+from .generators import make_units, make_json_folder
+
+###################################################################################################
+###################################################################################################
+
+class UnitsSuite():
+    """Benchmarks for saving and loading units files."""
+
+    # Sizes are given as (n_units, n_spikes) cases, as asv runs all combinations of parameters
+    #   The large case is capped to keep the waveforms of all units within ~1 GB of memory
+    params = [[(10, 100), (300, 10_000)], [None, 'int16']]
+    param_names = ['size', 'waveform_dtype']
+    timeout = 300
+
+    def setup(self, size, waveform_dtype):
+        n_units, n_spikes = size
+        self.units = make_units(n_units, n_spikes)
+        self.folder = tempfile.mkdtemp()
+        self.load_folder = tempfile.mkdtemp()
+        save_units(self.units, self.load_folder, waveform_dtype=waveform_dtype)
+
+    def teardown(self, size, waveform_dtype):
+        shutil.rmtree(self.folder)
+        shutil.rmtree(self.load_folder)
+
+    def time_save_units(self, size, waveform_dtype):
+        save_units(self.units, self.folder, waveform_dtype=waveform_dtype)
+
+    def time_load_units(self, size, waveform_dtype):
+        load_units(self.load_folder)
+
+    def track_units_size(self, size, waveform_dtype):
+        return sum(os.path.getsize(os.path.join(self.load_folder, file_name)) \
+            for file_name in os.listdir(self.load_folder))
+
+
+class JSONCollectionSuite():
+    """Benchmarks for loading collections of JSON files."""
+
+    params = [100, 10_000]
+    param_names = ['n_files']
+    timeout = 300
+
+    def setup(self, n_files):
+        self.folder = tempfile.mkdtemp()
+        make_json_folder(self.folder, n_files)
+
+    def teardown(self, n_files):
+        shutil.rmtree(self.folder)
+
+    def time_load_jsons_to_df(self, n_files):
+        load_jsons_to_df(self.folder)
+
+    def time_load_jsons_to_df_threaded(self, n_files):
+        load_jsons_to_df(self.folder, n_jobs=8)
@@ -0,0 +1,28 @@
+"""Benchmarks for hsntools.objects."""
+
+import numpy as np
+
+from hsntools.objects.task import TaskBase
+
+###################################################################################################
+###################################################################################################
+
+class TaskSuite():
+    """Benchmarks for the task object."""
+
+    params = [1_000, 100_000]
+    param_names = ['n_trials']
+
+    def setup(self, n_trials):
+        self.task = TaskBase()
+        self.task.session['start_time'] = 10
+        self.task.position['time'] = np.arange(n_trials * 10, dtype=float)
+        self.task.trial['start_time'] = np.arange(n_trials, dtype=float)
+        self.task.trial['stop_time'] = np.arange(n_trials, dtype=float) + 0.5
+        self.task.trial['events'] = {'event_time' : np.arange(n_trials, dtype=float)}
+
+    def time_update_time_offset(self, n_trials):
+        self.task.update_time('offset', offset=10)
+
+    def time_update_time_predict(self, n_trials):
+        self.task.update_time('predict_times', intercept=10, coef=1.0001)
@@ -0,0 +1,66 @@
+"""Benchmarks for hsntools.sorting."""
+
+from hsntools.sorting.utils import get_group_labels, extract_clusters, concatenate_units
+from hsntools.sorting.process import collect_all_sorting
+from hsntools.sorting.metrics import compute_unit_metrics
+from hsntools.sorting.correlograms import compute_unit_correlograms
+
+from .generators import make_spike_data, make_sort_data, make_units
+
+###################################################################################################
+###################################################################################################
+
+class SortingSuite():
+    """Benchmarks for processing spike sorting outputs."""
+
+    params = [10_000, 1_000_000]
+    param_names = ['n_spikes']
+    timeout = 300
+
+    def setup(self, n_spikes):
+        self.spike_data = make_spike_data(n_spikes)
+        self.sort_data = make_sort_data(self.spike_data)
+        self.clusters = collect_all_sorting(self.spike_data, self.sort_data)
+
+    def time_get_group_labels(self, n_spikes):
+        get_group_labels(self.sort_data['classes'], self.sort_data['groups'])
+
+    def time_collect_all_sorting(self, n_spikes):
+        collect_all_sorting(self.spike_data, self.sort_data)
+
+    def peakmem_collect_all_sorting(self, n_spikes):
+        collect_all_sorting(self.spike_data, self.sort_data)
+
+    def time_extract_clusters(self, n_spikes):
+        extract_clusters(self.clusters)
+
+
+class MetricsSuite():
+    """Benchmarks for computing unit quality metrics."""
+
+    params = [10, 200]
+    param_names = ['n_units']
+    timeout = 300
+
+    def setup(self, n_units):
+        self.units = concatenate_units(make_units(n_units, 5_000))
+
+    def time_compute_unit_metrics(self, n_units):
+        compute_unit_metrics(self.units['times'], self.units['index'], self.units['waveforms'])
+
+    def peakmem_compute_unit_metrics(self, n_units):
+        compute_unit_metrics(self.units['times'], self.units['index'], self.units['waveforms'])
+
+
+class CorrelogramsSuite():
+    """Benchmarks for computing unit correlograms."""
+
+    params = [10, 50]
+    param_names = ['n_units']
+    timeout = 300
+
+    def setup(self, n_units):
+        self.units = make_units(n_units, 20_000)
+
+    def time_compute_unit_correlograms(self, n_units):
+        compute_unit_correlograms(self.units, bin_size=1., window=50., fs=32)
@@ -0,0 +1,41 @@
+"""Benchmarks for hsntools.timestamps."""
+
+import numpy as np
+
+from hsntools.timestamps.align import match_pulses, fit_sync_alignment
+from hsntools.timestamps.peaks import detect_peaks
+
+from .generators import make_sync_pulses
+
+###################################################################################################
+###################################################################################################
+
+class AlignSuite():
+    """Benchmarks for aligning synchronization pulses."""
+
+    params = [100, 5_000]
+    param_names = ['n_pulses']
+
+    def setup(self, n_pulses):
+        self.sync_behav, self.sync_neural = make_sync_pulses(n_pulses)
+
+    def time_match_pulses(self, n_pulses):
+        match_pulses(self.sync_behav, self.sync_behav[5:], n_pulses // 2)
+
+    def time_fit_sync_alignment(self, n_pulses):
+        fit_sync_alignment(self.sync_behav, self.sync_neural)
+
+
+class PeaksSuite():
+    """Benchmarks for detecting peaks."""
+
+    params = [10 ** 5, 10 ** 7]
+    param_names = ['n_samples']
+
+    def setup(self, n_samples):
+        rng = np.random.default_rng(0)
+        self.data = rng.standard_normal(n_samples)
+        self.data[::1000] = 10
+
+    def time_detect_peaks(self, n_samples):
+        detect_peaks(self.data, 30000, height=5, distance=500)
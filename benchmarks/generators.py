@@ -0,0 +1,80 @@
+"""Synthetic data generators for benchmarks."""
+
+import os
+import json
+
+import numpy as np
+
+###################################################################################################
+###################################################################################################
+
+def make_spike_data(n_spikes, n_samples=64, artifact_rate=0.05, seed=0):
+    """Make a synthetic spike data file output, as from `load_combinato_spike_file`."""
+
+    rng = np.random.default_rng(seed)
+
+    return {
+        'channel' : '1',
+        'polarity' : 'neg',
+        'times' : np.sort(rng.uniform(0, 3600 * 1000, n_spikes)),
+        'waveforms' : rng.standard_normal([n_spikes, n_samples]).astype(np.float32),
+        'artifacts' : (rng.random(n_spikes) < artifact_rate).astype(int),
+    }
+
+
+def make_sort_data(spike_data, n_classes=50, n_groups=10, seed=0):
+    """Make a synthetic sorting file output, as from `load_combinato_sorting_file`."""
+
+    rng = np.random.default_rng(seed)
+
+    index = np.where(spike_data['artifacts'] == 0)[0]
+    groups = np.stack([np.arange(n_classes), rng.integers(-1, n_groups, n_classes)], axis=1)
+
+    return {
+        'channel' : spike_data['channel'],
+        'polarity' : spike_data['polarity'],
+        'groups' : groups,
+        'index' : index,
+        'classes' : rng.integers(0, n_classes, len(index)),
+    }
+
+
+def make_units(n_units, n_spikes, n_samples=64, seed=0):
+    """Make a list of synthetic units, as from `extract_clusters`."""
+
+    rng = np.random.default_rng(seed)
+
+    units = []
+    for ind in range(n_units):
+        units.append({
+            'ind' : ind,
+            'channel' : 'chan_{}'.format(ind // 4),
+            'polarity' : 'neg',
+            'times' : np.sort(rng.uniform(0, 3600 * 1000, n_spikes)),
+            'waveforms' : rng.standard_normal([n_spikes, n_samples], dtype=np.float32),
+            'classes' : rng.integers(0, 10, n_spikes),
+        })
+
+    return units
+
+
+def make_sync_pulses(n_pulses, drift=1.0001, offset=12.5, seed=0):
+    """Make synthetic behavioral & neural synchronization pulses, with matched ISIs."""
+
+    rng = np.random.default_rng(seed)
+
+    isis = rng.integers(500, 1500, n_pulses).astype(float)
+    sync_behav = np.cumsum(isis)
+    sync_neural = sync_behav * drift + offset
+
+    return sync_behav, sync_neural
+
+
+def make_json_folder(folder, n_files, n_fields=20):
+    """Save out a folder of small JSON files."""
+
+    os.makedirs(folder, exist_ok=True)
+    for ind in range(n_files):
+        with open(os.path.join(folder, 'file_{}.json'.format(ind)), 'w') as json_file:
+            json.dump({'field_{}'.format(field) : ind * field for field in range(n_fields)},
+                      json_file)
@@ -0,0 +1,11 @@
+"""Run the hsntools command line interface, with `python -m hsntools`."""
+
+import sys
+
+from hsntools.run.cli import main
+
+###################################################################################################
+###################################################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
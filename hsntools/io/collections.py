@@ -1,18 +1,21 @@
 """File IO for loading collections of files together."""
 
+import os
+import json
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
 
-from hsntools.io.files import load_json
-from hsntools.io.utils import get_files
-from hsntools.modutils.dependencies import safe_import, check_dependency
+from hsntools.io.utils import get_files, check_ext, check_folder
+from hsntools.modutils.dependencies import lazy_import, check_dependency
 
-pd = safe_import('pandas')
+pd = lazy_import('pandas')
+orjson = lazy_import('orjson')
 
 ###################################################################################################
 ###################################################################################################
 
 @check_dependency(pd, 'pandas')
-def load_jsons_to_df(files, folder=None):
+def load_jsons_to_df(files, folder=None, n_jobs=1, cache_file=None, fast_json=True):
     """Load a collection of JSON files into a dataframe.
 
     Parameters
@@ -23,18 +26,112 @@ def load_jsons_to_df(files, folder=None):
     folder : str or Path, optional
         Folder location to load the files from.
         Only used if `files` is a list of str.
+    n_jobs : int, optional, default: 1
+        Number of threads to use to load the files.
+    cache_file : str or Path, optional
+        File path for a consolidated snapshot of the loaded data.
+        If provided, files that are unchanged since the snapshot are loaded from the snapshot,
+        and only new or changed files are parsed, after which the snapshot is updated.
+        The snapshot format is set by the extension: '.parquet', '.feather' or '.pkl'.
+    fast_json : bool, optional, default: True
+        Whether to use the `orjson` module to parse files, if it is available.
+        Files that `orjson` can not parse, such as files with NaN values, are parsed with `json`.
 
     Returns
     -------
     df : pd.DataFrame
         A dataframe containing the data from the JSON files.
+
+    Notes
+    -----
+    Parquet and feather snapshots require the `pyarrow` module.
+    The snapshot is keyed by file names and modification times, which are stored in a
+    sidecar '.meta' file next to the snapshot file.
     """
 
-    if isinstance(files, (str, pathlib.PosixPath)):
-        files = get_files(folder, select='json')
+    if isinstance(files, (str, pathlib.PurePath)):
+        folder = files
+        files = get_files(folder, pattern='*.json')
+
+    paths = [check_ext(check_folder(file, folder), '.json') for file in files]
+    mtimes = {path : os.stat(path).st_mtime_ns for path in paths}
+
+    cached = _load_snapshot(cache_file, mtimes) if cache_file else None
+    to_load = [path for path in paths if cached is None or path not in cached.index]
+
+    parser = _load_json_fast if fast_json and orjson else _load_json
+    if n_jobs > 1 and len(to_load) > 1:
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            file_data = list(executor.map(parser, to_load))
+    else:
+        file_data = [parser(path) for path in to_load]
 
-    file_data = [load_json(file, folder=folder) for file in files]
+    df = pd.DataFrame(file_data, index=to_load)
+    if cached is not None and len(cached):
+        df = pd.concat([cached, df]).reindex(paths) if len(df) else cached.reindex(paths)
 
-    df = pd.DataFrame(file_data)
+    if cache_file:
+        _save_snapshot(df, cache_file, mtimes)
+
+    df = df.reset_index(drop=True)
 
     return df
+
+
+def _load_json(file_path):
+    """Load a JSON file - standard library version."""
+
+    with open(file_path) as json_file:
+        data = json.load(json_file)
+
+    return data
+
+
+def _load_json_fast(file_path):
+    """Load a JSON file - orjson version, falling back to `json` for non-standard values."""
+
+    with open(file_path, 'rb') as json_file:
+        contents = json_file.read()
+
+    try:
+        data = orjson.loads(contents)
+    except orjson.JSONDecodeError:
+        data = json.loads(contents)
+
+    return data
+
+
+def _load_snapshot(cache_file, mtimes):
+    """Load the rows of a dataframe snapshot for files that are unchanged since it was saved."""
+
+    meta_file = str(cache_file) + '.meta'
+    if not (os.path.exists(cache_file) and os.path.exists(meta_file)):
+        return None
+
+    with open(meta_file) as meta:
+        cached_mtimes = json.load(meta)
+
+    ext = os.path.splitext(str(cache_file))[1]
+    loaders = {'.parquet' : pd.read_parquet, '.feather' : pd.read_feather}
+    snapshot = loaders.get(ext, pd.read_pickle)(cache_file).set_index('_file')
+
+    unchanged = [path for path, mtime in mtimes.items() if cached_mtimes.get(path) == mtime]
+
+    return snapshot.loc[snapshot.index.intersection(unchanged)]
+
+
+def _save_snapshot(df, cache_file, mtimes):
+    """Save out a dataframe snapshot, with the file modification times it reflects."""
+
+    snapshot = df.rename_axis('_file').reset_index()
+
+    ext = os.path.splitext(str(cache_file))[1]
+    if ext == '.parquet':
+        snapshot.to_parquet(cache_file)
+    elif ext == '.feather':
+        snapshot.to_feather(cache_file)
+    else:
+        snapshot.to_pickle(cache_file)
+
+    with open(str(cache_file) + '.meta', 'w') as meta:
+        json.dump(mtimes, meta)
@@ -1,17 +1,26 @@
 """File I/O for basic file types."""
 
+import os
 import json
+import hashlib
 
-from hsntools.io.utils import check_ext, check_folder
-from hsntools.modutils.dependencies import safe_import, check_dependency
+import numpy as np
 
-sio = safe_import('.io', 'scipy')
-pd = safe_import('pandas')
-mat73 = safe_import('mat73')
+from hsntools.io.h5 import access_h5file
+from hsntools.io.utils import check_ext, check_folder, hash_file
+from hsntools.modutils.dependencies import lazy_import, check_dependency
+
+sio = lazy_import('.io', 'scipy')
+pd = lazy_import('pandas')
+mat73 = lazy_import('mat73')
 
 ###################################################################################################
 ###################################################################################################
 
+# File name of the index of matfile cache files, stored in the cache folder
+MATFILE_CACHE_INDEX = 'matfile_cache_index.json'
+
+
 def save_txt(text, file_name, folder=None):
     """Save out text to a txt file.
 
@@ -90,7 +99,7 @@ def load_json(file_name, folder=None):
     return data
 
 
-def save_jsonlines(data, file_name, folder=None):
+def save_jsonlines(data, file_name, folder=None, index=False):
     """Save out data to a JSONlines file.
 
     Parameters
@@ -101,12 +110,28 @@ def save_jsonlines(data, file_name, folder=None):
         File name to give the saved out json file.
     folder : str or Path, optional
         Folder to save out to.
+    index : bool, optional, default: False
+        Whether to update the sidecar offset index of the file with the appended entries.
+
+    Notes
+    -----
+    Data is appended to the file, if it already exists.
+    If `index` is True, the index is stored in a sidecar file with an added '.idx' extension.
     """
 
-    with open(check_ext(check_folder(file_name, folder), '.json'), 'a') as jsonlines_file:
+    file_path = check_ext(check_folder(file_name, folder), '.json')
+    offsets = _load_jsonlines_index(file_path) if index else None
+
+    with open(file_path, 'ab') as jsonlines_file:
         for cur_data in data:
-            json.dump(cur_data, jsonlines_file)
-            jsonlines_file.write('\n')
+            if index:
+                offsets['offsets'][list(cur_data.keys())[0]] = jsonlines_file.tell()
+            jsonlines_file.write(json.dumps(cur_data).encode() + b'\n')
+        size = jsonlines_file.tell()
+
+    if index:
+        offsets.update(_get_jsonlines_state(file_path, size))
+        _save_jsonlines_index(offsets, file_path)
 
 
 def load_jsonlines(file_name, folder=None):
@@ -125,14 +150,153 @@ def load_jsonlines(file_name, folder=None):
         Loaded data from the JSONlines file.
     """
 
-    all_data = {}
-    with open(check_ext(check_folder(file_name, folder), '.json'), 'r') as jsonlines_file:
+    return dict(iter_jsonlines(file_name, folder))
+
+
+def iter_jsonlines(file_name, folder=None):
+    """Iterate across the entries of a JSON lines file, without loading the whole file.
+
+    Parameters
+    ----------
+    file_name : str
+        File name of the file to load.
+    folder : str or Path, optional
+        Folder to load from.
+
+    Yields
+    ------
+    key : str
+        The key of the current entry.
+    value
+        The data of the current entry.
+    """
+
+    with open(check_ext(check_folder(file_name, folder), '.json'), 'rb') as jsonlines_file:
         for line in jsonlines_file:
-            line_data = json.loads(line)
-            key = list(line_data.keys())[0]
-            all_data[key] = line_data[key]
+            if line.strip():
+                line_data = json.loads(line)
+                key = list(line_data.keys())[0]
+                yield key, line_data[key]
+
+
+def index_jsonlines(file_name, folder=None):
+    """Create or update the sidecar offset index for a JSON lines file.
+
+    Parameters
+    ----------
+    file_name : str
+        File name of the file to index.
+    folder : str or Path, optional
+        Folder of the file.
+
+    Returns
+    -------
+    offsets : dict
+        Mapping of each key in the file to the byte offset of its line.
+
+    Notes
+    -----
+    If an index already exists, only lines appended since it was last updated are scanned.
+    """
+
+    file_path = check_ext(check_folder(file_name, folder), '.json')
+    offsets = _load_jsonlines_index(file_path)
+
+    return offsets['offsets']
+
+
+def load_jsonlines_key(key, file_name, folder=None):
+    """Load a single entry from a JSON lines file, using the sidecar offset index.
+
+    Parameters
+    ----------
+    key : str
+        The key of the entry to load.
+    file_name : str
+        File name of the file to load.
+    folder : str or Path, optional
+        Folder to load from.
+
+    Returns
+    -------
+    data
+        Loaded data for the requested key.
+
+    Raises
+    ------
+    KeyError
+        If the requested key is not in the file.
+
+    Notes
+    -----
+    If the index is missing or out of date, it is created or updated before loading.
+    """
+
+    file_path = check_ext(check_folder(file_name, folder), '.json')
+    offsets = _load_jsonlines_index(file_path)
+
+    with open(file_path, 'rb') as jsonlines_file:
+        jsonlines_file.seek(offsets['offsets'][key])
+        data = json.loads(jsonlines_file.readline())[key]
+
+    return data
+
+
+def _load_jsonlines_index(file_path):
+    """Load the offset index for a JSON lines file, updating and saving it for unindexed lines."""
+
+    empty = {'size' : 0, 'mtime' : None, 'check' : None, 'offsets' : {}}
+    offsets = empty
+    if os.path.exists(file_path + '.idx'):
+        with open(file_path + '.idx') as index_file:
+            offsets = {**empty, **json.load(index_file)}
+
+    if not os.path.exists(file_path):
+        return offsets
+
+    # If the file has been changed, other than by appending, re-index from the start
+    #   Appends are detected as a larger file, for which the indexed region is unchanged
+    stat = os.stat(file_path)
+    if stat.st_mtime_ns != offsets['mtime']:
+        if stat.st_size <= offsets['size'] or \
+            _get_jsonlines_state(file_path, offsets['size'])['check'] != offsets['check']:
+            offsets = {**empty, 'offsets' : {}}
+
+    if stat.st_size > offsets['size'] or stat.st_mtime_ns != offsets['mtime']:
+        with open(file_path, 'rb') as jsonlines_file:
+            jsonlines_file.seek(offsets['size'])
+            position = offsets['size']
+            for line in jsonlines_file:
+                if line.strip():
+                    offsets['offsets'][list(json.loads(line).keys())[0]] = position
+                position += len(line)
+        offsets.update(_get_jsonlines_state(file_path, position))
+        _save_jsonlines_index(offsets, file_path)
 
-    return all_data
+    return offsets
+
+
+def _get_jsonlines_state(file_path, size, n_bytes=4096):
+    """Get the state of a JSON lines file, to check whether its indexed region has changed.
+
+    The state includes the indexed size, the modification time, and a hash of the start and
+    end of the indexed region of the file.
+    """
+
+    with open(file_path, 'rb') as jsonlines_file:
+        head = jsonlines_file.read(min(n_bytes, size))
+        jsonlines_file.seek(max(size - n_bytes, 0))
+        tail = jsonlines_file.read(size - max(size - n_bytes, 0))
+
+    return {'size' : size, 'mtime' : os.stat(file_path).st_mtime_ns,
+            'check' : hashlib.sha1(head + tail).hexdigest()}
+
+
+def _save_jsonlines_index(offsets, file_path):
+    """Save out the offset index for a JSON lines file."""
+
+    with open(file_path + '.idx', 'w') as index_file:
+        json.dump(offsets, index_file)
 
 
 @check_dependency(pd, 'pandas')
@@ -156,7 +320,8 @@ def load_excel(file_name, folder, sheet=0):
                          engine='openpyxl', sheet_name=sheet)
 
 
-def load_matfile(file_name, folder=None, version=None, **kwargs):
+def load_matfile(file_name, folder=None, version=None, variables=None, lazy=False,
+                 cache_folder=None, **kwargs):
     """Load a .mat file.
 
     Parameters
@@ -169,14 +334,35 @@ def load_matfile(file_name, folder=None, version=None, **kwargs):
         Which matfile load function to use:
             'scipy' : uses `scipy.io.loadmat`, works for matfiles older than v7.3
             'mat73' : uses `mat73.loadmat`, works for matfile v7.3 files
-        If not specified, tries both.
+        If not specified, this is set based on the version in the file header.
+    variables : str or list of str, optional
+        Name(s) of the variable(s) to load. If not specified, all variables are loaded.
+    lazy : bool, optional, default: False
+        Whether to return lazy, h5py based, access to the file. Only available for v7.3 files.
+    cache_folder : str or Path, optional
+        Folder to cache loaded data to. If provided, loaded data is saved to an NPZ file,
+        keyed by a hash of the file and load options, which is loaded instead of the matfile
+        on subsequent loads.
     **kwargs
         Additional keywork arguments to pass into to matfile load function.
 
     Returns
     -------
-    dict
+    dict or h5py.File
         Loaded data from the matfile.
+        If `lazy` is True, an open h5py.File object, which should be closed after use.
+
+    Notes
+    -----
+    Loading from the cache returns the same keys, values and types as the original load.
+    Arrays are stored natively in the cache file, and other values, such as strings, lists
+    and nested dictionaries, are stored as JSON, so loading the cache does not unpickle data.
+    Data that includes object arrays, such as cell arrays loaded by scipy, is not cached.
+    Cache files in an older format are replaced.
+
+    To avoid re-hashing unchanged files, the cache folder keeps an index of the cache file
+    name for each file and set of load options, which is re-used if the size and modification
+    time of the file are unchanged.
     """
 
     loaders = {
@@ -185,25 +371,166 @@ def load_matfile(file_name, folder=None, version=None, **kwargs):
     }
 
     file_path = check_ext(check_folder(file_name, folder), '.mat')
+    variables = [variables] if isinstance(variables, str) else variables
+
+    if not version:
+        version = 'mat73' if get_matfile_version(file_path) == '7.3' else 'scipy'
+
+    if lazy:
+        if version != 'mat73':
+            raise ValueError('Lazy loading is only available for v7.3 matfiles.')
+        return access_h5file(file_path, ext='.mat')
+
+    if cache_folder:
+        cache_file = os.path.join(cache_folder,
+                                  _get_matfile_cache_name(file_path, variables, kwargs,
+                                                          cache_folder))
+        if os.path.exists(cache_file):
+            data = _load_matfile_cache(cache_file)
+            if data is not None:
+                return data
+
+    data = loaders[version](file_path, variables, **kwargs)
+
+    if cache_folder:
+        _save_matfile_cache(data, cache_file)
+
+    return data
+
+
+def get_matfile_version(file_name, folder=None):
+    """Get the version of a .mat file, based on the file header.
+
+    Parameters
+    ----------
+    file_name : str
+        File name of the file to check.
+    folder : str or Path, optional
+        Folder of the file.
+
+    Returns
+    -------
+    version : {'4', '5', '7.3'}
+        The matfile version.
+
+    Notes
+    -----
+    Version 5 header files include matfile versions 5 - 7.
+    Files with no text header are considered version 4 files.
+    """
 
-    if version:
-        return loaders[version](file_path, **kwargs)
+    with open(check_ext(check_folder(file_name, folder), '.mat'), 'rb') as mat_file:
+        header = mat_file.read(128)
+
+    if header.startswith(b'MATLAB 7.3'):
+        version = '7.3'
+    elif header.startswith(b'MATLAB'):
+        version = '5'
     else:
-        try:
-            _load_matfile_scipy(file_path, **kwargs)
-        except NotImplementedError:
-            return _load_matfile73(file_path, **kwargs)
+        version = '4'
+
+    return version
+
+
+def _get_matfile_cache_name(file_path, variables, kwargs, cache_folder):
+    """Get the cache file name for a matfile, based on a hash of the file & load options.
+
+    The hash is re-used from the cache index if the file size and modification time are
+    unchanged, and is otherwise computed and added to the index.
+    """
+
+    options = ''
+    if variables:
+        options += ','.join(sorted(variables))
+    if kwargs:
+        options += repr(sorted(kwargs.items()))
+
+    index_file = os.path.join(cache_folder, MATFILE_CACHE_INDEX)
+    index = load_json(index_file) if os.path.exists(index_file) else {}
+
+    key = os.path.realpath(file_path) + '::' + options
+    stat = os.stat(file_path)
+    record = index.get(key)
+    if record and record['size'] == stat.st_size and record['mtime'] == stat.st_mtime_ns:
+        return record['name']
+
+    name = hash_file(file_path, extra=options.encode()) + '.npz'
+    index[key] = {'size' : stat.st_size, 'mtime' : stat.st_mtime_ns, 'name' : name}
+    save_json(index, index_file)
+
+    return name
+
+
+def _save_matfile_cache(data, cache_file):
+    """Save loaded matfile data to a cache file, if it can be stored without pickling."""
+
+    arrays = {}
+    try:
+        structure = _encode_cache_value(data, arrays)
+    except TypeError:
+        return
+
+    np.savez(cache_file, __structure__=np.array(json.dumps(structure)), **arrays)
+
+
+def _load_matfile_cache(cache_file):
+    """Load matfile data from a cache file, returning None if the cache is in an older format."""
+
+    with np.load(cache_file) as cached:
+        if '__structure__' not in cached.files:
+            return None
+        data = _decode_cache_value(json.loads(str(cached['__structure__'])), cached)
+
+    return data
+
+
+def _encode_cache_value(value, arrays):
+    """Encode a value for the cache, as a JSON-compatible structure, collecting any arrays."""
+
+    if isinstance(value, (np.ndarray, np.generic)):
+        if value.dtype.hasobject:
+            raise TypeError('Object arrays can not be cached.')
+        label = 'array_{}'.format(len(arrays))
+        arrays[label] = np.asarray(value)
+        return {'array' : label, 'scalar' : isinstance(value, np.generic)}
+    if isinstance(value, dict):
+        return {'dict' : [[key, _encode_cache_value(val, arrays)] for key, val in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return {type(value).__name__ : [_encode_cache_value(val, arrays) for val in value]}
+    if isinstance(value, bytes):
+        return {'bytes' : value.hex()}
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return {'value' : value}
+
+    raise TypeError('Values of type {} can not be cached.'.format(type(value)))
+
+
+def _decode_cache_value(structure, arrays):
+    """Decode a value from the cache, from its JSON-compatible structure and stored arrays."""
+
+    label, value = next(iter(structure.items()))
+    if label == 'array':
+        return arrays[value][()] if structure['scalar'] else arrays[value]
+    if label == 'dict':
+        return {key : _decode_cache_value(val, arrays) for key, val in value}
+    if label in ('list', 'tuple'):
+        values = [_decode_cache_value(val, arrays) for val in value]
+        return values if label == 'list' else tuple(values)
+    if label == 'bytes':
+        return bytes.fromhex(value)
+
+    return value
 
 
 @check_dependency(sio, 'scipy')
-def _load_matfile_scipy(file_path, **kwargs):
+def _load_matfile_scipy(file_path, variables=None, **kwargs):
     """Load matfile - scipy version."""
 
-    return sio.loadmat(file_path, **kwargs)
+    return sio.loadmat(file_path, variable_names=variables, **kwargs)
 
 
 @check_dependency(mat73, 'mat73')
-def _load_matfile73(file_path, **kwargs):
+def _load_matfile73(file_path, variables=None, **kwargs):
     """Load matfile - mat73 version."""
 
-    return mat73.loadmat(file_path, **kwargs)
+    return mat73.loadmat(file_path, only_include=variables, **kwargs)
@@ -6,9 +6,10 @@ Functionality in this file requires the `h5py` module: https://github.com/h5py/h
 from contextlib import contextmanager
 
 from hsntools.io.utils import check_ext, check_folder
-from hsntools.modutils.dependencies import safe_import, check_dependency
+from hsntools.modutils.instrument import instrument
+from hsntools.modutils.dependencies import lazy_import, check_dependency
 
-h5py = safe_import('h5py')
+h5py = lazy_import('h5py')
 
 ###################################################################################################
 ###################################################################################################
@@ -79,6 +80,7 @@ def open_h5file(file_name, folder=None, mode='r', ext='.h5', **kwargs):
         h5file.close()
 
 
+@instrument()
 @check_dependency(h5py, 'h5py')
 def save_to_h5file(data, file_name, folder=None, ext='.h5', **kwargs):
     """Save data to a HDF5 file.
@@ -104,6 +106,7 @@ def save_to_h5file(data, file_name, folder=None, ext='.h5', **kwargs):
             h5file.create_dataset(label, data=values)
 
 
+@instrument()
 @check_dependency(h5py, 'h5py')
 def load_from_h5file(fields, file_name, folder=None, ext='.h5', **kwargs):
     """Load one or more specified field(s) from a HDF5 file.
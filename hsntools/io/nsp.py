@@ -4,10 +4,10 @@ Functionality in this file requires the `neo` module: https://github.com/NeuralE
 """
 
 from hsntools.io.utils import check_folder
-from hsntools.modutils.dependencies import safe_import, check_dependency
+from hsntools.modutils.dependencies import lazy_import, check_dependency
 from hsntools.timestamps.utils import compute_sample_length
 
-neo = safe_import('neo')
+neo = lazy_import('neo')
 
 ###################################################################################################
 ###################################################################################################
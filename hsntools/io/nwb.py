@@ -1,17 +1,22 @@
-"""Helper utilities for validating NWB files.
+"""Helper utilities for creating, saving and validating NWB files.
 
 Functionality in this file requires the `pynwb` module:
 https://github.com/NeurodataWithoutBorders/pynwb
 """
 
+import numpy as np
+
 from hsntools.io.utils import check_ext, check_folder, make_session_name
-from hsntools.modutils.dependencies import safe_import, check_dependency
+from hsntools.modutils.instrument import instrument
+from hsntools.modutils.dependencies import lazy_import, check_dependency
 
-pynwb = safe_import('pynwb')
+pynwb = lazy_import('pynwb')
+hdmf_common = lazy_import('.common', 'hdmf')
 
 ###################################################################################################
 ###################################################################################################
 
+@instrument()
 @check_dependency(pynwb, 'pynwb')
 def save_nwbfile(nwbfile, file_name, folder=None):
     """Save out an NWB file.
@@ -32,6 +37,7 @@ def save_nwbfile(nwbfile, file_name, folder=None):
         io.write(nwbfile)
 
 
+@instrument()
 @check_dependency(pynwb, 'pynwb')
 def load_nwbfile(file_name, folder=None, return_io=False):
     """Load an NWB file.
@@ -67,6 +73,7 @@ def load_nwbfile(file_name, folder=None, return_io=False):
         return nwbfile
 
 
+@instrument()
 @check_dependency(pynwb, 'pynwb')
 def validate_nwbfile(file_name, folder=None, raise_error=True, verbose=False):
     """Validate a NWB file.
@@ -111,3 +118,157 @@ def validate_nwbfile(file_name, folder=None, raise_error=True, verbose=False):
         raise ValueError('There is an issue with the NWB file.')
 
     return errors if errors else None
+
+
+@instrument()
+@check_dependency(pynwb, 'pynwb')
+def add_units_bulk(nwbfile, times, index, waveforms=None, channels=None, electrodes=None,
+                   full_waveforms=False, chunks=True, compression=None, waveform_rate=None):
+    """Add a units table to an NWB file in bulk, from a ragged representation of spike times.
+
+    Parameters
+    ----------
+    nwbfile : pynwb.file.NWBFile
+        The NWB file object to add the units table to.
+    times : 1d array
+        Spike times of all units, concatenated across units.
+    index : 1d array
+        End position of each unit's spikes within `times`, with length of n_units.
+    waveforms : 2d array, optional
+        Spike waveforms, aligned to `times`, with shape [n_spikes, n_samples].
+        If provided, the mean and standard deviation waveform of each unit is added.
+    channels : 1d array, optional
+        Channel label of each unit, used to add electrode references for each unit.
+        Labels can be channel numbers, or strings such as `chan_12`.
+    electrodes : Electrodes, optional
+        Electrode definition, used to map each unit's channel to a row of the electrodes table.
+        If not provided, channel numbers are used directly as electrode table rows.
+    full_waveforms : bool, optional, default: False
+        Whether to also store the full set of individual spike waveforms.
+    chunks : bool or tuple, optional, default: True
+        Chunk setting for the spike time & waveform datasets. Passed into `H5DataIO`.
+    compression : str, optional
+        Compression filter for the spike time & waveform datasets. Passed into `H5DataIO`.
+    waveform_rate : float, optional
+        Sampling rate of the waveforms, in Hz.
+
+    Returns
+    -------
+    units : pynwb.misc.Units
+        The units table that was added to the NWB file.
+
+    Notes
+    -----
+    Constructing the table from full columns avoids the per-unit overhead of `add_unit`,
+    which becomes slow for sessions with many units and spikes.
+    The `index` follows the NWB convention for ragged arrays, as returned by
+    :func:`~hsntools.sorting.utils.concatenate_units`.
+    """
+
+    index = np.asarray(index, dtype=np.int64)
+    n_units = len(index)
+
+    if index.size and index[-1] != len(times):
+        raise ValueError('The index does not match the number of spike times.')
+
+    spike_times = hdmf_common.VectorData(\
+        name='spike_times', description='The spike times for each unit, in seconds.',
+        data=_wrap_data(np.asarray(times, dtype=np.float64), chunks, compression))
+    columns = [spike_times,
+               hdmf_common.VectorIndex(name='spike_times_index', data=index, target=spike_times)]
+
+    if channels is not None:
+
+        if nwbfile.electrodes is None:
+            raise ValueError('The NWB file needs an electrodes table to add electrode references.')
+
+        electrode_refs = hdmf_common.DynamicTableRegion(\
+            name='electrodes', description='The electrode each unit was recorded on.',
+            data=get_electrode_rows(channels, electrodes), table=nwbfile.electrodes)
+        columns.extend([electrode_refs, hdmf_common.VectorIndex(\
+            name='electrodes_index', data=np.arange(1, n_units + 1), target=electrode_refs)])
+
+    if waveforms is not None:
+
+        means, stds = _compute_waveform_stats(waveforms, index)
+        columns.append(hdmf_common.VectorData(\
+            name='waveform_mean', description='The mean waveform for each unit.', data=means))
+        columns.append(hdmf_common.VectorData(\
+            name='waveform_sd', description='The standard deviation of waveforms for each unit.',
+            data=stds))
+
+        if full_waveforms:
+            all_waveforms = hdmf_common.VectorData(\
+                name='waveforms', description='The individual spike waveforms for each unit.',
+                data=_wrap_data(waveforms, chunks, compression))
+            waveforms_index = hdmf_common.VectorIndex(\
+                name='waveforms_index', data=np.arange(1, len(waveforms) + 1, dtype=np.int64),
+                target=all_waveforms)
+            columns.extend([all_waveforms, waveforms_index, hdmf_common.VectorIndex(\
+                name='waveforms_index_index', data=index, target=waveforms_index)])
+
+    units = pynwb.misc.Units(\
+        name='units', description='Sorted single units.',
+        id=hdmf_common.ElementIdentifiers(name='id', data=np.arange(n_units)),
+        columns=columns, electrode_table=nwbfile.electrodes if channels is not None else None,
+        waveform_rate=waveform_rate)
+    nwbfile.units = units
+
+    return units
+
+
+def get_electrode_rows(channels, electrodes=None):
+    """Get the electrode table row for each of a set of channels.
+
+    Parameters
+    ----------
+    channels : 1d array or list
+        Channel labels. Can be channel numbers, or strings such as `chan_12`.
+    electrodes : Electrodes, optional
+        Electrode definition, used to map channels to electrode rows.
+        If not provided, or if no channel numbers are defined, channel numbers are used as rows.
+
+    Returns
+    -------
+    rows : 1d array
+        The row index of each channel in the electrodes table.
+    """
+
+    channels = np.array([int(str(chan).replace('chan_', '')) for chan in channels],
+                        dtype=np.int64)
+
+    if electrodes is None:
+        return channels
+
+    if set(electrodes.table['channel']) <= {None}:
+        return channels
+
+    rows = electrodes.get_rows(channels)
+
+    return rows
+
+
+def _compute_waveform_stats(waveforms, index):
+    """Compute the mean and standard deviation waveform for each unit of a ragged array."""
+
+    starts = np.concatenate([[0], index[:-1]]).astype(np.int64)
+    counts = index - starts
+    valid = counts > 0
+
+    means = np.full([len(index), waveforms.shape[1]], np.nan)
+    stds = np.full([len(index), waveforms.shape[1]], np.nan)
+    if np.any(valid):
+        waveforms = np.asarray(waveforms, dtype=np.float64)
+        sums = np.add.reduceat(waveforms, starts[valid], axis=0)
+        sums_sq = np.add.reduceat(waveforms ** 2, starts[valid], axis=0)
+        means[valid] = sums / counts[valid, None]
+        stds[valid] = np.sqrt(np.maximum(sums_sq / counts[valid, None] - means[valid] ** 2, 0))
+
+    return means, stds
+
+
+def _wrap_data(data, chunks, compression):
+    """Wrap data in a H5DataIO object, to set chunking and compression."""
+
+    return pynwb.H5DataIO(data, chunks=chunks, compression=compression) \
+        if chunks or compression else data
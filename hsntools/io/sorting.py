@@ -1,16 +1,23 @@
-"""File I/O functionality related to spike sorting / combinato files."""
+"""File I/O functionality related to spike sorting files, from combinato & kilosort."""
 
+import os
+import ast
+import csv
 from pathlib import Path
 
+import numpy as np
+
 from hsntools.io.utils import get_files
-from hsntools.io.h5 import open_h5file, save_to_h5file, load_from_h5file
+from hsntools.io.h5 import access_h5file, open_h5file, save_to_h5file
+from hsntools.modutils.instrument import instrument
 
 ###################################################################################################
 ###################################################################################################
 
 ## COMBINATO FILES
 
-def load_combinato_spike_file(channel, folder, polarity):
+@instrument()
+def load_combinato_spike_file(channel, folder, polarity, lazy_waveforms=False):
     """Load a spike detection output file from Combinato - files with the form `data_chan_XX.h5`.
 
     Parameters
@@ -21,6 +28,10 @@ def load_combinato_spike_file(channel, folder, polarity):
         The location of the path to load from.
     polarity : {'neg', 'pos'}
         Which polarity of detected spikes to load.
+    lazy_waveforms : bool, optional, default: False
+        Whether to return waveforms as the HDF5 dataset, rather than loading them into memory.
+        If True, the file is left open, and should be closed with
+        `outputs['waveforms'].file.close()`.
 
     Returns
     -------
@@ -60,21 +71,68 @@ def load_combinato_spike_file(channel, folder, polarity):
     (with corresponding information in `sort_cat` files) is # spike_times - # artifacts.
     """
 
-    channel = str(channel)
-    channel = channel[5:] if channel[:5] == 'chan_' else channel
-    channel_folder = 'chan_' + channel
+    channel, h5file = _access_combinato_spike_file(channel, folder)
 
-    outputs = {}
-    with open_h5file('data_' + channel_folder, Path(folder) / channel_folder, ext='.h5') as h5file:
-        outputs['channel'] = channel
-        outputs['polarity'] = polarity
-        outputs['times'] = h5file[polarity]['times'][:]
-        outputs['waveforms'] = h5file[polarity]['spikes'][:]
-        outputs['artifacts'] = h5file[polarity]['artifacts'][:]
+    try:
+        outputs = _read_spike_polarity(h5file, channel, polarity, lazy_waveforms)
+    finally:
+        if not lazy_waveforms:
+            h5file.close()
+
+    return outputs
+
+
+@instrument()
+def load_combinato_spike_data(channel, folder, polarities=('neg', 'pos'), lazy_waveforms=False):
+    """Load all polarities and threshold information from a combinato spike data file.
+
+    Parameters
+    ----------
+    channel : int or str
+        The channel number / label of the file to load.
+    folder : str or Path
+        The location of the path to load from.
+    polarities : list of {'neg', 'pos'}, optional
+        Which polarities of detected spikes to load. Polarities not in the file are skipped.
+    lazy_waveforms : bool, optional, default: False
+        Whether to return waveforms as the HDF5 dataset, rather than loading them into memory.
+        If True, and any polarity is loaded, the file is left open, and should be closed with
+        `outputs[polarity]['waveforms'].file.close()`.
+
+    Returns
+    -------
+    outputs : dict
+        Extracted outputs from the data file, including:
+
+        * `channel`: stores the channel number / label.
+        * `thr`: the detection threshold information, or None if not in the file.
+        * `neg` / `pos`: the data for each polarity, as returned by `load_combinato_spike_file`.
+
+    Notes
+    -----
+    The file is opened once, to load all polarities, rather than once per polarity.
+    """
+
+    channel, h5file = _access_combinato_spike_file(channel, folder)
+
+    loaded = False
+    try:
+        outputs = {'channel' : channel, 'thr' : h5file['thr'][:] if 'thr' in h5file else None}
+        for polarity in polarities:
+            if polarity in h5file:
+                outputs[polarity] = _read_spike_polarity(h5file, channel, polarity, lazy_waveforms)
+                loaded = True
+    except:
+        loaded = False
+        raise
+    finally:
+        if not (lazy_waveforms and loaded):
+            h5file.close()
 
     return outputs
 
 
+@instrument()
 def load_combinato_sorting_file(channel, folder, polarity, user):
     """Load a combinato sorting output file - files with the file name `sort_cat.h5`.
 
@@ -129,9 +187,310 @@ def load_combinato_sorting_file(channel, folder, polarity, user):
     return outputs
 
 
+def scan_combinato_folder(folder, counts=True):
+    """Scan a combinato output folder, to get an inventory of channels and sorting outputs.
+
+    Parameters
+    ----------
+    folder : str or Path
+        The combinato output folder, which contains a `chan_XX` folder per channel.
+    counts : bool, optional, default: True
+        Whether to get the number of detected and sorted spikes, from the HDF5 files.
+        Counts are read from dataset shapes, without loading the data.
+
+    Returns
+    -------
+    inventory : dict
+        A table, with a list of values for each channel, polarity and user, including:
+
+        * `channel`: the channel label, as 'chan_XX'.
+        * `polarity`: the polarity of the sorting, or None for a channel with no sortings.
+        * `user`: the user label of the sorting, or None for a channel with no sortings.
+        * `data_size`, `sort_size`: the size, in bytes, of the spike data & sorting files.
+        * `n_spikes`: the number of detected spikes, for the polarity, or across all
+          polarities for a channel with no sortings. None if `counts` is False.
+        * `n_sorted`: the number of spikes in the sorting. None if `counts` is False.
+
+    Notes
+    -----
+    The folder is scanned with a single `os.scandir` pass per folder level.
+    Sorting folders are expected to be named as 'sort_POLARITY_USER', and any other folders
+    are skipped. Missing files have a size of 0, and spike counts of None.
+    Rows are sorted by channel, but can be re-ordered, for example to schedule the
+    largest channels first, by sorting on `n_spikes` or `data_size`.
+    """
+
+    fields = ['channel', 'polarity', 'user', 'data_size', 'sort_size', 'n_spikes', 'n_sorted']
+    inventory = {field : [] for field in fields}
+
+    with os.scandir(folder) as scan:
+        channels = sorted((entry.name, entry.path) for entry in scan \
+            if entry.is_dir() and entry.name.startswith('chan_'))
+
+    for channel, channel_path in channels:
+
+        data_size, sortings = 0, []
+        with os.scandir(channel_path) as scan:
+            for entry in scan:
+                if entry.name == 'data_' + channel + '.h5' and entry.is_file():
+                    data_size = entry.stat().st_size
+                elif entry.name.startswith('sort_') and entry.is_dir():
+                    labels = entry.name.split('_', 2)
+                    if len(labels) != 3 or labels[1] not in ('neg', 'pos') or not labels[2]:
+                        continue
+                    _, polarity, user = labels
+                    sort_file = os.path.join(entry.path, 'sort_cat.h5')
+                    sort_size = os.path.getsize(sort_file) if os.path.isfile(sort_file) else 0
+                    sortings.append((polarity, user, sort_file, sort_size))
+
+        spike_counts = {}
+        if counts and data_size:
+            with open_h5file('data_' + channel, channel_path) as h5file:
+                spike_counts = {polarity : h5file[polarity]['times'].shape[0] \
+                    for polarity in ['neg', 'pos'] if polarity in h5file}
+
+        if not sortings:
+            sortings = [(None, None, None, 0)]
+
+        for polarity, user, sort_file, sort_size in sorted(sortings, key=str):
+            n_sorted = None
+            if counts and sort_size:
+                with open_h5file(sort_file) as h5file:
+                    n_sorted = h5file['index'].shape[0]
+            n_spikes = spike_counts.get(polarity) if polarity else \
+                (sum(spike_counts.values()) if spike_counts else None)
+            for field, value in zip(fields, [channel, polarity, user, data_size, sort_size,
+                                             n_spikes, n_sorted]):
+                inventory[field].append(value)
+
+    return inventory
+
+
+def _access_combinato_spike_file(channel, folder):
+    """Access a combinato spike data file, returning the channel label and the open file."""
+
+    channel = str(channel)
+    channel = channel[5:] if channel[:5] == 'chan_' else channel
+    channel_folder = 'chan_' + channel
+
+    h5file = access_h5file('data_' + channel_folder, Path(folder) / channel_folder, ext='.h5')
+
+    return channel, h5file
+
+
+def _read_spike_polarity(h5file, channel, polarity, lazy_waveforms):
+    """Read the data for a polarity from an open combinato spike data file."""
+
+    outputs = {}
+    outputs['channel'] = channel
+    outputs['polarity'] = polarity
+    outputs['times'] = h5file[polarity]['times'][:]
+    outputs['waveforms'] = h5file[polarity]['spikes']
+    if not lazy_waveforms:
+        outputs['waveforms'] = outputs['waveforms'][:]
+    outputs['artifacts'] = h5file[polarity]['artifacts'][:]
+
+    return outputs
+
+
+## KILOSORT FILES
+
+def iter_kilosort_units(folder, groups=('good',), fs=None, chunk_size=1_000_000,
+                        batch_size=10_000_000):
+    """Iterate across units from a Kilosort / Phy output folder.
+
+    Parameters
+    ----------
+    folder : str or Path
+        The Kilosort / Phy output folder to load from.
+    groups : list of str, optional, default: ('good',)
+        Which cluster groups, as labeled in `cluster_group.tsv`, to load units for.
+        If None, units are loaded for all clusters.
+    fs : float, optional
+        The sampling rate of the recording, in Hz.
+        If not provided, is loaded from the `params.py` file of the output folder.
+    chunk_size : int, optional, default: 1_000_000
+        The number of spike cluster labels to read at a time, when finding the spikes of units.
+    batch_size : int, optional, default: 10_000_000
+        The maximum number of spikes, across a batch of units, to find the spikes for together,
+        unless a single unit has more spikes. Each batch takes one pass across the spike labels.
+
+    Yields
+    ------
+    unit : dict
+        Information for each unit, with the same fields as from `extract_clusters`:
+
+        * `ind`: the cluster index.
+        * `channel`: the peak channel of the unit's template.
+        * `polarity`: 'neg' or 'pos', based on the sign of the template peak.
+        * `times`: spike times, in milliseconds.
+        * `waveforms`: spike waveforms, as the template of each spike on the peak channel,
+          scaled by the spike amplitude, if `amplitudes.npy` is available.
+        * `classes`: the template index of each spike.
+
+    Notes
+    -----
+    - This loads from the files `spike_times.npy`, `spike_clusters.npy`, `spike_templates.npy`,
+      `templates.npy`, and, if available, `amplitudes.npy`, `channel_map.npy`, and
+      `cluster_group.tsv` (or `cluster_KSLabel.tsv`, if there is no curated group file).
+    - Arrays are memory-mapped, and units are loaded one at a time. The spike indices of units
+      are found in batches of units, with chunked passes across the spike cluster labels, so
+      memory use is set by `chunk_size` and `batch_size`, rather than the total number of
+      spikes. Units can be passed directly to `save_units`.
+    - Kilosort does not store individual spike waveforms, so waveforms are reconstructed from
+      the templates, and only reflect the template and amplitude of each spike.
+    """
+
+    folder = Path(folder)
+    fs = fs if fs else _load_kilosort_params(folder)['sample_rate']
+
+    spike_times = _load_kilosort_array(folder, 'spike_times')
+    spike_templates = _load_kilosort_array(folder, 'spike_templates')
+    spike_clusters = _load_kilosort_array(folder, 'spike_clusters') \
+        if (folder / 'spike_clusters.npy').exists() else spike_templates
+    amplitudes = _load_kilosort_array(folder, 'amplitudes') \
+        if (folder / 'amplitudes.npy').exists() else None
+    channel_map = _load_kilosort_array(folder, 'channel_map') \
+        if (folder / 'channel_map.npy').exists() else None
+    templates = np.load(folder / 'templates.npy', mmap_mode='r')
+    labels = _load_cluster_groups(folder)
+    if groups is not None and not labels:
+        raise ValueError('No cluster group file found - to load all clusters, set groups to None.')
+
+    # Count the spikes of each cluster, and select clusters in the requested groups
+    counts = np.zeros(0, dtype=np.int64)
+    for start in range(0, len(spike_clusters), chunk_size):
+        chunk_counts = np.bincount(spike_clusters[start:start + chunk_size])
+        counts = np.pad(counts, (0, max(len(chunk_counts) - len(counts), 0)))
+        counts[:len(chunk_counts)] += chunk_counts
+    clusters = [int(cluster) for cluster in np.flatnonzero(counts) \
+        if groups is None or labels.get(int(cluster)) in groups]
+
+    for cluster, inds in _iter_cluster_indices(spike_clusters, clusters, counts,
+                                               chunk_size, batch_size):
+
+        classes = np.asarray(spike_templates[inds])
+
+        # Get the peak channel & polarity from the most common template of the cluster
+        template = np.asarray(templates[np.bincount(classes).argmax()])
+        peak = int(np.ptp(template, axis=0).argmax())
+        polarity = 'neg' if -template[:, peak].min() >= template[:, peak].max() else 'pos'
+
+        waveforms = np.asarray(templates[:, :, peak][classes])
+        if amplitudes is not None:
+            waveforms = waveforms * amplitudes[inds][:, None]
+
+        yield {
+            'ind' : cluster,
+            'channel' : str(channel_map[peak] if channel_map is not None else peak),
+            'polarity' : polarity,
+            'times' : spike_times[inds].astype(np.float64) / fs * 1000,
+            'waveforms' : waveforms,
+            'classes' : classes,
+        }
+
+
+def load_kilosort_units(folder, groups=('good',), fs=None):
+    """Load units from a Kilosort / Phy output folder.
+
+    Parameters
+    ----------
+    folder : str or Path
+        The Kilosort / Phy output folder to load from.
+    groups : list of str, optional, default: ('good',)
+        Which cluster groups, as labeled in `cluster_group.tsv`, to load units for.
+        If None, units are loaded for all clusters.
+    fs : float, optional
+        The sampling rate of the recording, in Hz.
+        If not provided, is loaded from the `params.py` file of the output folder.
+
+    Returns
+    -------
+    units : list of dict
+        List of dictionaries containing information for each unit.
+        See `iter_kilosort_units` for details.
+    """
+
+    return list(iter_kilosort_units(folder, groups, fs))
+
+
+def _iter_cluster_indices(spike_clusters, clusters, counts, chunk_size, batch_size):
+    """Iterate across the spike indices of a set of clusters, finding them in batches."""
+
+    batches, batch, n_batch = [], [], 0
+    for cluster in clusters:
+        if batch and n_batch + counts[cluster] > batch_size:
+            batches.append(batch)
+            batch, n_batch = [], 0
+        batch.append(cluster)
+        n_batch += counts[cluster]
+    if batch:
+        batches.append(batch)
+
+    for batch in batches:
+
+        positions = np.full(len(counts), -1, dtype=np.int64)
+        positions[batch] = np.arange(len(batch))
+
+        # Collect the spike indices for the batch, grouped by cluster within each chunk
+        found = [[] for _ in batch]
+        for start in range(0, len(spike_clusters), chunk_size):
+            chunk_positions = positions[spike_clusters[start:start + chunk_size]]
+            inds = np.flatnonzero(chunk_positions >= 0)
+            chunk_positions = chunk_positions[inds]
+            order = np.argsort(chunk_positions, kind='stable')
+            splits = np.searchsorted(chunk_positions[order], np.arange(1, len(batch)))
+            for position, cluster_inds in enumerate(np.split(inds[order] + start, splits)):
+                if len(cluster_inds):
+                    found[position].append(cluster_inds)
+
+        for cluster, cluster_inds in zip(batch, found):
+            yield cluster, np.concatenate(cluster_inds)
+
+
+def _load_kilosort_array(folder, label):
+    """Load a per-spike (or per-channel) array from a Kilosort output folder, memory-mapped."""
+
+    array = np.load(Path(folder) / (label + '.npy'), mmap_mode='r')
+
+    return array.reshape(-1) if array.ndim > 1 else array
+
+
+def _load_kilosort_params(folder):
+    """Load the parameters from the `params.py` file of a Kilosort output folder."""
+
+    params = {}
+    with open(Path(folder) / 'params.py') as params_file:
+        for line in params_file:
+            if '=' in line:
+                key, value = line.split('=', 1)
+                try:
+                    params[key.strip()] = ast.literal_eval(value.strip())
+                except (ValueError, SyntaxError):
+                    params[key.strip()] = value.strip()
+
+    return params
+
+
+def _load_cluster_groups(folder):
+    """Load the cluster group labels from a Kilosort / Phy output folder."""
+
+    labels = {}
+    for file_name in ['cluster_group.tsv', 'cluster_KSLabel.tsv']:
+        if (Path(folder) / file_name).exists():
+            with open(Path(folder) / file_name, newline='') as groups_file:
+                reader = csv.reader(groups_file, delimiter='\t')
+                next(reader)
+                labels = {int(row[0]) : row[1] for row in reader if row}
+            break
+
+    return labels
+
+
 ## UNITS FILES
 
-def save_units(units, folder):
+@instrument()
+def save_units(units, folder, waveform_dtype=None, compression=None):
     """Save out units information.
 
     Parameters
@@ -140,14 +499,49 @@ def save_units(units, folder):
         List of dictionaries containing information for each unit.
     folder : str or Path
         Location to save files out to.
+    waveform_dtype : {None, 'int16', 'float16'}, optional
+        Data type to store waveforms as. If None, waveforms are stored as is.
+        If 'int16', waveforms are scaled to the int16 range, with a per-unit gain & offset.
+        If 'float16', waveforms are stored at half precision.
+    compression : {None, 'gzip', 'lzf'}, optional
+        Lossless compression to apply to stored waveforms.
+
+    Returns
+    -------
+    files : list of str
+        The file names of the saved units files.
+
+    Notes
+    -----
+    Units files are named as 'times_chan_XX_POLARITY_uIND.h5', where the polarity is dropped
+    for units with no polarity, so that units from each polarity of a channel are kept apart.
+
+    Quantized waveforms are stored with their original data type, and for 'int16', the gain
+    and offset, as attributes of the waveforms dataset, and are decoded by `load_units`.
+    Quantizing to 'int16' introduces an error of up to half the gain (the range of the unit's
+    waveform values divided by 65534). Compression does not change stored values.
     """
 
+    files = []
     for unit in units:
         add_channel = 'chan_' if 'chan' not in str(unit['channel']) else ''
-        file_name = 'times_{}{}_u{}'.format(add_channel, unit['channel'], unit['ind'])
-        save_to_h5file(unit, file_name, folder)
-
-
+        file_name = 'times_{}{}_{}u{}.h5'.format(add_channel, unit['channel'],
+                                                 _make_polarity_label(unit), unit['ind'])
+        if waveform_dtype is None and compression is None:
+            save_to_h5file(unit, file_name, folder)
+        else:
+            with open_h5file(file_name, folder, mode='w') as h5file:
+                for label, values in unit.items():
+                    if label == 'waveforms':
+                        _save_waveforms(h5file, values, waveform_dtype, compression)
+                    else:
+                        h5file.create_dataset(label, data=values)
+        files.append(file_name)
+
+    return files
+
+
+@instrument()
 def load_units(folder):
     """Load a set of units files from a folder.
 
@@ -161,6 +555,11 @@ def load_units(folder):
     -------
     units : list of dict
         List of dictionaries containing the loaded information for each unit.
+
+    Notes
+    -----
+    Waveforms stored with a quantized data type, from `save_units`, are decoded to their
+    original data type.
     """
 
     fields = ['ind', 'channel', 'polarity', 'times', 'waveforms', 'classes']
@@ -168,7 +567,10 @@ def load_units(folder):
     units = []
     unit_files = get_files(folder, select='times')
     for unit_file in unit_files:
-        units.append(load_from_h5file(fields, unit_file, folder))
+        with open_h5file(unit_file, folder) as h5file:
+            unit = {field : h5file[field][()] for field in fields}
+            unit['waveforms'] = _decode_waveforms(unit['waveforms'], h5file['waveforms'].attrs)
+        units.append(unit)
 
     # Check types, and decode any bytes elements to strings
     for unit in units:
@@ -177,3 +579,53 @@ def load_units(folder):
                 unit[key] = values.decode()
 
     return units
+
+
+def _make_polarity_label(unit):
+    """Make the polarity part of a units file name, which is empty if the unit has no polarity."""
+
+    polarity = unit.get('polarity')
+    if isinstance(polarity, bytes):
+        polarity = polarity.decode()
+
+    return polarity + '_' if polarity else ''
+
+
+def _save_waveforms(h5file, waveforms, waveform_dtype, compression):
+    """Save waveforms to an open HDF5 file, with optional quantization and compression."""
+
+    waveforms = np.asarray(waveforms)
+    attrs = {}
+
+    if waveform_dtype == 'int16':
+        lower, upper = (waveforms.min(), waveforms.max()) if waveforms.size else (0., 0.)
+        attrs['offset'] = (float(upper) + float(lower)) / 2
+        attrs['gain'] = (float(upper) - float(lower)) / (2 * 32767) or 1.
+        data = np.round((waveforms - attrs['offset']) / attrs['gain']).astype(np.int16)
+    elif waveform_dtype == 'float16':
+        data = waveforms.astype(np.float16)
+    elif waveform_dtype is None:
+        data = waveforms
+    else:
+        raise ValueError('Waveform data type {} not understood.'.format(waveform_dtype))
+
+    if waveform_dtype:
+        attrs['dtype'] = str(waveforms.dtype)
+
+    dataset = h5file.create_dataset('waveforms', data=data, compression=compression,
+                                    shuffle=bool(compression) and bool(data.size))
+    dataset.attrs.update(attrs)
+
+
+def _decode_waveforms(waveforms, attrs):
+    """Decode waveforms stored with a quantized data type, based on the dataset attributes."""
+
+    if 'dtype' not in attrs:
+        return waveforms
+
+    dtype = attrs['dtype'].decode() if isinstance(attrs['dtype'], bytes) else attrs['dtype']
+    waveforms = waveforms.astype(dtype)
+    if 'gain' in attrs:
+        waveforms = waveforms * attrs['gain'] + attrs['offset']
+
+    return waveforms.astype(dtype, copy=False)
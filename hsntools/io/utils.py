@@ -1,6 +1,11 @@
 """Utilities related to file I/O."""
 
 import os
+import fnmatch
+import hashlib
+
+# Cache of folder listings, as {folder : (modification time, entries)}
+_FOLDER_CACHE = {}
 
 ###################################################################################################
 ###################################################################################################
@@ -257,7 +262,36 @@ def missing_files(file_list, compare):
     return list(set(file_list) - set(compare))
 
 
-def get_files(folder, select=None, ignore=None, drop_hidden=True, sort=True, drop_extensions=False):
+def hash_file(file_name, folder=None, extra=None):
+    """Compute a hash of the contents of a file.
+
+    Parameters
+    ----------
+    file_name : str or Path
+        The name of the file to hash.
+    folder : str or Path, optional
+        Folder location of the file.
+    extra : bytes, optional
+        Additional data to add to the hash, after the file contents.
+
+    Returns
+    -------
+    str
+        The SHA-1 hash of the file contents, as a hex string.
+    """
+
+    file_hash = hashlib.sha1()
+    with open(check_folder(file_name, folder), 'rb') as hash_input:
+        for chunk in iter(lambda: hash_input.read(2 ** 20), b''):
+            file_hash.update(chunk)
+    if extra:
+        file_hash.update(extra)
+
+    return file_hash.hexdigest()
+
+
+def get_files(folder, select=None, ignore=None, drop_hidden=True, sort=True,
+              drop_extensions=False, pattern=None, cache=False):
     """Get a list of files from a specified folder.
 
     Parameters
@@ -274,6 +308,10 @@ def get_files(folder, select=None, ignore=None, drop_hidden=True, sort=True, dro
         Whether to sort the list of file names.
     drop_extensions : bool, optional, default: False
         Whether the drop the file extensions from the returned file list.
+    pattern : str or re.Pattern, optional
+        A glob pattern (if str) or compiled regular expression to use to select files.
+    cache : bool, optional, default: False
+        Whether to use a cached listing of the folder, which is re-scanned if the folder changes.
 
     Returns
     -------
@@ -281,19 +319,8 @@ def get_files(folder, select=None, ignore=None, drop_hidden=True, sort=True, dro
         A list of files from the folder.
     """
 
-    files = os.listdir(folder)
-
-    # If requested, drop any hidden files (leading .'s)
-    if drop_hidden:
-        files = drop_hidden_files(files)
-
-    # If requested, filter files to those that containing given search terms
-    if select:
-        files = select_files(files, select)
-
-    # If requested, filter files to ignore any containing given search terms
-    if ignore:
-        files = ignore_files(files, ignore)
+    files = [name for name, _ in scan_folder(folder, cache) \
+        if _check_name(name, select, ignore, drop_hidden, pattern)]
 
     # If requested, sort the list of files
     if sort:
@@ -305,13 +332,21 @@ def get_files(folder, select=None, ignore=None, drop_hidden=True, sort=True, dro
     return files
 
 
-def get_subfolders(folder, select=None, ignore=None):
+def get_subfolders(folder, select=None, ignore=None, pattern=None, cache=False):
     """Get a list of sub-folders from a given folder.
 
     Parameters
     ----------
     folder : str
         Name of the folder to get the list of sub-folders from.
+    select : str, optional
+        A search string to use to select sub-folders.
+    ignore : str, optional
+        A search string to use to drop sub-folders.
+    pattern : str or re.Pattern, optional
+        A glob pattern (if str) or compiled regular expression to use to select sub-folders.
+    cache : bool, optional, default: False
+        Whether to use a cached listing of the folder, which is re-scanned if the folder changes.
 
     Returns
     -------
@@ -319,14 +354,109 @@ def get_subfolders(folder, select=None, ignore=None):
         A list of sub-folders from the folder.
     """
 
-    subfolders = []
-    for entry in os.scandir(folder):
-        if entry.is_dir():
-            subfolders.append(entry.name)
+    return [name for name, is_dir in scan_folder(folder, cache) \
+        if is_dir and _check_name(name, select, ignore, False, pattern)]
+
+
+def scan_folder(folder, cache=False):
+    """Scan the contents of a folder.
+
+    Parameters
+    ----------
+    folder : str or Path
+        Name of the folder to scan.
+    cache : bool, optional, default: False
+        Whether to use a cached listing of the folder.
+        If True, the folder is only re-scanned if its modification time has changed.
+
+    Returns
+    -------
+    entries : list of tuple of (str, bool)
+        The name of each entry in the folder, and whether it is a directory.
+
+    Notes
+    -----
+    The cache is based on the folder modification time, which updates when entries are added,
+    removed or renamed, but not when the contents of files in the folder change.
+    Cached listings are keyed by the resolved path of the folder, so that relative and absolute
+    paths to the same folder share a listing.
+    """
+
+    folder = os.fspath(folder)
+
+    if cache:
+        key = os.path.realpath(folder)
+        mtime = os.stat(folder).st_mtime_ns
+        cached = _FOLDER_CACHE.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    with os.scandir(folder) as scan:
+        entries = [(entry.name, entry.is_dir()) for entry in scan]
 
-    if select:
-        subfolders = select_files(subfolders, select)
-    if ignore:
-        subfolders = ignore_files(subfolders, ignore)
+    if cache:
+        _FOLDER_CACHE[key] = (mtime, entries)
 
-    return subfolders
+    return entries
+
+
+def clear_folder_cache():
+    """Clear the cache of folder listings used by `scan_folder`."""
+
+    _FOLDER_CACHE.clear()
+
+
+def walk_files(folder, select=None, ignore=None, drop_hidden=True, pattern=None):
+    """Recursively walk across all files within a folder.
+
+    Parameters
+    ----------
+    folder : str or Path
+        Name of the folder to walk.
+    select : str, optional
+        A search string to use to select files.
+    ignore : str, optional
+        A search string to use to drop files and folders.
+    drop_hidden : bool, optional, default: True
+        Whether to drop hidden files and folders.
+    pattern : str or re.Pattern, optional
+        A glob pattern (if str) or compiled regular expression to use to select files.
+
+    Yields
+    ------
+    entry : os.DirEntry
+        Entry for each file, which includes the `path` and a `stat` method.
+
+    Notes
+    -----
+    Walking uses `os.scandir`, such that file type information, and on some platforms file
+    stat information, comes from the directory listing rather than requiring extra calls.
+    """
+
+    with os.scandir(folder) as scan:
+        entries = list(scan)
+
+    for entry in entries:
+        if (drop_hidden and entry.name[0] == '.') or (ignore and ignore in entry.name):
+            continue
+        if entry.is_dir():
+            yield from walk_files(entry.path, select, ignore, drop_hidden, pattern)
+        elif _check_name(entry.name, select, None, False, pattern):
+            yield entry
+
+
+def _check_name(name, select=None, ignore=None, drop_hidden=False, pattern=None):
+    """Check whether a file name passes all selection criteria."""
+
+    if drop_hidden and name[0] == '.':
+        return False
+    if select and select not in name:
+        return False
+    if ignore and ignore in name:
+        return False
+    if pattern is not None:
+        if isinstance(pattern, str):
+            return fnmatch.fnmatchcase(name, pattern)
+        return pattern.search(name) is not None
+
+    return True
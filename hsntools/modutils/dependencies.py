@@ -34,6 +34,97 @@ def safe_import(*args):
     return mod
 
 
+def lazy_import(*args):
+    """Define a module to be imported on first use, with a safety net for if it is not available.
+
+    Parameters
+    ----------
+    *args : str
+        Module to import.
+
+    Returns
+    -------
+    LazyModule
+        Proxy for the requested module, which imports the module when it is first used.
+
+    Notes
+    -----
+    The input, `*args`, is the same as for `safe_import`.
+
+    The returned proxy evaluates as True if the module can be imported, and False if not,
+    such that it can be used with `check_dependency` in the same way as `safe_import`.
+    Checking the proxy, or accessing any of its attributes, imports the module.
+    """
+
+    return LazyModule(*args)
+
+
+class LazyModule():
+    """Proxy for a module that is imported on first use.
+
+    Parameters
+    ----------
+    *args : str
+        Module to import, as pass through inputs to import_module.
+    """
+
+    def __init__(self, *args):
+        """Initialize LazyModule object."""
+
+        self._args = args
+        self._module = None
+        self._available = None
+
+
+    def __bool__(self):
+        """Check whether the module is available, importing it if needed."""
+
+        return self._load() is not None
+
+
+    def __getattr__(self, name):
+        """Access an attribute of the module, importing it if needed."""
+
+        # Special attributes are not passed through, so that inspecting the proxy does not load it
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        module = self._load()
+        if module is None:
+            raise ImportError('Optional dependency ' + self._name + ' is not available.')
+
+        # Store the accessed attribute on the proxy, so subsequent access is direct
+        value = getattr(module, name)
+        setattr(self, name, value)
+
+        return value
+
+
+    def __repr__(self):
+        """Representation of the proxy object."""
+
+        return '<LazyModule {} ({})>'.format(self._name, \
+            'not loaded' if self._available is None else \
+            'loaded' if self._available else 'not available')
+
+
+    @property
+    def _name(self):
+        """Full name of the module."""
+
+        return self._args[1] + self._args[0] if len(self._args) > 1 else self._args[0]
+
+
+    def _load(self):
+        """Import the module, if not already attempted."""
+
+        if self._available is None:
+            self._module = safe_import(*self._args) or None
+            self._available = self._module is not None
+
+        return self._module
+
+
 def check_dependency(dep, name):
     """Decorator that checks if an optional dependency is available.
 
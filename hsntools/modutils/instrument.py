@@ -0,0 +1,274 @@
+"""Module level utilities for instrumenting and profiling operations."""
+
+import os
+import json
+import time
+import logging
+from functools import wraps
+from contextlib import contextmanager
+
+from hsntools.modutils.dependencies import lazy_import
+
+psutil = lazy_import('psutil')
+resource = lazy_import('resource')
+
+# Collection of the currently active sinks, which are sent records of instrumented operations
+SINKS = []
+
+###################################################################################################
+###################################################################################################
+
+def add_sink(sink):
+    """Add a sink, which will be sent records of all instrumented operations.
+
+    Parameters
+    ----------
+    sink : callable
+        Function or object that is called with a record dictionary for each operation.
+        See `measure` for the fields included in each record.
+
+    Returns
+    -------
+    sink : callable
+        The added sink.
+    """
+
+    SINKS.append(sink)
+
+    return sink
+
+
+def remove_sink(sink):
+    """Remove a sink from the set of active sinks.
+
+    Parameters
+    ----------
+    sink : callable
+        The sink to remove.
+    """
+
+    SINKS.remove(sink)
+
+
+def clear_sinks():
+    """Remove all active sinks."""
+
+    SINKS.clear()
+
+
+@contextmanager
+def measure(name):
+    """Context manager to measure the resource usage of an operation.
+
+    Parameters
+    ----------
+    name : str
+        Name of the operation.
+
+    Yields
+    ------
+    record : dict
+        Record of the operation, which is filled in when the operation completes, including:
+
+        * `name` : the name of the operation
+        * `wall_time` : wall clock time, in seconds
+        * `cpu_time` : process CPU time, in seconds
+        * `peak_rss` : the peak resident memory of the process, in bytes, or None if unavailable
+        * `read_bytes`, `write_bytes` : bytes read & written, or None if unavailable
+        * `error` : the name of the error type, if the operation raised an error, else None
+
+    Notes
+    -----
+    Completed records are sent to all active sinks.
+    The peak resident memory is the peak for the process up to the end of the operation.
+    Bytes read & written require `psutil` or, on Linux, access to '/proc/self/io'.
+    In both cases, these are the bytes fetched from & sent to storage, as counted by the
+    operating system, which do not include reads served from the page cache.
+    """
+
+    record = {'name' : name, 'error' : None}
+    io_start = _get_io_counters()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+
+    try:
+        yield record
+    except BaseException as excp:
+        record['error'] = type(excp).__name__
+        raise
+    finally:
+        record['wall_time'] = time.perf_counter() - wall_start
+        record['cpu_time'] = time.process_time() - cpu_start
+        record['peak_rss'] = _get_peak_rss()
+        io_end = _get_io_counters()
+        for label in ['read_bytes', 'write_bytes']:
+            record[label] = io_end[label] - io_start[label] if io_start and io_end else None
+        for sink in SINKS:
+            sink(record)
+
+
+def instrument(name=None):
+    """Decorator to measure the resource usage of a function, if any sinks are active.
+
+    Parameters
+    ----------
+    name : str, optional
+        Name to record the operation as. Defaults to the module and name of the function.
+
+    Returns
+    -------
+    wrap : callable
+        The decorated function.
+
+    Notes
+    -----
+    If no sinks are active, the function is called directly, with no measurement.
+    """
+
+    def wrap(func):
+        label = name if name else func.__module__.replace('hsntools.', '') + '.' + func.__name__
+        @wraps(func)
+        def wrapped_func(*args, **kwargs):
+            if not SINKS:
+                return func(*args, **kwargs)
+            with measure(label):
+                return func(*args, **kwargs)
+        return wrapped_func
+    return wrap
+
+
+class LogSink():
+    """Sink that sends operation records to a logger.
+
+    Parameters
+    ----------
+    logger : logging.Logger, optional
+        Logger to use. Defaults to the 'hsntools' logger.
+    level : int, optional, default: logging.INFO
+        Logging level to log records at.
+    """
+
+    def __init__(self, logger=None, level=logging.INFO):
+        """Initialize LogSink object."""
+
+        self.logger = logger if logger else logging.getLogger('hsntools')
+        self.level = level
+
+
+    def __call__(self, record):
+        """Log an operation record."""
+
+        self.logger.log(self.level, '%s: wall %.3fs, cpu %.3fs', record['name'],
+                        record['wall_time'], record['cpu_time'])
+
+
+class JSONLinesSink():
+    """Sink that appends operation records to a JSON lines file.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        File to save records to.
+    """
+
+    def __init__(self, file_path):
+        """Initialize JSONLinesSink object."""
+
+        self.file_path = file_path
+
+
+    def __call__(self, record):
+        """Save an operation record."""
+
+        with open(self.file_path, 'a') as jsonlines_file:
+            jsonlines_file.write(json.dumps(record) + '\n')
+
+
+class MemorySink():
+    """Sink that collects operation records in memory, and can summarize them.
+
+    Attributes
+    ----------
+    records : list of dict
+        Collected operation records.
+    """
+
+    def __init__(self):
+        """Initialize MemorySink object."""
+
+        self.records = []
+
+
+    def __call__(self, record):
+        """Collect an operation record."""
+
+        self.records.append(dict(record))
+
+
+    def summary(self):
+        """Summarize collected records, per operation name.
+
+        Returns
+        -------
+        summary : dict
+            Summary for each operation name, including the number of `calls` and `errors`, the
+            total `wall_time`, `cpu_time`, `read_bytes` & `write_bytes`, and maximum `peak_rss`.
+        """
+
+        summary = {}
+        for record in self.records:
+            cur = summary.setdefault(record['name'], {'calls' : 0, 'errors' : 0, 'wall_time' : 0.,
+                                                      'cpu_time' : 0., 'peak_rss' : None,
+                                                      'read_bytes' : None, 'write_bytes' : None})
+            cur['calls'] += 1
+            cur['errors'] += record['error'] is not None
+            cur['wall_time'] += record['wall_time']
+            cur['cpu_time'] += record['cpu_time']
+            if record['peak_rss'] is not None:
+                cur['peak_rss'] = max(cur['peak_rss'] or 0, record['peak_rss'])
+            for label in ['read_bytes', 'write_bytes']:
+                if record[label] is not None:
+                    cur[label] = (cur[label] or 0) + record[label]
+
+        return summary
+
+
+    def print_summary(self):
+        """Print a summary of the collected records, sorted by total wall time."""
+
+        str_fmt = '{:40s} {:>6d} calls    wall: {:9.3f}s    cpu: {:9.3f}s'
+        summary = self.summary()
+        for name in sorted(summary, key=lambda name: summary[name]['wall_time'], reverse=True):
+            cur = summary[name]
+            print(str_fmt.format(name, cur['calls'], cur['wall_time'], cur['cpu_time']))
+
+
+def _get_peak_rss():
+    """Get the peak resident memory of the current process, in bytes."""
+
+    if resource:
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Note: ru_maxrss is reported in bytes on macOS, and in kilobytes on Linux
+        return peak_rss if os.uname().sysname == 'Darwin' else peak_rss * 1024
+    if psutil:
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    return None
+
+
+def _get_io_counters():
+    """Get the bytes read & written by the current process, if available."""
+
+    if psutil:
+        try:
+            counters = psutil.Process().io_counters()
+            return {'read_bytes' : counters.read_bytes, 'write_bytes' : counters.write_bytes}
+        except (AttributeError, psutil.AccessDenied):
+            return None
+
+    try:
+        with open('/proc/self/io') as io_file:
+            counters = dict(line.split(': ') for line in io_file.read().splitlines())
+        return {'read_bytes' : int(counters['read_bytes']),
+                'write_bytes' : int(counters['write_bytes'])}
+    except (OSError, KeyError, ValueError):
+        return None
@@ -2,39 +2,110 @@
 
 from copy import deepcopy
 
+import numpy as np
+
 from hsntools.io.utils import check_ext, check_folder
-from hsntools.modutils.dependencies import safe_import, check_dependency
+from hsntools.modutils.dependencies import lazy_import, check_dependency
 
-pd = safe_import('pandas')
+pd = lazy_import('pandas')
 
 ###################################################################################################
 ###################################################################################################
 
+# Fields of a bundle definition, in order
+BUNDLE_FIELDS = ['probe', 'hemisphere', 'lobe', 'region', 'subregion', 'channels']
+
+# Fields of the per-electrode table, in order
+ELECTRODE_FIELDS = ['probe', 'hemisphere', 'lobe', 'region', 'subregion', 'label', 'pin', 'channel']
+
+
 class Bundle():
-    """Object for collecting & managing an electrode bundle definition."""
+    """Object for collecting & managing an electrode bundle definition.
+
+    Notes
+    -----
+    Bundle objects are immutable, and can be compared, hashed, and used as dictionary keys.
+    Channels are stored as a tuple, and exported as a list in `to_dict`. The dictionary and
+    tuple exports are cached, and so the returned objects are shared, and should not be modified.
+    """
+
+    __slots__ = BUNDLE_FIELDS + ['_tuple', '_dict', '_hash']
 
     def __init__(self, probe, hemisphere=None, lobe=None, region=None,
                  subregion=None, channels=None):
         """Initialize Bundle object."""
 
-        self.probe = probe
-        self.hemisphere = hemisphere
-        self.lobe = lobe
-        self.region = region
-        self.subregion = subregion
-        self.channels = channels
+        channels = tuple(channels) if channels is not None else None
+        values = (probe, hemisphere, lobe, region, subregion, channels)
+        for field, value in zip(BUNDLE_FIELDS, values):
+            object.__setattr__(self, field, value)
+
+        object.__setattr__(self, '_tuple', values)
+        object.__setattr__(self, '_dict', None)
+        object.__setattr__(self, '_hash', None)
+
+
+    def __setattr__(self, name, value):
+        """Block setting attributes, as Bundle objects are immutable."""
+
+        raise AttributeError('Bundle objects are immutable - create a new Bundle instead.')
+
+
+    def __eq__(self, other):
+        """Check equality with another Bundle object, based on all bundle fields."""
+
+        if not isinstance(other, Bundle):
+            return NotImplemented
+
+        return self._tuple == other._tuple
+
+
+    def __hash__(self):
+        """Hash the bundle, based on all bundle fields."""
+
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash(self._tuple))
+
+        return self._hash
+
+
+    def __repr__(self):
+        """Return a string representation of the bundle."""
+
+        return 'Bundle(' + ', '.join(field + '=' + repr(value) \
+            for field, value in zip(BUNDLE_FIELDS, self._tuple) if value is not None) + ')'
+
+
+    def __reduce__(self):
+        """Support copying & pickling, by re-initializing from the bundle fields."""
+
+        return (Bundle, self._tuple)
+
+
+    def __setstate__(self, state):
+        """Restore from a pickled attribute dictionary, as saved by mutable Bundle objects."""
+
+        if isinstance(state, tuple):
+            state = {**(state[0] or {}), **state[1]}
+        self.__init__(*[state.get(field) for field in BUNDLE_FIELDS])
+
+
+    def to_tuple(self):
+        """Export object information to a tuple, with values in the order of `BUNDLE_FIELDS`."""
+
+        return self._tuple
+
 
     def to_dict(self):
         """Export object information to a dictionary"""
 
-        return {
-            'probe' : self.probe,
-            'hemisphere' : self.hemisphere,
-            'lobe' : self.lobe,
-            'region' : self.region,
-            'subregion' : self.subregion,
-            'channels' : self.channels,
-        }
+        if self._dict is None:
+            bundle_dict = dict(zip(BUNDLE_FIELDS, self._tuple))
+            if self.channels is not None:
+                bundle_dict['channels'] = list(self.channels)
+            object.__setattr__(self, '_dict', bundle_dict)
+
+        return self._dict
 
 
 class Electrodes():
@@ -48,6 +119,12 @@ class Electrodes():
         Sampling rate.
     bundles : list of Bundle
         Names of the bundles.
+
+    Notes
+    -----
+    A per-electrode table, with a row for each electrode of each bundle, is built up as bundles
+    are added, along with an index from channel numbers to table rows. Bundles should be added
+    with `add_bundle` or `add_bundles`, so that the table is kept in sync.
     """
 
     n_electrodes_per_bundle = 8
@@ -59,6 +136,24 @@ class Electrodes():
         self.fs = fs
         self.bundles = []
 
+        self._table = {field : [] for field in ELECTRODE_FIELDS}
+        self._channel_rows = {}
+        self._arrays = None
+        self._lookup = None
+
+
+    def __setstate__(self, state):
+        """Restore from a pickled state, building the per-electrode table if it is missing."""
+
+        self.__dict__.update(state)
+        self._arrays = None
+        self._lookup = None
+        if '_table' not in state:
+            self._table = {field : [] for field in ELECTRODE_FIELDS}
+            self._channel_rows = {}
+            for bundle in self.bundles:
+                self._add_rows(bundle)
+
 
     def __iter__(self):
         """Iterate across bundles in the object."""
@@ -74,6 +169,27 @@ class Electrodes():
         return len(self.bundles)
 
 
+    @property
+    def n_electrodes(self):
+        """The number of electrodes, across all bundles, stored in the object."""
+
+        return len(self._table['pin'])
+
+
+    @property
+    def table(self):
+        """Access the per-electrode table, as a dictionary of arrays."""
+
+        if self._arrays is None:
+            self._arrays = {field : np.array(values, dtype=object) \
+                for field, values in self._table.items()}
+            self._arrays['pin'] = np.array(self._table['pin'], dtype=int)
+            if None not in self._table['channel']:
+                self._arrays['channel'] = np.array(self._table['channel'], dtype=int)
+
+        return self._arrays
+
+
     @property
     def bundle_properties(self):
         """Access bundle property labels."""
@@ -106,10 +222,11 @@ class Electrodes():
             A set of channel indices for the bundle.
         """
 
-        if isinstance(probe, Bundle):
-            self.bundles.append(probe)
-        else:
-            self.bundles.append(Bundle(probe, hemisphere, lobe, region, subregion, channels))
+        if not isinstance(probe, Bundle):
+            probe = Bundle(probe, hemisphere, lobe, region, subregion, channels)
+
+        self.bundles.append(probe)
+        self._add_rows(probe)
 
 
     def add_bundles(self, bundles):
@@ -145,6 +262,69 @@ class Electrodes():
         return [getattr(bundle, field) for bundle in self.bundles]
 
 
+    def get_rows(self, channels):
+        """Get the electrode table rows for a set of channels.
+
+        Parameters
+        ----------
+        channels : int or array of int
+            Channel number(s) to get the rows for.
+
+        Returns
+        -------
+        rows : int or array of int
+            The row index in the electrode table for each channel.
+
+        Raises
+        ------
+        ValueError
+            If any of the channels are not defined in the object.
+        """
+
+        if self._lookup is None:
+            self._lookup = np.full(max(self._channel_rows, default=-1) + 1, -1, dtype=int)
+            self._lookup[list(self._channel_rows.keys())] = list(self._channel_rows.values())
+
+        channels = np.asarray(channels, dtype=int)
+        valid = (channels >= 0) & (channels < len(self._lookup))
+        rows = np.full(channels.shape, -1, dtype=int)
+        rows[valid] = self._lookup[channels[valid]]
+
+        if np.any(rows < 0):
+            msg = 'Channel(s) not found in the electrodes definition: {}'
+            raise ValueError(msg.format(np.unique(channels[rows < 0]).tolist()))
+
+        return rows if rows.ndim else int(rows)
+
+
+    def lookup(self, field, channels):
+        """Get the values of a specified field for a set of channels.
+
+        Parameters
+        ----------
+        field : {'probe', 'hemisphere', 'lobe', 'region', 'subregion', 'label', 'pin'}
+            Which field to get the values for.
+        channels : int or array of int
+            Channel number(s) to get the values for.
+
+        Returns
+        -------
+        values : object or array
+            The value of the field for each channel.
+
+        Examples
+        --------
+        Get the region for each of a set of spikes, given the channel of each spike:
+
+        >>> electrodes = Electrodes()
+        >>> electrodes.add_bundle('LA', region='amygdala', channels=list(range(8)))
+        >>> electrodes.lookup('region', [0, 3, 3, 7])
+        array(['amygdala', 'amygdala', 'amygdala', 'amygdala'], dtype=object)
+        """
+
+        return self.table[field][self.get_rows(channels)]
+
+
     def copy(self):
         """Return a deepcopy of this object."""
 
@@ -160,23 +340,7 @@ class Electrodes():
             Whether to drops fields that are all None.
         """
 
-        labels = self.bundle_properties
-        labels.remove('channels')
-
-        out_dict = {label : [] for label in labels}
-        for label in ['label', 'pin', 'channel']:
-            out_dict[label] = []
-
-        for bundle in self.bundles:
-            for ind in range(self.n_electrodes_per_bundle):
-                out_dict['label'].append(bundle.probe + str(ind + 1))
-                out_dict['pin'].append(ind + 1)
-                for label in labels:
-                    out_dict[label].append(getattr(bundle, label))
-                if bundle.channels is not None:
-                    out_dict['channel'].append(bundle.channels[ind])
-                else:
-                    out_dict['channel'].append(None)
+        out_dict = {field : list(values) for field, values in self._table.items()}
 
         # Drop any entries in the dictionary conversion that are empty or all None
         if drop_empty:
@@ -209,3 +373,21 @@ class Electrodes():
         """
 
         self.to_dataframe().to_csv(check_ext(check_folder(file_name, folder), '.csv'), **kwargs)
+
+
+    def _add_rows(self, bundle):
+        """Add the electrodes of a bundle to the per-electrode table & channel index."""
+
+        start = self.n_electrodes
+        for ind in range(self.n_electrodes_per_bundle):
+            for field, value in zip(BUNDLE_FIELDS[:-1], bundle.to_tuple()):
+                self._table[field].append(value)
+            self._table['label'].append(bundle.probe + str(ind + 1))
+            self._table['pin'].append(ind + 1)
+            channel = bundle.channels[ind] if bundle.channels is not None else None
+            self._table['channel'].append(channel)
+            if channel is not None:
+                self._channel_rows[int(channel)] = start + ind
+
+        self._arrays = None
+        self._lookup = None
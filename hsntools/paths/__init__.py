@@ -1,4 +1,7 @@
 """Paths sub-module for hsntools."""
 
 from .paths import Paths
-from .create import create_project_directory, create_subject_directory, create_session_directory
+from .create import (create_project_directory, create_subject_directory,
+                     create_session_directory, create_session_directories)
+from .catalog import (find_sessions, scan_project, get_catalog_sessions,
+                      get_session_files, load_catalog)
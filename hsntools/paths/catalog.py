@@ -0,0 +1,309 @@
+"""Functions for creating and querying a catalog of the sessions in a project."""
+
+import os
+import sqlite3
+from pathlib import Path
+from contextlib import closing
+
+from hsntools.io.utils import get_subfolders, make_session_name
+from hsntools.run.log import print_status
+from hsntools.paths.defaults import SUBJECT_FOLDERS
+from hsntools.modutils.dependencies import lazy_import, check_dependency
+
+pd = lazy_import('pandas')
+
+###################################################################################################
+###################################################################################################
+
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    subject TEXT, experiment TEXT, session TEXT, path TEXT, nwb INTEGER,
+    PRIMARY KEY (subject, experiment, session));
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY, parent TEXT, mtime INTEGER);
+CREATE TABLE IF NOT EXISTS files (
+    subject TEXT, experiment TEXT, session TEXT, folder TEXT, name TEXT,
+    size INTEGER, mtime INTEGER,
+    PRIMARY KEY (subject, experiment, session, folder, name));
+CREATE INDEX IF NOT EXISTS files_session ON files (subject, experiment, session);
+"""
+
+
+def scan_project(project_path, catalog_file=None, recordings_name='recordings',
+                 subject_folders=SUBJECT_FOLDERS, nwb_name='nwb', full=False, verbose=True):
+    """Scan a project folder, and store an inventory of all sessions to a catalog file.
+
+    Parameters
+    ----------
+    project_path : str or Path
+        The path to the project folder.
+    catalog_file : str or Path, optional
+        The file path of the catalog, which is a SQLite database.
+        If not provided, defaults to a file 'catalog.db' in the 'info' folder of the project.
+    recordings_name : str, optional
+        The name of the subfolder (within `project_path`) that stores recordings.
+    subject_folders : list, optional
+        The sub-folders of subject folders, which are not experiment folders.
+    nwb_name : str, optional
+        The name of the subfolder (within `project_path`) that stores NWB files.
+    full : bool, optional, default: False
+        Whether to do a full rescan of all session folders.
+        If False, the contents of folders that have not changed since the last scan are re-used.
+    verbose : bool, optional, default: True
+        Whether to print out information.
+
+    Returns
+    -------
+    catalog_file : Path
+        The file path of the catalog.
+
+    Notes
+    -----
+    The catalog is organized as the `recordings/SUBJECT/EXPERIMENT/SESSION` layout.
+    For each session, all files within the session folder are stored, with their size and
+    modification time, as well as whether an NWB file exists for the session.
+
+    Incremental scans use folder modification times, which update when files are added,
+    removed or renamed, but not when files are modified in place, which requires a full rescan.
+    """
+
+    project_path = Path(project_path)
+    catalog_file = Path(catalog_file) if catalog_file else project_path / 'info' / 'catalog.db'
+    os.makedirs(catalog_file.parent, exist_ok=True)
+
+    recordings_path = project_path / recordings_name
+    nwb_path = project_path / nwb_name
+    nwb_files = set(os.listdir(nwb_path)) if os.path.exists(nwb_path) else set()
+
+    print_status(verbose, 'Scanning project: {}'.format(project_path), 0)
+
+    with closing(sqlite3.connect(catalog_file)) as conn, conn:
+
+        conn.executescript(CATALOG_SCHEMA)
+        if full:
+            conn.execute('DELETE FROM folders')
+
+        sessions = []
+        for key in find_sessions(project_path, recordings_name, subject_folders):
+
+            session_path = recordings_path.joinpath(*key)
+            nwb = make_session_name(*key) + '.nwb' in nwb_files
+
+            conn.execute('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)',
+                         key + (str(session_path), nwb))
+            if full:
+                conn.execute('DELETE FROM files WHERE subject = ? AND experiment = ? ' \
+                             'AND session = ?', key)
+            _scan_folder(conn, key, session_path, '')
+            sessions.append(key)
+
+        _drop_missing_sessions(conn, sessions)
+
+    print_status(verbose, 'Found {} sessions.'.format(len(sessions)), 1)
+
+    return catalog_file
+
+
+def find_sessions(project_path, recordings_name='recordings', subject_folders=SUBJECT_FOLDERS):
+    """Find all the sessions in a project folder.
+
+    Parameters
+    ----------
+    project_path : str or Path
+        The path to the project folder.
+    recordings_name : str, optional
+        The name of the subfolder (within `project_path`) that stores recordings.
+    subject_folders : list, optional
+        The sub-folders of subject folders, which are not experiment folders.
+
+    Returns
+    -------
+    sessions : list of tuple of (str, str, str)
+        The subject, experiment and session label of each session, in sorted order.
+    """
+
+    recordings_path = Path(project_path) / recordings_name
+
+    sessions = []
+    for subject in sorted(get_subfolders(recordings_path)):
+        for experiment in sorted(get_subfolders(recordings_path / subject)):
+            if experiment in subject_folders:
+                continue
+            for session in sorted(get_subfolders(recordings_path / subject / experiment,
+                                                 select='session')):
+                sessions.append((subject, experiment, session))
+
+    return sessions
+
+
+def get_catalog_sessions(catalog_file, has=None, missing=None):
+    """Get a list of sessions from a catalog, optionally filtered by available outputs.
+
+    Parameters
+    ----------
+    catalog_file : str or Path
+        The file path of the catalog.
+    has : str or list of str, optional
+        Folder label(s) that sessions must have files in, for example 'sorting'.
+        Can also be 'nwb', to select sessions with an NWB file.
+    missing : str or list of str, optional
+        Folder label(s) that sessions must not have any files in, for example 'spikes'.
+        Can also be 'nwb', to select sessions without an NWB file.
+
+    Returns
+    -------
+    sessions : list of tuple of (str, str, str)
+        The subject, experiment and session label of each selected session.
+
+    Notes
+    -----
+    Folder labels can be a session sub-directory, such as '02_processing', a folder name,
+    such as 'sorting', or a relative path, such as '02_processing/sorting'.
+    """
+
+    has = [has] if isinstance(has, str) else (has or [])
+    missing = [missing] if isinstance(missing, str) else (missing or [])
+
+    query = 'SELECT subject, experiment, session FROM sessions s WHERE 1'
+    params = []
+    for label, check in [(label, 'EXISTS') for label in has] + \
+                        [(label, 'NOT EXISTS') for label in missing]:
+        if label == 'nwb':
+            query += ' AND nwb' if check == 'EXISTS' else ' AND NOT nwb'
+        else:
+            query += ' AND ' + check + ' (SELECT 1 FROM files f WHERE f.subject = s.subject ' \
+                'AND f.experiment = s.experiment AND f.session = s.session AND (f.folder = ? ' \
+                'OR f.folder GLOB ? OR f.folder GLOB ? OR f.folder GLOB ?))'
+            pattern = _escape_glob(label)
+            params.extend([label, pattern + '/*', '*/' + pattern, '*/' + pattern + '/*'])
+    query += ' ORDER BY subject, experiment, session'
+
+    with closing(sqlite3.connect(catalog_file)) as conn:
+        sessions = conn.execute(query, params).fetchall()
+
+    return sessions
+
+
+def get_session_files(catalog_file, subject, experiment, session):
+    """Get the inventory of files for a session from a catalog.
+
+    Parameters
+    ----------
+    catalog_file : str or Path
+        The file path of the catalog.
+    subject, experiment, session : str
+        The subject, experiment, and session labels.
+
+    Returns
+    -------
+    files : list of dict
+        Information for each file, including `folder`, `name`, `size` and `mtime`.
+        The folder is the path of the file's folder, relative to the session folder.
+    """
+
+    session = 'session_' + str(session) if 'session' not in str(session) else session
+
+    with closing(sqlite3.connect(catalog_file)) as conn:
+        rows = conn.execute('SELECT folder, name, size, mtime FROM files WHERE subject = ? AND ' \
+                            'experiment = ? AND session = ? ORDER BY folder, name',
+                            (subject, experiment, session)).fetchall()
+
+    return [dict(zip(['folder', 'name', 'size', 'mtime'], row)) for row in rows]
+
+
+@check_dependency(pd, 'pandas')
+def load_catalog(catalog_file):
+    """Load a summary of all sessions in a catalog as a dataframe.
+
+    Parameters
+    ----------
+    catalog_file : str or Path
+        The file path of the catalog.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        A dataframe with a row per session, including the session path, whether it has an
+        NWB file, and the number of files and total size of the files of each session.
+    """
+
+    query = 'SELECT s.subject, s.experiment, s.session, s.path, s.nwb, ' \
+        'COUNT(f.name) AS n_files, COALESCE(SUM(f.size), 0) AS size FROM sessions s ' \
+        'LEFT JOIN files f ON f.subject = s.subject AND f.experiment = s.experiment ' \
+        'AND f.session = s.session GROUP BY s.subject, s.experiment, s.session'
+
+    with closing(sqlite3.connect(catalog_file)) as conn:
+        df = pd.read_sql_query(query, conn)
+
+    df['nwb'] = df['nwb'].astype(bool)
+
+    return df
+
+
+def _scan_folder(conn, key, path, rel_path):
+    """Scan a folder into the catalog, re-using stored contents if the folder is unchanged."""
+
+    path_str = str(path)
+    mtime = os.stat(path).st_mtime_ns
+    stored = conn.execute('SELECT mtime FROM folders WHERE path = ?', (path_str,)).fetchone()
+
+    if stored and stored[0] == mtime:
+        subfolders = [row[0] for row in conn.execute(\
+            'SELECT path FROM folders WHERE parent = ?', (path_str,))]
+        for subfolder in subfolders:
+            name = os.path.basename(subfolder)
+            _scan_folder(conn, key, subfolder, rel_path + '/' + name if rel_path else name)
+        return
+
+    conn.execute('DELETE FROM files WHERE subject = ? AND experiment = ? AND session = ? ' \
+                 'AND folder = ?', key + (rel_path,))
+
+    subfolders = []
+    with os.scandir(path) as scan:
+        for entry in scan:
+            if entry.is_dir():
+                subfolders.append(entry)
+            else:
+                stat = entry.stat()
+                conn.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?, ?, ?)',
+                             key + (rel_path, entry.name, stat.st_size, stat.st_mtime_ns))
+
+    # Drop any stored sub-folders that no longer exist
+    current = {entry.path for entry in subfolders}
+    for (old_path,) in conn.execute('SELECT path FROM folders WHERE parent = ?',
+                                    (path_str,)).fetchall():
+        if old_path not in current:
+            old_rel = os.path.relpath(old_path, path_str)
+            old_rel = rel_path + '/' + old_rel if rel_path else old_rel
+            conn.execute('DELETE FROM folders WHERE path = ? OR path GLOB ?',
+                         (old_path, _escape_glob(old_path + os.sep) + '*'))
+            conn.execute('DELETE FROM files WHERE subject = ? AND experiment = ? AND ' \
+                         'session = ? AND (folder = ? OR folder GLOB ?)',
+                         key + (old_rel, _escape_glob(old_rel) + '/*'))
+
+    for entry in subfolders:
+        _scan_folder(conn, key, entry.path, rel_path + '/' + entry.name if rel_path else entry.name)
+
+    conn.execute('INSERT OR REPLACE INTO folders VALUES (?, ?, ?)',
+                 (path_str, str(Path(path_str).parent), mtime))
+
+
+def _drop_missing_sessions(conn, sessions):
+    """Drop any sessions from the catalog that were not found in the latest scan."""
+
+    stored = conn.execute('SELECT subject, experiment, session, path FROM sessions').fetchall()
+    for subject, experiment, session, path in stored:
+        if (subject, experiment, session) not in sessions:
+            key = (subject, experiment, session)
+            conn.execute('DELETE FROM sessions WHERE subject = ? AND experiment = ? ' \
+                         'AND session = ?', key)
+            conn.execute('DELETE FROM files WHERE subject = ? AND experiment = ? ' \
+                         'AND session = ?', key)
+            conn.execute('DELETE FROM folders WHERE path = ? OR path GLOB ?',
+                         (path, _escape_glob(path + os.sep) + '*'))
+
+
+def _escape_glob(text):
+    """Escape the GLOB wildcard characters in a string, to match them literally in a pattern."""
+
+    return ''.join('[' + char + ']' if char in '*?[' else char for char in text)
@@ -3,6 +3,8 @@
 import os
 from pathlib import Path
 from copy import deepcopy
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
 
 from hsntools.run.log import print_status
 from hsntools.paths.defaults import PROJECT_FOLDERS, SUBJECT_FOLDERS, SESSION_FOLDERS
@@ -160,3 +162,125 @@ def create_session_directory(project_path, subject, experiment, session,
                 make_folder(recordings_path / subject / experiment / session / subdir)
                 for subfolder in subfolders:
                     make_folder(recordings_path / subject / experiment / session / subdir / subfolder)
+
+
+def create_session_directories(project_path, manifest, recordings_name='recordings',
+                               subject_folders=SUBJECT_FOLDERS, session_folders=SESSION_FOLDERS,
+                               n_jobs=1, dry_run=False, verbose=True):
+    """Create the folder structure for a collection of sessions, across subjects & experiments.
+
+    Parameters
+    ----------
+    project_path : str or Path
+        The path to the project folder.
+    manifest : dict or list of tuple
+        Definition of the sessions to create.
+        If dict, should be organized as {subject : {experiment : [session, ...]}}.
+        If list, should be a list of (subject, experiment, session) tuples.
+        Session labels can be integer indices, or strings, for example `session_0`.
+    recordings_name : str, optional
+        The name of the subfolder (within `project_path`) to store recordings.
+    subject_folders : list, optional
+        List of sub-folders to initialize in each subject folder.
+    session_folders : dict, optional
+        Defines the folder names to initialize as part of each session folder.
+        Each key defines a sub-directory within the `session` folder.
+        Each set of values is a list of folder names for within each sub-directory.
+    n_jobs : int, optional, default: 1
+        Number of threads to use to create folders.
+    dry_run : bool, optional, default: False
+        Whether to only check which folders would be created, without creating any.
+    verbose : bool, optional, default: True
+        Whether to print out information.
+
+    Returns
+    -------
+    report : dict
+        Lists of folder paths, with keys `created`, for folders that were (or, for a dry run,
+        would be) created, and `existing`, for folders that already existed.
+
+    Notes
+    -----
+    The full set of folders is computed and de-duplicated up front, and is then created
+    level by level, so that parent folders always exist before their sub-folders.
+    If `project_path` does not exist, it is also created.
+    """
+
+    print_status(verbose, '{} session directories...'.format(\
+        'Checking' if dry_run else 'Creating'), 0)
+
+    folders = get_session_directories(project_path, manifest, recordings_name,
+                                      subject_folders, session_folders)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        exists = list(executor.map(os.path.isdir, folders))
+
+        report = {
+            'created' : [folder for folder, check in zip(folders, exists) if not check],
+            'existing' : [folder for folder, check in zip(folders, exists) if check],
+        }
+
+        if not dry_run:
+            for _, level in groupby(report['created'], key=lambda folder: len(folder.parts)):
+                list(executor.map(_make_new_folder, level))
+
+    print_status(verbose, '{} folders {}, {} already existing.'.format(\
+        len(report['created']), 'to create' if dry_run else 'created',
+        len(report['existing'])), 1)
+
+    return report
+
+
+def get_session_directories(project_path, manifest, recordings_name='recordings',
+                            subject_folders=SUBJECT_FOLDERS, session_folders=SESSION_FOLDERS):
+    """Get the full list of folders for a collection of sessions.
+
+    Parameters
+    ----------
+    project_path : str or Path
+        The path to the project folder.
+    manifest : dict or list of tuple
+        Definition of the sessions.
+        If dict, should be organized as {subject : {experiment : [session, ...]}}.
+        If list, should be a list of (subject, experiment, session) tuples.
+    recordings_name : str, optional
+        The name of the subfolder (within `project_path`) to store recordings.
+    subject_folders : list, optional
+        List of sub-folders of each subject folder.
+    session_folders : dict, optional
+        Defines the folder names that are part of each session folder.
+
+    Returns
+    -------
+    folders : list of Path
+        All folders, de-duplicated, and sorted such that parents precede sub-folders.
+    """
+
+    if isinstance(manifest, dict):
+        manifest = [(subject, experiment, session) \
+            for subject, experiments in manifest.items() \
+                for experiment, sessions in experiments.items() \
+                    for session in ([sessions] if isinstance(sessions, (str, int)) else sessions)]
+
+    recordings_path = Path(project_path) / recordings_name
+
+    folders = {recordings_path}
+    for subject, experiment, session in manifest:
+
+        session = 'session_' + str(session) if 'session' not in str(session) else session
+        session_path = recordings_path / subject / experiment / session
+
+        folders.update([recordings_path / subject, recordings_path / subject / experiment,
+                        session_path])
+        folders.update(recordings_path / subject / subfolder for subfolder in subject_folders)
+        for subdir, subfolders in session_folders.items():
+            folders.add(session_path / subdir)
+            folders.update(session_path / subdir / subfolder for subfolder in subfolders)
+
+    return sorted(folders, key=lambda folder: (len(folder.parts), str(folder)))
+
+
+def _make_new_folder(path):
+    """Make a new folder, and any missing parents, allowing for if it already exists."""
+
+    os.makedirs(path, exist_ok=True)
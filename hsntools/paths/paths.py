@@ -50,26 +50,45 @@ class Paths():
         self._subject_folders = deepcopy(subject_folders)
         self._session_folders = deepcopy(session_folders)
 
-        self.project = Path(project_path)
+        self._aliases = {}
+        self._ambiguous = set()
+        self.project = project_path
 
 
     def __getattr__(self, folder):
-        """Alias all the defined folder paths to access them as attributes."""
+        """Alias all the defined folder paths to access them as attributes.
 
-        for subdir, subfolders in self._session_folders.items():
-            if folder in subdir:
-                return self.session / subdir
-            elif folder in subfolders:
-                return self.session / subdir / folder
-        for subdir in self._subject_folders:
-            if folder in subdir:
-                return self.subject / subdir
-        for subdir in self._project_folders:
-            if folder in subdir:
-                return self.project / subdir
+        Notes
+        -----
+        Defined folder paths are stored as instance attributes when the object is created,
+        so this is only called for labels that are not available or are ambiguous.
+        """
+
+        if folder.startswith('_'):
+            raise AttributeError(folder)
+        if folder in self._ambiguous:
+            raise ValueError('Requested path {} is ambiguous.'.format(folder))
+        if folder in self._aliases:
+            raise ValueError('Requested path {} requires the subject, experiment ' \
+                             'and session to be defined.'.format(folder))
         raise ValueError('Requested path not found.')
 
 
+    @property
+    def project(self):
+        """Path of the project folder."""
+
+        return self._project
+
+
+    @project.setter
+    def project(self, project_path):
+        """Set the project folder, and update all the defined folder paths."""
+
+        self._project = Path(project_path)
+        self._build_paths()
+
+
     @property
     def session_name(self):
         """Name of the session this object reflects."""
@@ -81,35 +100,35 @@ class Paths():
     def recordings(self):
         """"Path of the recordings folder."""
 
-        return self.project / self._recordings_name
+        return self._recordings
 
 
     @property
     def subject(self):
         """Path of the subject folder."""
 
-        return self.recordings / self._subject
+        return self._check_path(self._subject_path)
 
 
     @property
     def experiment(self):
         """"Path of the experiment folder."""
 
-        return self.subject / self._experiment
+        return self._check_path(self._experiment_path)
 
 
     @property
     def session(self):
         """Path of the session folder."""
 
-        return self.experiment / self._session
+        return self._check_path(self._session_path)
 
 
     @property
     def all_paths(self):
         """List of all path names (all labels that can be used to access a path)."""
 
-        return self._make_all_paths()
+        return self._all_paths
 
 
     @property
@@ -145,6 +164,65 @@ class Paths():
                 print('  ' * 5, subfolder + '/')
 
 
+    def _build_paths(self):
+        """Build the lookup of all defined folder paths, stored as instance attributes.
+
+        Notes
+        -----
+        Each folder is available by its exact name, with session sub-directories also available
+        by their label without the numerical prefix, for example 'processing' for '02_processing'.
+        Any label that is defined at more than one location is ambiguous, and is not aliased.
+        """
+
+        for alias in self._aliases:
+            self.__dict__.pop(alias, None)
+
+        self._recordings = self._project / self._recordings_name
+        self._subject_path = self._recordings / self._subject if self._subject else None
+        self._experiment_path = self._subject_path / self._experiment \
+            if self._subject_path and self._experiment else None
+        self._session_path = self._experiment_path / self._session \
+            if self._experiment_path else None
+
+        # Collect each alias, with the level & relative path that it is defined at
+        aliases = []
+        for subdir, subfolders in self._session_folders.items():
+            aliases.append((subdir, 'session', subdir))
+            if '_' in subdir:
+                aliases.append((subdir.split('_')[1], 'session', subdir))
+            for subfolder in subfolders:
+                aliases.append((subfolder, 'session', subdir + '/' + subfolder))
+        for subdir in self._subject_folders:
+            aliases.append((subdir, 'subject', subdir))
+        for subdir in self._project_folders:
+            aliases.append((subdir, 'project', subdir))
+
+        self._aliases = {}
+        self._ambiguous = set()
+        for alias, level, location in aliases:
+            if alias in self._aliases and self._aliases[alias] != (level, location):
+                self._ambiguous.add(alias)
+            self._aliases[alias] = (level, location)
+
+        bases = {'session' : self._session_path, 'subject' : self._subject_path,
+                 'project' : self._project}
+        for alias, (level, location) in self._aliases.items():
+            if bases[level] is not None and alias not in self._ambiguous:
+                self.__dict__[alias] = bases[level] / location
+
+        self._all_paths = self._make_all_paths()
+
+
+    @staticmethod
+    def _check_path(path):
+        """Check that a path is defined, raising an error if not."""
+
+        if path is None:
+            raise TypeError('Requested path requires the subject and experiment to be defined.')
+
+        return path
+
+
     def _make_all_paths(self):
         """Create a list of all defined path labels.
 
@@ -1,9 +1,9 @@
 """Visualizations for checking timestamps."""
 
-from hsntools.modutils.dependencies import safe_import, check_dependency
+from hsntools.modutils.dependencies import lazy_import, check_dependency
 from hsntools.plts.utils import check_ax, savefig
 
-plt = safe_import('.pyplot', 'matplotlib')
+plt = lazy_import('.pyplot', 'matplotlib')
 
 ###################################################################################################
 ###################################################################################################
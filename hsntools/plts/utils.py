@@ -3,9 +3,9 @@
 from functools import wraps
 from os.path import join as pjoin
 
-from hsntools.modutils.dependencies import safe_import, check_dependency
+from hsntools.modutils.dependencies import lazy_import, check_dependency
 
-plt = safe_import('.pyplot', 'matplotlib')
+plt = lazy_import('.pyplot', 'matplotlib')
 
 ###################################################################################################
 ###################################################################################################
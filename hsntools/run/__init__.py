@@ -2,3 +2,4 @@
 
 from .log import print_status
 from .errors import catch_error
+from .pipeline import run_pipeline, load_checkpoint
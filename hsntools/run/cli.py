@@ -0,0 +1,283 @@
+"""Command line interface for running batch processing across a project."""
+
+import os
+import argparse
+import fnmatch
+from functools import partial
+from pathlib import Path
+
+from hsntools.version import __version__
+from hsntools.io.utils import get_files, make_session_name
+from hsntools.io.sorting import scan_combinato_folder
+from hsntools.io.files import save_json
+from hsntools.run.log import print_status
+from hsntools.run.pipeline import run_pipeline
+from hsntools.paths.paths import Paths
+from hsntools.paths.catalog import find_sessions, scan_project, get_catalog_sessions
+
+###################################################################################################
+###################################################################################################
+
+def main(argv=None):
+    """Run the hsntools command line interface.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        Command line arguments. If not provided, uses the arguments passed to the program.
+
+    Returns
+    -------
+    int
+        Exit status: 0 if all processing succeeded, 1 otherwise.
+    """
+
+    args = make_parser().parse_args(argv)
+
+    return args.func(args)
+
+
+def make_parser():
+    """Make the argument parser for the command line interface.
+
+    Returns
+    -------
+    parser : argparse.ArgumentParser
+        The argument parser.
+    """
+
+    parser = argparse.ArgumentParser(prog='hsntools',
+                                     description='Batch processing for hsntools projects.')
+    parser.add_argument('--version', action='version', version='%(prog)s ' + __version__)
+
+    shared = argparse.ArgumentParser(add_help=False)
+    shared.add_argument('project', type=Path, help='Path to the project folder.')
+    shared.add_argument('--include', nargs='+', default=None,
+                        help='Glob pattern(s) of items to include, matched to session ' \
+                             'names (EXPERIMENT_SUBJECT_session_X), or NWB file names.')
+    shared.add_argument('--exclude', nargs='+', default=None,
+                        help='Glob pattern(s) of items to exclude.')
+    shared.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Number of processes to run in parallel.')
+    shared.add_argument('--quiet', '-q', action='store_true', help='Do not print progress.')
+
+    runner = argparse.ArgumentParser(add_help=False)
+    runner.add_argument('--checkpoint', type=Path, default=None,
+                        help='Checkpoint file. Defaults to a file in the project info folder.')
+    runner.add_argument('--rerun', action='store_true',
+                        help='Re-run all items, ignoring any existing checkpoint.')
+    runner.add_argument('--retries', type=int, default=0, help='Number of retries per item.')
+
+    subparsers = parser.add_subparsers(title='commands', dest='command', required=True)
+
+    extract = subparsers.add_parser('extract-units', parents=[shared, runner],
+                                    help='Extract units from combinato sorting outputs. ' \
+                                         'Channels with unchanged inputs are skipped, ' \
+                                         'unless --rerun is given.')
+    extract.add_argument('--user', required=True, help='The 3 character sorting user label.')
+    extract.add_argument('--polarity', nargs='+', default=['neg', 'pos'],
+                         choices=['neg', 'pos'], help='Spike polarities to extract.')
+    extract.set_defaults(func=_run_extract_units)
+
+    align = subparsers.add_parser('align', parents=[shared, runner],
+                                  help='Fit synchronization alignment for each session.')
+    align.add_argument('--sync-file', default='sync',
+                       help='Name of the HDF5 file, in each session alignment folder, with ' \
+                            '`behavioral` and `neural` sync pulse datasets.')
+    align.add_argument('--n-pulses', type=int, default=None,
+                       help='If provided, match this number of pulses before fitting.')
+    align.add_argument('--score-thresh', type=float, default=0.9999,
+                       help='R^2 threshold that alignment fits must pass.')
+    align.set_defaults(func=_run_align)
+
+    validate = subparsers.add_parser('validate-nwb', parents=[shared, runner],
+                                     help='Validate the NWB files of the project.')
+    validate.set_defaults(func=_run_validate_nwb)
+
+    scan = subparsers.add_parser('scan-project', parents=[shared],
+                                 help='Scan the project into a session catalog.')
+    scan.add_argument('--catalog', type=Path, default=None,
+                      help='Catalog file. Defaults to a file in the project info folder.')
+    scan.add_argument('--full', action='store_true', help='Do a full rescan.')
+    scan.add_argument('--missing', nargs='+', default=None,
+                      help='Folder label(s), or "nwb", to list sessions that are missing.')
+    scan.set_defaults(func=_run_scan_project)
+
+    return parser
+
+
+def select_items(items, include=None, exclude=None):
+    """Select items based on include & exclude glob patterns.
+
+    Parameters
+    ----------
+    items : list of str
+        Item names.
+    include, exclude : list of str, optional
+        Glob patterns, where items must match any include pattern, and no exclude patterns.
+
+    Returns
+    -------
+    list of str
+        Selected items.
+    """
+
+    return [item for item in items \
+        if (not include or any(fnmatch.fnmatchcase(item, pattern) for pattern in include)) \
+            and not (exclude and any(fnmatch.fnmatchcase(item, pattern) for pattern in exclude))]
+
+
+## SUBCOMMANDS
+
+def _run_extract_units(args):
+    """Run the `extract-units` command."""
+
+    # Schedule the largest channels first, to balance the load across parallel workers
+    sizes = {}
+    for key in _get_sessions(args):
+        paths = Paths(args.project, *key)
+        if not os.path.isdir(paths.sorting):
+            continue
+        inventory = scan_combinato_folder(paths.sorting, counts=False)
+        for channel, size in _get_channel_sizes(inventory, args.user, args.polarity).items():
+            sizes[key + (channel,)] = size
+    items = sorted(sizes, key=sizes.get, reverse=True)
+
+    step = partial(_extract_channel, project=args.project, user=args.user,
+                   polarities=args.polarity, incremental=not args.rerun)
+
+    # All channels are run, as unchanged channels are skipped based on the extraction manifest
+    return _run(args, 'extract-units', [('extract', step)], items, resume=False)
+
+
+def _run_align(args):
+    """Run the `align` command."""
+
+    step = partial(_align_session, project=args.project, sync_file=args.sync_file,
+                   n_pulses=args.n_pulses, score_thresh=args.score_thresh)
+
+    return _run(args, 'align', [('align', step)], _get_sessions(args))
+
+
+def _run_validate_nwb(args):
+    """Run the `validate-nwb` command."""
+
+    nwb_files = select_items(get_files(args.project / 'nwb', select='.nwb'),
+                             args.include, args.exclude)
+    step = partial(_validate_nwbfile, folder=args.project / 'nwb')
+
+    return _run(args, 'validate-nwb', [('validate', step)], nwb_files)
+
+
+def _run_scan_project(args):
+    """Run the `scan-project` command."""
+
+    catalog_file = scan_project(args.project, args.catalog, full=args.full,
+                                verbose=not args.quiet)
+
+    if args.missing:
+        sessions = get_catalog_sessions(catalog_file, missing=args.missing)
+        names = select_items([make_session_name(*key) for key in sessions],
+                             args.include, args.exclude)
+        print_status(not args.quiet, 'Sessions missing {}: {}'.format(\
+            ', '.join(args.missing), len(names)), 0)
+        for name in names:
+            print(name)
+
+    return 0
+
+
+## STEP FUNCTIONS
+
+def _extract_channel(item, project, user, polarities, incremental=True):
+    """Extract units for all sorted polarities of a channel of a session."""
+
+    from hsntools.sorting.process import process_combinato_data
+
+    subject, experiment, session, channel = item
+    paths = Paths(project, subject, experiment, session)
+
+    polarities = [polarity for polarity in polarities if \
+        os.path.exists(paths.sorting / channel / 'sort_{}_{}'.format(polarity, user))]
+    if polarities:
+        os.makedirs(paths.sorting / 'units', exist_ok=True)
+        process_combinato_data(channel, paths.sorting, polarities, user, paths.sorting / 'units',
+                               verbose=False, incremental=incremental)
+
+
+def _align_session(item, project, sync_file, n_pulses, score_thresh):
+    """Fit the synchronization alignment for a session."""
+
+    from hsntools.io.h5 import load_from_h5file
+    from hsntools.timestamps.align import match_pulses, fit_sync_alignment
+
+    paths = Paths(project, *item)
+    sync = load_from_h5file(['behavioral', 'neural'], sync_file, paths.alignment)
+
+    sync_behav, sync_neural = sync['behavioral'], sync['neural']
+    if n_pulses:
+        sync_behav, sync_neural = match_pulses(sync_behav, sync_neural, n_pulses)
+
+    intercept, coef, score = fit_sync_alignment(sync_behav, sync_neural, score_thresh)
+    save_json({'intercept' : float(intercept), 'coef' : float(coef), 'score' : float(score)},
+              'alignment', paths.alignment)
+
+
+def _validate_nwbfile(item, folder):
+    """Validate an NWB file."""
+
+    from hsntools.io.nwb import validate_nwbfile
+
+    validate_nwbfile(item, folder, raise_error=True)
+
+
+## UTILITIES
+
+def _get_sessions(args):
+    """Get the selected set of sessions for a project."""
+
+    sessions = {make_session_name(*key) : key for key in find_sessions(args.project)}
+
+    return [sessions[name] for name in select_items(list(sessions), args.include, args.exclude)]
+
+
+def _get_channel_sizes(inventory, user, polarities):
+    """Get the total size of the input files used to extract each channel of an inventory.
+
+    The size of each channel is the size of the spike data file, if any polarity is used,
+    plus the size of each used sorting file.
+    """
+
+    data_sizes, sort_sizes = {}, {}
+    for channel, polarity, cur_user, data_size, sort_size in zip(\
+        *[inventory[field] for field in ['channel', 'polarity', 'user',
+                                         'data_size', 'sort_size']]):
+        sort_sizes.setdefault(channel, 0)
+        if cur_user == user and polarity in polarities:
+            data_sizes[channel] = data_size
+            sort_sizes[channel] += sort_size
+
+    return {channel : data_sizes.get(channel, 0) + sort_size \
+        for channel, sort_size in sort_sizes.items()}
+
+
+def _run(args, command, steps, items, resume=True):
+    """Run a set of steps across items with the pipeline runner, and report the outcome.
+
+    If `resume` is False, all items are run, and the checkpoint only records the outcome.
+    """
+
+    checkpoint = args.checkpoint if args.checkpoint else \
+        args.project / 'info' / 'hsntools_{}_checkpoint.json'.format(command)
+    os.makedirs(Path(checkpoint).parent, exist_ok=True)
+    if (args.rerun or not resume) and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    status = run_pipeline(steps, items, checkpoint, error_folder=Path(checkpoint).parent,
+                          n_jobs=args.jobs, retries=args.retries, verbose=not args.quiet)
+
+    n_failed = sum(any(val != 'success' for val in cur.values()) for cur in status.values())
+    print_status(not args.quiet, 'Completed {}: {} items, {} failed.'.format(\
+        command, len(status), n_failed), 0)
+
+    return 1 if n_failed else 0
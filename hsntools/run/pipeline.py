@@ -0,0 +1,180 @@
+"""Functionality for running resumable, multi-step processing pipelines."""
+
+import os
+import time
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from hsntools.io.files import save_jsonlines, iter_jsonlines
+from hsntools.io.utils import check_ext
+from hsntools.run.log import print_status
+from hsntools.run.errors import catch_error
+
+###################################################################################################
+###################################################################################################
+
+def run_pipeline(steps, items, checkpoint_file, error_folder=None, n_jobs=1,
+                 retries=0, verbose=True):
+    """Run a set of processing steps across a set of items, with checkpointing of progress.
+
+    Parameters
+    ----------
+    steps : list of tuple of (str, callable)
+        The processing steps to run, as (name, function) pairs, in the order to run them.
+        Each function is called with an item as the only input.
+    items : list
+        The items, such as session labels, to run the processing steps for.
+    checkpoint_file : str or Path
+        File to store the checkpoint record to. Saved as a JSON lines file.
+    error_folder : str or Path, optional
+        Folder to save error logs to, for any failed steps.
+    n_jobs : int, optional, default: 1
+        Number of processes to use to run items in parallel.
+    retries : int, optional, default: 0
+        Number of times to re-try a failed step before it is marked as failed.
+    verbose : bool, optional, default: True
+        Whether to print out information.
+
+    Returns
+    -------
+    status : dict
+        The status of each step for each item, as {item_label : {step : status}}.
+
+    Notes
+    -----
+    - For each item, steps are run in order, and if a step fails, remaining steps are skipped.
+    - On a re-run with the same checkpoint file, any steps already completed are skipped,
+      and any previously failed steps are run again.
+    - When running in parallel, step functions and items need to be picklable.
+    - The error message of each failed step is stored in the checkpoint record, which can be
+      loaded with `load_checkpoint`. Full tracebacks are saved if `error_folder` is given.
+    """
+
+    checkpoint = load_checkpoint(checkpoint_file)
+
+    to_run = {}
+    for item in items:
+        label = make_item_label(item)
+        completed = [step for step, record in checkpoint.get(label, {}).items() \
+            if record['status'] == 'success']
+        if any(name not in completed for name, _ in steps):
+            to_run[label] = (item, completed)
+
+    print_status(verbose, 'Running pipeline: {} of {} items to run.'.format(\
+        len(to_run), len(items)), 0)
+
+    if n_jobs > 1 and len(to_run) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(_run_item, item, steps, completed, error_folder,
+                                       retries, verbose) for item, completed in to_run.values()]
+            for future in as_completed(futures):
+                _record_results(future.result(), checkpoint_file, checkpoint)
+    else:
+        for item, completed in to_run.values():
+            _record_results(_run_item(item, steps, completed, error_folder, retries, verbose),
+                            checkpoint_file, checkpoint)
+
+    status = {}
+    for item in items:
+        label = make_item_label(item)
+        status[label] = {name : checkpoint.get(label, {}).get(name, {}).get('status') \
+            for name, _ in steps}
+
+    return status
+
+
+def load_checkpoint(checkpoint_file):
+    """Load a pipeline checkpoint record.
+
+    Parameters
+    ----------
+    checkpoint_file : str or Path
+        The checkpoint file to load.
+
+    Returns
+    -------
+    checkpoint : dict
+        The latest record for each step of each item, as {item_label : {step : record}}.
+        Each record includes the `status`, the `time` taken, the number of `attempts`,
+        and the `error` message of the last failed attempt, if the step failed.
+    """
+
+    checkpoint = {}
+    if os.path.exists(check_ext(str(checkpoint_file), '.json')):
+        for _, record in iter_jsonlines(str(checkpoint_file)):
+            checkpoint.setdefault(record['item'], {})[record['step']] = record
+
+    return checkpoint
+
+
+def make_item_label(item):
+    """Make a label for an item, to use in the checkpoint record.
+
+    Parameters
+    ----------
+    item : str or int or tuple
+        The item to make a label for.
+
+    Returns
+    -------
+    str
+        The item label. Tuples are joined with commas.
+
+    Notes
+    -----
+    Each element is percent-encoded, such that commas, and any other characters that are not
+    letters, digits or any of '_.-~', are escaped, so that different items get different labels.
+    """
+
+    items = item if isinstance(item, tuple) else (item,)
+
+    return ','.join(quote(str(el), safe='') for el in items)
+
+
+def _run_item(item, steps, completed, error_folder, retries, verbose):
+    """Run all the non-completed processing steps for an item."""
+
+    label = make_item_label(item)
+
+    records = []
+    for name, func in steps:
+
+        if name in completed:
+            continue
+
+        record = {'item' : label, 'step' : name, 'status' : 'failed', 'time' : None,
+                  'error' : None}
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                func(item)
+                record['status'] = 'success'
+                record['error'] = None
+            except Exception as error:
+                record['error'] = '{}: {}'.format(type(error).__name__, error)
+                if error_folder:
+                    catch_error(True, '{}_{}'.format(label, name), error_folder, verbose=verbose,
+                                message='ISSUE WITH STEP {} FOR: {}'.format(name, label),
+                                print_level=1)
+            record['time'] = time.perf_counter() - start
+            record['attempts'] = attempt + 1
+            if record['status'] == 'success':
+                break
+
+        records.append(record)
+        print_status(verbose, '{:10s} {:20s} {}'.format(record['status'], name, label), 1)
+        if record['error']:
+            print_status(verbose, record['error'], 2)
+        if record['status'] != 'success':
+            break
+
+    return records
+
+
+def _record_results(records, checkpoint_file, checkpoint):
+    """Add a set of step records to the checkpoint file and record."""
+
+    save_jsonlines([{record['item'] + '::' + record['step'] : record} for record in records],
+                   str(checkpoint_file))
+    for record in records:
+        checkpoint.setdefault(record['item'], {})[record['step']] = record
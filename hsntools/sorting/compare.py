@@ -0,0 +1,200 @@
+"""Functions for comparing spike sorting curations from different users."""
+
+import os
+from pathlib import Path
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from hsntools.io.utils import get_subfolders
+from hsntools.io.sorting import load_combinato_sorting_file
+from hsntools.sorting.utils import get_group_labels
+
+###################################################################################################
+###################################################################################################
+
+def compute_confusion_matrix(index1, labels1, index2, labels2):
+    """Compute the confusion matrix between two cluster assignments, over their shared spikes.
+
+    Parameters
+    ----------
+    index1, index2 : 1d array
+        Spike indices (into the spike data) for each set of cluster assignments.
+    labels1, labels2 : 1d array
+        Cluster label for each spike, for each set of cluster assignments.
+
+    Returns
+    -------
+    confusion : 2d array
+        The number of shared spikes with each combination of labels, as [n_labels1, n_labels2].
+    clusters1, clusters2 : 1d array
+        The labels corresponding to the rows and columns of the confusion matrix.
+    """
+
+    _, inds1, inds2 = np.intersect1d(index1, index2, assume_unique=True, return_indices=True)
+
+    clusters1, inverse1 = np.unique(labels1[inds1], return_inverse=True)
+    clusters2, inverse2 = np.unique(labels2[inds2], return_inverse=True)
+
+    confusion = np.bincount(inverse1.ravel() * len(clusters2) + inverse2.ravel(),
+                            minlength=len(clusters1) * len(clusters2))
+    confusion = confusion.reshape(len(clusters1), len(clusters2))
+
+    return confusion, clusters1, clusters2
+
+
+def compute_agreement(confusion, clusters1, clusters2, match_thresh=0.5):
+    """Compute agreement between two cluster assignments, from their confusion matrix.
+
+    Parameters
+    ----------
+    confusion : 2d array
+        The confusion matrix between two cluster assignments.
+    clusters1, clusters2 : 1d array
+        The labels corresponding to the rows and columns of the confusion matrix.
+    match_thresh : float, optional, default: 0.5
+        The minimum score for a pair of clusters to be considered a match.
+
+    Returns
+    -------
+    agreement : dict
+        Agreement measures, including:
+
+        * `scores` : the score for each pair of valid clusters, as [n_valid1, n_valid2]
+        * `matches` : list of matched pairs of cluster labels, as (label1, label2)
+        * `n_clusters1`, `n_clusters2` : the number of valid clusters in each assignment
+        * `n_matched` : the number of matched clusters
+        * `agreement` : the fraction of shared spikes that are in matched clusters
+
+    Notes
+    -----
+    Valid clusters are those with a group label above 0, excluding the unassigned (0) and
+    artifact (-1) groups. The score for a pair of clusters is the number of spikes they share,
+    divided by the number of spikes in either (the Jaccard index). As scores are above 0.5,
+    each cluster can be matched to at most one other cluster.
+    """
+
+    valid1 = clusters1 > 0
+    valid2 = clusters2 > 0
+
+    counts1 = confusion.sum(axis=1)[valid1]
+    counts2 = confusion.sum(axis=0)[valid2]
+    shared = confusion[np.ix_(valid1, valid2)]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = shared / (counts1[:, None] + counts2[None, :] - shared)
+    scores = np.nan_to_num(scores)
+
+    rows, cols = np.nonzero(scores > match_thresh)
+    total = confusion.sum()
+
+    agreement = {
+        'scores' : scores,
+        'matches' : list(zip(clusters1[valid1][rows].tolist(), clusters2[valid2][cols].tolist())),
+        'n_clusters1' : int(valid1.sum()),
+        'n_clusters2' : int(valid2.sum()),
+        'n_matched' : len(rows),
+        'agreement' : shared[rows, cols].sum() / total if total else np.nan,
+    }
+
+    return agreement
+
+
+def compare_users(channel, folder, polarity, users, match_thresh=0.5):
+    """Compare the spike sorting curations of multiple users for a channel.
+
+    Parameters
+    ----------
+    channel : int or str
+        The channel number / label to compare.
+    folder : str or Path
+        The folder location of the sorting data.
+    polarity : {'neg', 'pos'}
+        Which polarity of sorting results to compare.
+    users : list of str
+        The 3 character user labels to compare.
+    match_thresh : float, optional, default: 0.5
+        The minimum score for a pair of clusters to be considered a match.
+
+    Returns
+    -------
+    comparisons : dict
+        Comparison for each pair of users, keyed by (user1, user2).
+        Each comparison includes the `confusion` matrix, the cluster (group) labels of the
+        matrix rows and columns, as `clusters1` and `clusters2`, the number of shared spikes,
+        as `n_shared`, and all the agreement measures from `compute_agreement`.
+
+    Notes
+    -----
+    Spikes are compared based on the indices of the spikes in the spike data file, such that
+    spikes that are excluded as artifacts before clustering are not included in comparisons.
+    """
+
+    labels = {}
+    for user in users:
+        sort_data = load_combinato_sorting_file(channel, folder, polarity, user)
+        labels[user] = (sort_data['index'],
+                        get_group_labels(sort_data['classes'], sort_data['groups']))
+
+    comparisons = {}
+    for user1, user2 in combinations(users, 2):
+        confusion, clusters1, clusters2 = compute_confusion_matrix(*labels[user1], *labels[user2])
+        comparisons[(user1, user2)] = {'confusion' : confusion, 'clusters1' : clusters1,
+                                       'clusters2' : clusters2, 'n_shared' : confusion.sum()}
+        comparisons[(user1, user2)].update(\
+            compute_agreement(confusion, clusters1, clusters2, match_thresh))
+
+    return comparisons
+
+
+def compare_session_users(folder, users, polarity='neg', channels=None, match_thresh=0.5,
+                          n_jobs=1):
+    """Compare the spike sorting curations of multiple users across the channels of a session.
+
+    Parameters
+    ----------
+    folder : str or Path
+        The folder location of the sorting data.
+    users : list of str
+        The 3 character user labels to compare.
+    polarity : {'neg', 'pos'}
+        Which polarity of sorting results to compare.
+    channels : list of str, optional
+        The channels to compare. If not provided, uses all channels sorted by all users.
+    match_thresh : float, optional, default: 0.5
+        The minimum score for a pair of clusters to be considered a match.
+    n_jobs : int, optional, default: 1
+        Number of processes to use to compare channels in parallel.
+
+    Returns
+    -------
+    summary : dict
+        A table of comparisons, with a list of values per channel and user pair, including
+        the `channel`, `user1`, `user2`, `n_shared`, `n_clusters1`, `n_clusters2`,
+        `n_matched`, and `agreement`, which can be converted with `pd.DataFrame(summary)`.
+    """
+
+    if channels is None:
+        channels = [channel for channel in get_subfolders(folder, select='chan_') \
+            if all(os.path.exists(Path(folder) / channel / 'sort_{}_{}'.format(polarity, user)) \
+                for user in users)]
+
+    args = [(channel, folder, polarity, users, match_thresh) for channel in channels]
+    if n_jobs > 1 and len(channels) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            outputs = list(executor.map(compare_users, *zip(*args)))
+    else:
+        outputs = [compare_users(*cur_args) for cur_args in args]
+
+    fields = ['n_shared', 'n_clusters1', 'n_clusters2', 'n_matched', 'agreement']
+    summary = {label : [] for label in ['channel', 'user1', 'user2'] + fields}
+    for channel, comparisons in zip(channels, outputs):
+        for (user1, user2), comparison in comparisons.items():
+            summary['channel'].append(str(channel))
+            summary['user1'].append(user1)
+            summary['user2'].append(user2)
+            for field in fields:
+                summary[field].append(comparison[field])
+
+    return summary
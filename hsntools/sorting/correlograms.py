@@ -0,0 +1,140 @@
+"""Functions for computing auto- and cross-correlograms of units."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from hsntools.sorting.utils import group_units
+from hsntools.modutils.instrument import instrument
+
+###################################################################################################
+###################################################################################################
+
+def compute_correlograms(times, bin_size, window, fs=None):
+    """Compute the auto- and cross-correlograms between all pairs of a set of units.
+
+    Parameters
+    ----------
+    times : list of 1d array
+        Spike times for each unit.
+    bin_size : float
+        The width of each correlogram bin, in the units of `times`.
+    window : float
+        The maximum lag to compute correlograms for, in the units of `times`.
+        Rounded up to a whole number of bins.
+    fs : float, optional
+        Sampling rate, in samples per unit of time, used to convert times to integer samples.
+        If not provided, times are assumed to already be integer sample values.
+
+    Returns
+    -------
+    correlograms : 3d array
+        The correlogram counts, as [n_units, n_units, n_bins].
+        Entry [ii, jj] counts the spikes of unit jj at each lag relative to the spikes of unit ii.
+        The diagonal entries are the autocorrelograms, which exclude zero-lag self-pairs.
+    bins : 1d array
+        The bin edges of the correlograms, in the units of `times`, with length n_bins + 1.
+
+    Notes
+    -----
+    Spike times of all units are merged into a single sorted array of integer samples, and
+    spike pairs are found by sweeping across increasing offsets in the sorted array, keeping
+    only spikes that still have a following spike within the window. This takes O(n log n + p)
+    time, for n spikes and p spike pairs within the window, rather than O(n^2).
+    """
+
+    scale = fs if fs else 1
+    bin_samples = max(int(round(bin_size * scale)), 1)
+    n_half = int(np.ceil(round(window * scale) / bin_samples))
+    n_bins = 2 * n_half
+    max_lag = n_half * bin_samples
+
+    n_units = len(times)
+    labels = np.repeat(np.arange(n_units, dtype=np.int64), [len(cur) for cur in times])
+    samples = np.concatenate([np.round(np.asarray(cur) * scale).astype(np.int64) \
+        for cur in times]) if n_units else np.array([], dtype=np.int64)
+
+    order = np.argsort(samples, kind='stable')
+    samples = samples[order]
+    labels = labels[order]
+
+    counts = np.zeros(n_units * n_units * n_bins, dtype=np.int64)
+    candidates = np.arange(len(samples) - 1)
+    offset = 1
+    while candidates.size:
+
+        candidates = candidates[candidates + offset < len(samples)]
+        lags = samples[candidates + offset] - samples[candidates]
+        in_window = lags < max_lag
+        candidates, lags = candidates[in_window], lags[in_window]
+
+        first, second = labels[candidates], labels[candidates + offset]
+        counts += np.bincount((first * n_units + second) * n_bins + n_half + lags // bin_samples,
+                              minlength=counts.size)
+        counts += np.bincount((second * n_units + first) * n_bins + n_half + \
+                              np.floor_divide(-lags, bin_samples), minlength=counts.size)
+        offset += 1
+
+    correlograms = counts.reshape(n_units, n_units, n_bins)
+    bins = np.arange(-n_half, n_half + 1) * bin_samples / scale
+
+    return correlograms, bins
+
+
+@instrument()
+def compute_unit_correlograms(units, bin_size=1., window=50., fs=None, electrodes=None,
+                              n_jobs=1):
+    """Compute correlograms for all units, and all pairs of units within each bundle.
+
+    Parameters
+    ----------
+    units : list of dict
+        List of dictionaries containing information for each unit, as from `load_units`.
+        Each unit should include the keys: `channel`, `times`.
+    bin_size : float, optional, default: 1.
+        The width of each correlogram bin, in the units of spike times.
+    window : float, optional, default: 50.
+        The maximum lag to compute correlograms for, in the units of spike times.
+    fs : float, optional
+        Sampling rate, in samples per unit of time, used to convert times to integer samples.
+        If not provided, times are assumed to already be integer sample values.
+    electrodes : Electrodes, optional
+        Electrode definition, used to group units by bundle, with channels defined.
+        If not provided, all units are computed as a single group.
+    n_jobs : int, optional, default: 1
+        Number of processes to use to compute bundles in parallel.
+
+    Returns
+    -------
+    correlograms : dict
+        Correlograms for each bundle, as {bundle : {'units' : list, 'correlograms' : 3d array}},
+        where `units` are the indices of the units in the bundle, which index the correlograms.
+    bins : 1d array
+        The bin edges of the correlograms, in the units of spike times.
+
+    Examples
+    --------
+    Compute correlograms for units recorded at 32 kHz, with spike times in ms, using 1 ms bins:
+
+    >>> units = [{'channel' : 'chan_0', 'times' : np.array([10., 12.5, 40.])},
+    ...          {'channel' : 'chan_1', 'times' : np.array([11., 45.])}]
+    >>> correlograms, bins = compute_unit_correlograms(units, 1., 10., fs=32)
+    >>> correlograms[None]['correlograms'].shape
+    (2, 2, 20)
+    """
+
+    groups = group_units(units, electrodes)
+
+    args = [([units[ind]['times'] for ind in inds], bin_size, window, fs) \
+        for inds in groups.values()]
+    if n_jobs > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            outputs = list(executor.map(compute_correlograms, *zip(*args)))
+    else:
+        outputs = [compute_correlograms(*cur_args) for cur_args in args]
+
+    correlograms = {bundle : {'units' : inds, 'correlograms' : output[0]} \
+        for (bundle, inds), output in zip(groups.items(), outputs)}
+    bins = outputs[0][1] if outputs else compute_correlograms([], bin_size, window, fs)[1]
+
+    return correlograms, bins
@@ -0,0 +1,167 @@
+"""Functions for detecting duplicate units, recorded across channels of the same bundle."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from hsntools.sorting.utils import group_units
+from hsntools.modutils.instrument import instrument
+
+###################################################################################################
+###################################################################################################
+
+@instrument()
+def find_duplicate_units(units, electrodes=None, tolerance=0.5, min_fraction=0.5,
+                         cross_channel=True, n_jobs=1):
+    """Find pairs of units with excess near-coincident spikes, within electrode bundles.
+
+    Parameters
+    ----------
+    units : list of dict
+        List of dictionaries containing information for each unit, as from `load_units`.
+        Each unit should include the keys: `channel`, `times`.
+    electrodes : Electrodes, optional
+        Electrode definition, used to group units by bundle, with channels defined.
+        If not provided, all units are compared as a single group.
+    tolerance : float, optional, default: 0.5
+        The maximum time difference for a pair of spikes to be considered coincident.
+        Should be in the same units as spike times. The default is 0.5 ms, for times in ms.
+    min_fraction : float, optional, default: 0.5
+        The minimum fraction of excess coincident spikes, above the number expected for
+        independent units, relative to the unit with fewer spikes, for a pair of units to be
+        considered duplicates.
+    cross_channel : bool, optional, default: True
+        Whether to only compare pairs of units that are from different channels.
+    n_jobs : int, optional, default: 1
+        Number of processes to use to process bundles in parallel.
+
+    Returns
+    -------
+    duplicates : dict
+        A table of the detected duplicate pairs, with a list of values per pair, including:
+
+        * `unit1`, `unit2` : the index of each unit of the pair, in `units`
+        * `channel1`, `channel2` : the channel of each unit of the pair
+        * `bundle` : the bundle the pair of units is from, or None if no electrodes are given
+        * `n_coincident` : the number of coincident spike pairs
+        * `n_expected` : the expected number of coincident spike pairs, for independent units
+        * `fraction` : the number of excess coincident spikes, above `n_expected`,
+          relative to the unit with fewer spikes
+
+    Notes
+    -----
+    For each bundle, the spike times of all units are merged into a single sorted array,
+    and coincident spikes are found by comparing each spike to the following spikes within
+    the tolerance window. This takes O(n log n) time, for n spikes in the bundle, compared
+    to checking each pair of units separately.
+
+    The expected number of coincident spike pairs, for independent units, is computed from the
+    spike counts of each unit, assuming uniform firing across the time span of the bundle.
+    If the time span is zero, no coincidences are expected.
+    """
+
+    groups = group_units(units, electrodes)
+
+    args = []
+    for inds in groups.values():
+        args.append(([units[ind]['times'] for ind in inds],
+                     [str(units[ind]['channel']) for ind in inds],
+                     tolerance, min_fraction, cross_channel))
+
+    if n_jobs > 1 and len(args) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            outputs = list(executor.map(_find_group_duplicates, *zip(*args)))
+    else:
+        outputs = [_find_group_duplicates(*cur_args) for cur_args in args]
+
+    fields = ['unit1', 'unit2', 'channel1', 'channel2', 'bundle',
+              'n_coincident', 'n_expected', 'fraction']
+    duplicates = {field : [] for field in fields}
+    for (bundle, inds), pairs in zip(groups.items(), outputs):
+        for pair in pairs:
+            duplicates['unit1'].append(inds[pair['unit1']])
+            duplicates['unit2'].append(inds[pair['unit2']])
+            duplicates['bundle'].append(bundle)
+            for field in fields[2:4] + fields[5:]:
+                duplicates[field].append(pair[field])
+
+    return duplicates
+
+
+def count_coincidences(times, tolerance):
+    """Count near-coincident spikes between all pairs of a set of units.
+
+    Parameters
+    ----------
+    times : list of 1d array
+        Spike times for each unit.
+    tolerance : float
+        The maximum time difference for a pair of spikes to be considered coincident.
+
+    Returns
+    -------
+    coincidences : 2d array
+        The number of coincident spike pairs between each pair of units, as [n_units, n_units].
+        The array is symmetric, and the diagonal (spikes within the same unit) is zero.
+    """
+
+    n_units = len(times)
+    labels = np.repeat(np.arange(n_units), [len(cur) for cur in times])
+    all_times = np.concatenate(times) if n_units else np.array([])
+
+    order = np.argsort(all_times, kind='stable')
+    all_times = all_times[order]
+    labels = labels[order]
+
+    # Step through lags in the sorted array, keeping only spikes with a following spike in range
+    counts = np.zeros(n_units * n_units, dtype=np.int64)
+    candidates = np.arange(len(all_times) - 1)
+    lag = 1
+    while candidates.size:
+        candidates = candidates[candidates + lag < len(all_times)]
+        candidates = candidates[all_times[candidates + lag] - all_times[candidates] <= tolerance]
+        first, second = labels[candidates], labels[candidates + lag]
+        counts += np.bincount(first * n_units + second, minlength=n_units * n_units)
+        lag += 1
+
+    counts = counts.reshape(n_units, n_units)
+    coincidences = counts + counts.T
+    np.fill_diagonal(coincidences, 0)
+
+    return coincidences
+
+
+def _find_group_duplicates(times, channels, tolerance, min_fraction, cross_channel):
+    """Find duplicate pairs of units within a group of units."""
+
+    n_spikes = np.array([len(cur) for cur in times])
+    coincidences = count_coincidences(times, tolerance)
+
+    all_times = [cur for cur in times if len(cur)]
+    duration = max(cur.max() for cur in all_times) - min(cur.min() for cur in all_times) \
+        if all_times else 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = np.outer(n_spikes, n_spikes) * 2 * tolerance / duration if duration else \
+            np.zeros(coincidences.shape)
+        fractions = np.nan_to_num(np.clip(\
+            (coincidences - expected) / np.minimum.outer(n_spikes, n_spikes), 0., 1.))
+
+    mask = np.triu(fractions >= min_fraction, k=1)
+    if cross_channel:
+        channels = np.array(channels)
+        mask &= channels[:, None] != channels[None, :]
+
+    pairs = []
+    for ind1, ind2 in zip(*np.nonzero(mask)):
+        pairs.append({
+            'unit1' : int(ind1),
+            'unit2' : int(ind2),
+            'channel1' : str(channels[ind1]),
+            'channel2' : str(channels[ind2]),
+            'n_coincident' : int(coincidences[ind1, ind2]),
+            'n_expected' : float(expected[ind1, ind2]),
+            'fraction' : float(fractions[ind1, ind2]),
+        })
+
+    return pairs
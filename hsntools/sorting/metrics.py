@@ -0,0 +1,222 @@
+"""Quality metrics for spike sorted units, computed across all units together."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from hsntools.modutils.instrument import instrument
+
+###################################################################################################
+###################################################################################################
+
+@instrument()
+def compute_unit_metrics(times, index, waveforms=None, time_range=None, isi_threshold=1.5,
+                         n_presence_bins=100, n_amplitude_bins=500, chunk_size=10000, n_jobs=1):
+    """Compute quality metrics for a set of units.
+
+    Parameters
+    ----------
+    times : 1d array
+        Spike times from all units, concatenated across units.
+        Spike times within each unit should be sorted.
+    index : 1d array
+        The end position of each unit's spikes within `times`.
+    waveforms : 2d array or HDF5 dataset, optional
+        Spike waveforms, aligned to `times`, as [n_spikes, n_samples].
+        If provided, waveform based metrics are also computed.
+    time_range : list of [float, float], optional
+        The start and end time of the recording, used for firing rates and presence ratios.
+        If not provided, defaults to the range of all spike times.
+    isi_threshold : float, optional, default: 1.5
+        The threshold for counting inter-spike intervals as refractory period violations.
+        Should be in the same units as `times`. The default is 1.5 ms, for times in milliseconds.
+    n_presence_bins : int, optional, default: 100
+        The number of time bins to use to compute presence ratios.
+    n_amplitude_bins : int, optional, default: 500
+        The number of amplitude bins to use to compute amplitude cutoffs.
+    chunk_size : int, optional, default: 10000
+        The number of spike waveforms to process at a time.
+    n_jobs : int, optional, default: 1
+        Number of processes to use to compute metrics, with units split across processes.
+
+    Returns
+    -------
+    metrics : dict
+        A table of metrics, with a 1d array of values per unit for each metric, including:
+
+        * `n_spikes` : the number of spikes
+        * `firing_rate` : the firing rate, in spikes per unit of time
+        * `isi_violations` : the fraction of inter-spike intervals that are below `isi_threshold`
+        * `presence_ratio` : the fraction of time bins, across `time_range`, with any spikes
+        * `snr` : the peak-to-peak amplitude of the mean waveform, divided by the average
+          standard deviation of the waveforms across samples
+        * `amplitude_cutoff` : the estimated fraction of spikes missing due to the
+          detection threshold, estimated from the distribution of spike amplitudes
+
+        Waveform metrics (`snr` & `amplitude_cutoff`) are only included if waveforms are given.
+        Metrics that are undefined for a unit, such as for units without spikes, are NaN.
+
+    Notes
+    -----
+    - Inputs follow the ragged array format, as from `concatenate_units`, whereby the spikes of
+      unit `ii` are stored in `times[index[ii - 1]:index[ii]]` (with a start of 0 for `ii=0`).
+    - Waveforms are processed in chunks, so HDF5 datasets are read incrementally.
+      When using multiple processes, the waveforms for each process are read in full.
+    - Spike amplitudes, for the amplitude cutoff, are the maximum absolute value of each
+      waveform. The amplitude cutoff follows the approach from Hill et al., 2011, J Neurosci.
+    - The output can be converted to a dataframe, with `pd.DataFrame(metrics)`.
+    """
+
+    times = np.asarray(times)
+    index = np.asarray(index, dtype=np.int64)
+
+    if time_range is None:
+        time_range = [times.min(), times.max()] if times.size else [0., 0.]
+
+    settings = {'time_range' : time_range, 'isi_threshold' : isi_threshold,
+                'n_presence_bins' : n_presence_bins, 'n_amplitude_bins' : n_amplitude_bins,
+                'chunk_size' : chunk_size}
+
+    if n_jobs > 1 and len(index) > 1:
+
+        splits = _split_units(index, n_jobs)
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = []
+            for start_unit, end_unit in splits:
+                start = index[start_unit - 1] if start_unit else 0
+                end = index[end_unit - 1]
+                futures.append(executor.submit(\
+                    _compute_metrics, times[start:end], index[start_unit:end_unit] - start,
+                    waveforms[start:end] if waveforms is not None else None, **settings))
+            outputs = [future.result() for future in futures]
+
+        metrics = {label : np.concatenate([output[label] for output in outputs]) \
+            for label in outputs[0]}
+
+    else:
+        metrics = _compute_metrics(times, index, waveforms, **settings)
+
+    return metrics
+
+
+def _compute_metrics(times, index, waveforms, time_range, isi_threshold, n_presence_bins,
+                     n_amplitude_bins, chunk_size):
+    """Compute metrics for a set of units - all computations for a single process."""
+
+    n_units = len(index)
+    n_spikes = np.diff(index, prepend=0)
+    unit_ids = np.repeat(np.arange(n_units), n_spikes)
+    duration = time_range[1] - time_range[0]
+
+    metrics = {'n_spikes' : n_spikes}
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        metrics['firing_rate'] = n_spikes / duration if duration > 0 else \
+            np.full(n_units, np.nan)
+
+        # Refractory violations: ISIs between consecutive spikes of the same unit
+        same_unit = unit_ids[1:] == unit_ids[:-1]
+        violations = same_unit & (np.diff(times) < isi_threshold)
+        n_violations = np.bincount(unit_ids[:-1][violations], minlength=n_units)
+        metrics['isi_violations'] = n_violations / (n_spikes - 1)
+        metrics['isi_violations'][n_spikes < 2] = np.nan
+
+        # Presence ratio: occupancy of a (unit, time bin) grid
+        bins = np.floor((times - time_range[0]) / duration * n_presence_bins) \
+            if duration > 0 else np.zeros(len(times))
+        bins = np.clip(bins, 0, n_presence_bins - 1).astype(np.int64)
+        occupancy = np.zeros(n_units * n_presence_bins, dtype=bool)
+        occupancy[unit_ids * n_presence_bins + bins] = True
+        metrics['presence_ratio'] = occupancy.reshape(n_units, n_presence_bins).mean(axis=1)
+        metrics['presence_ratio'][n_spikes == 0] = np.nan
+
+    if waveforms is not None:
+        metrics.update(_compute_waveform_metrics(waveforms, unit_ids, n_spikes,
+                                                 n_amplitude_bins, chunk_size))
+
+    return metrics
+
+
+def _compute_waveform_metrics(waveforms, unit_ids, n_spikes, n_amplitude_bins, chunk_size):
+    """Compute waveform metrics, streaming across chunks of waveforms."""
+
+    n_units = len(n_spikes)
+    n_samples = waveforms.shape[1]
+
+    sums = np.zeros([n_units, n_samples])
+    squares = np.zeros([n_units, n_samples])
+    amplitudes = np.zeros(len(unit_ids))
+
+    for start in range(0, len(unit_ids), chunk_size):
+
+        chunk = np.asarray(waveforms[start:start + chunk_size], dtype=np.float64)
+        chunk_ids = unit_ids[start:start + chunk_size]
+
+        # Spikes are grouped by unit, so sum across each run of spikes from the same unit
+        runs = np.flatnonzero(np.r_[True, chunk_ids[1:] != chunk_ids[:-1]])
+        sums[chunk_ids[runs]] += np.add.reduceat(chunk, runs, axis=0)
+        squares[chunk_ids[runs]] += np.add.reduceat(chunk ** 2, runs, axis=0)
+        amplitudes[start:start + chunk_size] = np.abs(chunk).max(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = sums / n_spikes[:, None]
+        stds = np.sqrt(np.maximum(squares / n_spikes[:, None] - means ** 2, 0))
+        snr = np.ptp(means, axis=1) / stds.mean(axis=1)
+    snr[n_spikes == 0] = np.nan
+
+    return {'snr' : snr,
+            'amplitude_cutoff' : _compute_amplitude_cutoffs(amplitudes, unit_ids, n_spikes,
+                                                            n_amplitude_bins)}
+
+
+def _compute_amplitude_cutoffs(amplitudes, unit_ids, n_spikes, n_bins, sigma=3):
+    """Compute amplitude cutoffs for all units, from a (unit, amplitude bin) histogram."""
+
+    n_units = len(n_spikes)
+    cutoffs = np.full(n_units, np.nan)
+    if not len(amplitudes):
+        return cutoffs
+
+    # Compute per-unit amplitude histograms, with bins spanning each unit's amplitude range
+    lower = np.full(n_units, np.inf)
+    upper = np.full(n_units, -np.inf)
+    np.minimum.at(lower, unit_ids, amplitudes)
+    np.maximum.at(upper, unit_ids, amplitudes)
+    width = (upper - lower) / n_bins
+    width[~(width > 0)] = 1.
+
+    bins = np.clip(((amplitudes - lower[unit_ids]) / width[unit_ids]).astype(np.int64),
+                   0, n_bins - 1)
+    counts = np.bincount(unit_ids * n_bins + bins, minlength=n_units * n_bins)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pdf = counts.reshape(n_units, n_bins) / (n_spikes[:, None] * width[:, None])
+
+    # Smooth histograms with a gaussian kernel, reflecting at the edges
+    radius = int(4 * sigma + 0.5)
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    kernel = kernel / kernel.sum()
+    padded = np.pad(pdf, [(0, 0), (radius, radius)], mode='symmetric')
+    smoothed = sum(weight * padded[:, ind:ind + n_bins] for ind, weight in enumerate(kernel))
+
+    # Find the bin, above the peak, that best matches the density of the lowest bin, and
+    #   estimate the fraction missing as the density above this point (capped at 0.5)
+    peaks = np.argmax(smoothed, axis=1)
+    distance = np.abs(smoothed - smoothed[:, :1])
+    distance[np.arange(n_bins)[None, :] < peaks[:, None]] = np.inf
+    matches = np.argmin(distance, axis=1)
+    above = np.arange(n_bins)[None, :] >= matches[:, None]
+    fraction_missing = np.minimum((smoothed * above).sum(axis=1) * width, 0.5)
+
+    valid = n_spikes > 1
+    cutoffs[valid] = fraction_missing[valid]
+
+    return cutoffs
+
+
+def _split_units(index, n_splits):
+    """Split units into contiguous groups, with approximately equal numbers of spikes."""
+
+    bounds = np.searchsorted(index, np.linspace(0, index[-1], n_splits + 1)[1:-1], side='right')
+    bounds = np.unique(np.r_[0, bounds, len(index)])
+
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
@@ -1,13 +1,26 @@
 """Processing functions related to spike sorting / combinato files."""
 
+import os
+import re
+from pathlib import Path
+
 import numpy as np
 
-from hsntools.io.sorting import load_combinato_spike_file, load_combinato_sorting_file, save_units
+from hsntools.io.utils import hash_file
+from hsntools.io.files import save_jsonlines, load_jsonlines
+from hsntools.io.sorting import (load_combinato_spike_data, load_combinato_sorting_file,
+                                  save_units)
 from hsntools.sorting.utils import get_sorting_kept_labels, get_group_labels, extract_clusters
+from hsntools.modutils.instrument import instrument
 
 ###################################################################################################
 ###################################################################################################
 
+# File name of the extraction manifest, stored in the units folder
+MANIFEST_NAME = 'units_manifest.json'
+
+
+@instrument()
 def collect_all_sorting(spike_data, sort_data):
     """Collect together all the organized spike sorting information for a channel of data.
 
@@ -16,6 +29,7 @@ def collect_all_sorting(spike_data, sort_data):
     spike_data : dict
         Loaded data from the spike data file.
         Should include the keys: `times`, `waveforms`.
+        Waveforms can be an array, or a HDF5 dataset, from which only valid events are read.
     sort_data : dict
         Loaded sorting data from the spike sorting data file.
         Should include the keys: `index`, `classes`, `groups`.
@@ -39,17 +53,21 @@ def collect_all_sorting(spike_data, sort_data):
     - spike events detected but excluded from sorting due to being listed as artifact
     - spike events entered into sorting, but that are unassigned to a group
     - spike events sorted into a group, but who's group was listed as an artifact
+
+    The index of valid events into the spike data is composed up front, so that each output
+    is gathered with a single selection, without intermediate copies of the spike data.
     """
 
     assert spike_data['channel'] == sort_data['channel'], "Data file channels do not match."
     assert spike_data['polarity'] == sort_data['polarity'], "Data file polarity does not match."
 
-    # Get the set of valid class & group labels, and make a mask
+    # Get the set of valid class & group labels, and the indices of valid sorted events
     valid_classes, valid_groups = get_sorting_kept_labels(sort_data['groups'])
-    class_mask = np.isin(sort_data['classes'], valid_classes)
+    keep = np.flatnonzero(np.isin(sort_data['classes'], valid_classes))
 
-    # Create a vector reflecting group assignment of each spike
-    group_labels = get_group_labels(sort_data['classes'], sort_data['groups'])
+    # Compose the index of valid events into the spike data (which includes artifacts)
+    spike_index = sort_data['index'][keep]
+    classes = sort_data['classes'][keep]
 
     outputs = {
 
@@ -58,19 +76,21 @@ def collect_all_sorting(spike_data, sort_data):
         'polarity' : spike_data['polarity'],
 
         # spike data collected as the non-artifact spikes, sub-selected for valid classes
-        'times' : spike_data['times'][sort_data['index']][class_mask],
-        'waveforms' : spike_data['waveforms'][sort_data['index'][class_mask], :],
+        'times' : spike_data['times'][spike_index],
+        'waveforms' : _gather_rows(spike_data['waveforms'], spike_index),
 
-        # spike sorting information collected as the valid class labels
-        'classes' : sort_data['classes'][class_mask],
-        'clusters' : group_labels[class_mask],
+        # spike sorting information collected as the valid class labels & group assignments
+        'classes' : classes,
+        'clusters' : get_group_labels(classes, sort_data['groups']),
     }
 
     return outputs
 
 
+@instrument()
 def process_combinato_data(channel, input_folder, polarity, user, units_folder,
-                           continue_on_fail=False, verbose=True):
+                           continue_on_fail=False, verbose=True, lazy_waveforms=False,
+                           incremental=False):
     """Helper function to run the process of going from combinato -> extracted units files.
 
     Parameters
@@ -79,8 +99,9 @@ def process_combinato_data(channel, input_folder, polarity, user, units_folder,
         The channel number / label of the file to load.
     input_folder : str or Path
         The folder location to load the spike data from.
-    polarity : {'neg', 'pos'}
+    polarity : {'neg', 'pos'} or list of {'neg', 'pos'}
         Which polarity of detected spikes to load.
+        If a list, all polarities are extracted in one pass, with a single open of the spike file.
     user : str
         The 3 character user label to load.
     output_folder : str or Path
@@ -89,27 +110,215 @@ def process_combinato_data(channel, input_folder, polarity, user, units_folder,
         Whether to continue when an error is encountered.
     verbose : bool, optional, default: True
         Whether to print out updates about the extraction.
+    lazy_waveforms : bool, optional, default: False
+        Whether to read only the waveforms of valid events from the spike data file,
+        rather than loading all waveforms into memory.
+    incremental : bool, optional, default: False
+        Whether to skip extraction if the input files are unchanged since the last extraction.
+        If True, an extraction manifest is used and updated in the units folder.
+
+    Returns
+    -------
+    extracted : bool
+        Whether the channel was extracted, which is False if skipped or if extraction failed.
+        When extracting multiple polarities, True if any polarity was extracted.
+
+    Notes
+    -----
+    For incremental extraction, the manifest records, per channel and polarity, the input file
+    paths, sizes, modification times and content hashes, and the units files that were saved.
+    Inputs with a changed modification time, but the same size & content, count as unchanged.
+    Stored content hashes are re-used for inputs with an unchanged size & modification time,
+    and otherwise each input file is hashed at most once per call.
+    On re-extraction, any previously saved units files that are no longer created are removed.
+
+    Units files for the channel saved under legacy names, without a polarity label, as
+    'times_chan_XX_uIND.h5', are removed when the channel is extracted.
+    A requested polarity that is not in the spike data file raises a ValueError.
     """
 
+    polarities = [polarity] if isinstance(polarity, str) else list(polarity)
+
+    # For incremental extraction, drop any polarities with unchanged inputs
+    entries = {}
+    if incremental:
+        manifest = load_manifest(units_folder)
+        known = {file_path : record for entry in manifest.values() \
+            for file_path, record in entry['inputs'].items()}
+        records = {}
+        for cur_polarity in list(polarities):
+            label = '{}_{}_{}'.format(_check_channel(channel), cur_polarity, user)
+            inputs = _get_input_records(_get_input_files(channel, input_folder, cur_polarity, user),
+                                        known, records)
+            entries[cur_polarity] = (label, inputs, manifest.get(label))
+            if entries[cur_polarity][2] and \
+                _check_unchanged(entries[cur_polarity][2], inputs, units_folder):
+                polarities.remove(cur_polarity)
+        if not polarities:
+            if verbose:
+                print('Skipping channel {:20s} - inputs unchanged'.format(str(channel)))
+            return False
+
     try:
 
-        # Load spike & sorting data
-        spike_data = load_combinato_spike_file(channel, input_folder, polarity)
-        sort_data = load_combinato_sorting_file(channel, input_folder, polarity, user)
+        # Load spike data, for all polarities, from a single open of the spike data file
+        spike_data = load_combinato_spike_data(channel, input_folder, polarities, lazy_waveforms)
+
+        n_units = 0
+        try:
+            missing = [pol for pol in polarities if pol not in spike_data]
+            if missing:
+                msg = 'Polarity(s) not found in the spike data file for channel {}: {}'
+                raise ValueError(msg.format(channel, missing))
+
+            for cur_polarity in polarities:
+
+                # Load sorting data, organize and collect extracted data, and extract clusters
+                sort_data = load_combinato_sorting_file(channel, input_folder, cur_polarity, user)
+                clusters = collect_all_sorting(spike_data[cur_polarity], sort_data)
+                units = extract_clusters(clusters)
 
-        # Organize and collect extracted data together, and extract unit clusters
-        clusters = collect_all_sorting(spike_data, sort_data)
-        units = extract_clusters(clusters)
+                # Save out extracted unit data
+                files = save_units(units, units_folder)
+                n_units += len(units)
 
-        # Save out extracted unit data
-        save_units(units, units_folder)
+                if incremental:
+                    label, inputs, entry = entries[cur_polarity]
+                    _update_manifest(label, inputs, files, entry, units_folder)
+
+        finally:
+            if lazy_waveforms:
+                for cur_polarity in polarities:
+                    if cur_polarity in spike_data:
+                        spike_data[cur_polarity]['waveforms'].file.close()
+
+        # Remove any units files for the channel saved under the legacy, polarity-free names
+        _remove_legacy_units(channel, units_folder)
 
         if verbose:
             print('Extracted channel {:20s} - found {:2d} clusters\t\t'.format(\
-                channel, len(units)))
+                str(channel), n_units))
 
     except:
         if not continue_on_fail:
             raise
         if verbose:
             print('Issue extracting channel: {}'.format(channel))
+        return False
+
+    return True
+
+
+def load_manifest(units_folder):
+    """Load the extraction manifest from a units folder.
+
+    Parameters
+    ----------
+    units_folder : str or Path
+        The folder of extracted units files.
+
+    Returns
+    -------
+    manifest : dict
+        The latest manifest entry for each extracted channel, keyed as 'CHANNEL_POLARITY_USER'.
+        Each entry includes the `inputs`, with the `size`, `mtime` and `hash` of each input file,
+        and the `units` files that were saved.
+        Empty if no manifest exists.
+    """
+
+    if not os.path.exists(Path(units_folder) / MANIFEST_NAME):
+        return {}
+
+    return load_jsonlines(MANIFEST_NAME, units_folder)
+
+
+def _check_channel(channel):
+    """Check a channel label, returning the channel folder name, as 'chan_XX'."""
+
+    channel = str(channel)
+
+    return channel if channel[:5] == 'chan_' else 'chan_' + channel
+
+
+def _remove_legacy_units(channel, units_folder):
+    """Remove units files for a channel that are named as 'times_chan_XX_uIND.h5'."""
+
+    pattern = re.compile(r'times_{}_u\d+\.h5$'.format(re.escape(_check_channel(channel))))
+    for file_name in os.listdir(units_folder):
+        if pattern.match(file_name):
+            os.remove(Path(units_folder) / file_name)
+
+
+def _get_input_files(channel, input_folder, polarity, user):
+    """Get the paths of the combinato input files for a channel."""
+
+    channel_folder = Path(input_folder) / _check_channel(channel)
+
+    return [str(channel_folder / 'data_{}.h5'.format(_check_channel(channel))),
+            str(channel_folder / 'sort_{}_{}'.format(polarity, user) / 'sort_cat.h5')]
+
+
+def _get_input_records(inputs, known, records):
+    """Get the size, modification time & content hash of a set of input files.
+
+    Hashes are re-used from `known` records for files with the same size & modification time,
+    and computed hashes are stored in `records`, so each file is hashed at most once.
+    Input files that do not exist are not included.
+    """
+
+    for file_path in inputs:
+        if file_path in records or not os.path.exists(file_path):
+            continue
+        stat = os.stat(file_path)
+        record = {'size' : stat.st_size, 'mtime' : stat.st_mtime_ns}
+        previous = known.get(file_path)
+        if previous and previous['size'] == record['size'] and \
+            previous['mtime'] == record['mtime']:
+            record['hash'] = previous['hash']
+        else:
+            record['hash'] = hash_file(file_path)
+        records[file_path] = record
+
+    return {file_path : records[file_path] for file_path in inputs if file_path in records}
+
+
+def _check_unchanged(entry, inputs, units_folder):
+    """Check whether input files are unchanged, and units files exist, for a manifest entry."""
+
+    if sorted(entry['inputs']) != sorted(inputs):
+        return False
+
+    for file_path, record in inputs.items():
+        previous = entry['inputs'][file_path]
+        if record['size'] != previous['size'] or record['hash'] != previous['hash']:
+            return False
+
+    return all(os.path.exists(Path(units_folder) / file_name) for file_name in entry['units'])
+
+
+def _update_manifest(label, inputs, files, entry, units_folder):
+    """Remove stale units files from a previous extraction, and add a new manifest entry."""
+
+    if entry:
+        for file_name in set(entry['units']) - set(files):
+            if os.path.exists(Path(units_folder) / file_name):
+                os.remove(Path(units_folder) / file_name)
+
+    save_jsonlines([{label : {'inputs' : inputs, 'units' : files}}], MANIFEST_NAME, units_folder)
+
+
+def _gather_rows(data, index):
+    """Gather rows from an array or HDF5 dataset, reading HDF5 data with a sorted index."""
+
+    if isinstance(data, np.ndarray):
+        return data[index]
+
+    if not len(index):
+        return np.empty((0,) + data.shape[1:], dtype=data.dtype)
+
+    # HDF5 selections require increasing indices, so read sorted & unique rows, then re-order
+    if np.all(np.diff(index) > 0):
+        return data[index]
+    unique, inverse = np.unique(index, return_inverse=True)
+
+    return data[unique][inverse]
@@ -2,6 +2,8 @@
 
 import numpy as np
 
+from hsntools.modutils.instrument import instrument
+
 ###################################################################################################
 ###################################################################################################
 
@@ -60,13 +62,19 @@ def get_group_labels(class_labels, groups):
         Group label for each spike.
     """
 
-    group_labels = np.zeros(len(class_labels), dtype=int)
-    for ind, cval in enumerate(class_labels):
-        group_labels[ind] = groups[:, 1][cval == groups[:, 0]]
+    # Map class labels to groups, via a sorted lookup of the class labels in the groups array
+    order = np.argsort(groups[:, 0], kind='stable')
+    group_classes = groups[order, 0]
+    positions = np.clip(np.searchsorted(group_classes, class_labels), 0, len(order) - 1)
+    if len(class_labels) and not np.array_equal(group_classes[positions], class_labels):
+        raise ValueError('Some class labels are not defined in the groups array.')
+
+    group_labels = groups[order, 1][positions].astype(int)
 
     return group_labels
 
 
+@instrument()
 def extract_clusters(data):
     """Extract individual clusters from a channel of data.
 
@@ -98,3 +106,77 @@ def extract_clusters(data):
         clusters.append(cluster_info)
 
     return clusters
+
+
+def concatenate_units(units):
+    """Concatenate a list of units into a ragged array representation.
+
+    Parameters
+    ----------
+    units : list of dict
+        List of dictionaries containing information for each unit.
+        Each unit should include the keys: `ind`, `channel`, `polarity`, `times`.
+        If all units include `waveforms`, these are also concatenated.
+
+    Returns
+    -------
+    outputs : dict
+        Concatenated unit information, including:
+
+        * `times` : 1d array of spike times from all units, concatenated across units.
+        * `index` : 1d array of the end position of each unit's spikes within `times`.
+        * `waveforms` : 2d array of spike waveforms, aligned to `times`.
+          Only included if all units include waveforms.
+        * `ind`, `channel`, `polarity` : 1d arrays of the per-unit labels.
+
+    Notes
+    -----
+    The `index` follows the NWB convention for ragged arrays, whereby the spikes of
+    unit `ii` are stored in `times[index[ii - 1]:index[ii]]` (with a start of 0 for `ii=0`).
+    """
+
+    outputs = {
+        'times' : np.concatenate([unit['times'] for unit in units]) if units else np.array([]),
+        'index' : np.cumsum([len(unit['times']) for unit in units], dtype=np.int64),
+        'ind' : np.array([unit['ind'] for unit in units]),
+        'channel' : np.array([unit['channel'] for unit in units]),
+        'polarity' : np.array([unit['polarity'] for unit in units]),
+    }
+
+    if units and all('waveforms' in unit for unit in units):
+        outputs['waveforms'] = np.concatenate([unit['waveforms'] for unit in units])
+
+    return outputs
+
+
+def group_units(units, electrodes=None):
+    """Group units by the electrode bundle they were recorded from.
+
+    Parameters
+    ----------
+    units : list of dict
+        List of dictionaries containing information for each unit, as from `load_units`.
+        Each unit should include the key: `channel`.
+    electrodes : Electrodes, optional
+        Electrode definition, with channels defined, used to map unit channels to bundles.
+        If not provided, all units are returned as a single group.
+
+    Returns
+    -------
+    groups : dict
+        The indices of the units from each bundle, as {bundle : list of int}.
+        If no electrodes are given, the only key is None.
+    """
+
+    if electrodes is not None:
+        channels = np.array([int(str(unit['channel']).replace('chan_', '')) for unit in units],
+                            dtype=np.int64)
+        bundles = electrodes.lookup('probe', channels)
+    else:
+        bundles = [None] * len(units)
+
+    groups = {}
+    for ind, bundle in enumerate(bundles):
+        groups.setdefault(bundle, []).append(ind)
+
+    return groups
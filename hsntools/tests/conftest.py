@@ -36,9 +36,10 @@ def check_dir():
 
     # Make combinato format file structure for testing sorting files
     chan_dir = 'chan_{}'.format(TEST_SORT['channel'])
-    sort_dir = 'sort_{}_{}'.format(TEST_SORT['polarity'], TEST_SORT['user'])
     os.mkdir(TEST_PATHS['sorting'] / chan_dir)
-    os.mkdir(TEST_PATHS['sorting'] / chan_dir / sort_dir)
+    for polarity in ['neg', 'pos']:
+        sort_dir = 'sort_{}_{}'.format(polarity, TEST_SORT['user'])
+        os.mkdir(TEST_PATHS['sorting'] / chan_dir / sort_dir)
     os.mkdir(TEST_PATHS['sorting'] / 'units')
 
 ## TEST OBJECTS
@@ -65,6 +66,34 @@ def tunits():
         'clusters' : np.array([1, 2, 3, 1, 2]),
     }
 
+@pytest.fixture(scope='session')
+def tunits_list():
+    """Create a list of test units, including duplicate units across channels."""
+
+    rng = np.random.default_rng(0)
+    times = np.arange(5, 1000, 10.)
+    unit_times = {
+        'chan_0' : times,
+        'chan_1' : np.sort(times[:80] + rng.uniform(-0.2, 0.2, 80)),
+        'chan_2' : np.array([1., 2., 500.]),
+        'chan_8' : times[:60],
+        'chan_3' : np.array([]),
+        'chan_4' : np.sort(rng.uniform(0, 500, 200)),
+    }
+
+    template = -np.sin(np.linspace(0, np.pi, 32))
+    units = []
+    for ind, (channel, cur_times) in enumerate(unit_times.items()):
+        units.append({
+            'ind' : ind,
+            'channel' : channel,
+            'polarity' : 'neg',
+            'times' : cur_times,
+            'waveforms' : rng.normal(0, 0.1, [len(cur_times), 32]) + 5 * template,
+        })
+
+    yield units
+
 @pytest.fixture(scope='session')
 def tbundle():
     """Create a test bundle object."""
@@ -120,21 +149,23 @@ def spike_data_file():
 
     n_spikes = 5
     with open_h5file('data_chan_test.h5', full_path, mode='w') as h5file:
-        dgroup = h5file.create_group('neg')
-        dgroup.create_dataset('times', data=np.ones(n_spikes), dtype='f')
-        dgroup.create_dataset('spikes', data=np.ones([n_spikes, 64]), dtype='f')
-        dgroup.create_dataset('artifacts', data=np.ones(n_spikes), dtype='i')
+        for polarity in ['neg', 'pos']:
+            dgroup = h5file.create_group(polarity)
+            dgroup.create_dataset('times', data=np.ones(n_spikes), dtype='f')
+            dgroup.create_dataset('spikes', data=np.ones([n_spikes, 64]), dtype='f')
+            dgroup.create_dataset('artifacts', data=np.ones(n_spikes), dtype='i')
+        h5file.create_dataset('thr', data=np.array([[0, 100, 50]]), dtype='f')
 
 @pytest.fixture(scope='session', autouse=True)
 def sort_data_file():
     """Save out a test combinato spike sorting file."""
 
     chan_dir = 'chan_{}'.format(TEST_SORT['channel'])
-    sort_dir = 'sort_{}_{}'.format(TEST_SORT['polarity'], TEST_SORT['user'])
-    full_path = TEST_PATHS['sorting'] / chan_dir / sort_dir
 
-    n_spikes = 5
-    with open_h5file('sort_cat.h5', full_path, mode='w') as h5file:
-        h5file.create_dataset('groups', data=np.array([[0, 0], [1, -1], [2, 1]]), dtype='i')
-        h5file.create_dataset('index', data=np.array([0, 1, 2, 3, 4]), dtype='i')
-        h5file.create_dataset('classes', data=np.array([0, 1, 2, 0, 1]), dtype='i')
+    for polarity in ['neg', 'pos']:
+        sort_dir = 'sort_{}_{}'.format(polarity, TEST_SORT['user'])
+        full_path = TEST_PATHS['sorting'] / chan_dir / sort_dir
+        with open_h5file('sort_cat.h5', full_path, mode='w') as h5file:
+            h5file.create_dataset('groups', data=np.array([[0, 0], [1, -1], [2, 1]]), dtype='i')
+            h5file.create_dataset('index', data=np.array([0, 1, 2, 3, 4]), dtype='i')
+            h5file.create_dataset('classes', data=np.array([0, 1, 2, 0, 1]), dtype='i')
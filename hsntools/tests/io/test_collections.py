@@ -1,5 +1,8 @@
 """Tests for hsntools.io.collections"""
 
+import os
+
+import numpy as np
 import pandas as pd
 
 from hsntools.io.files import save_json
@@ -21,6 +24,35 @@ def test_load_jsons_to_df():
     assert isinstance(out, pd.DataFrame)
     assert len(out) == len(files)
 
-    # Test giving a file location
+    # Test giving a file location, which should skip non-JSON files, such as sidecar files
+    with open(TEST_FILE_PATH / 'test_json_c1.json.idx', 'w') as idx_file:
+        idx_file.write('')
     out = load_jsons_to_df(TEST_FILE_PATH)
     assert isinstance(out, pd.DataFrame)
+
+def test_load_jsons_to_df_nan():
+
+    save_json({'a' : np.nan, 'b' : 21}, 'test_json_nan', TEST_FILE_PATH)
+
+    out = load_jsons_to_df(['test_json_nan'], TEST_FILE_PATH, fast_json=True)
+    assert np.isnan(out['a'][0])
+
+def test_load_jsons_to_df_cache():
+
+    save_json({'a' : 12, 'b' : 21}, 'test_json_c1', TEST_FILE_PATH)
+    save_json({'a' : 13, 'b' : 31}, 'test_json_c2', TEST_FILE_PATH)
+
+    files = ['test_json_c1', 'test_json_c2']
+    cache_file = TEST_FILE_PATH / 'test_json_cache.pkl'
+
+    out1 = load_jsons_to_df(files, TEST_FILE_PATH, n_jobs=2, cache_file=cache_file)
+    assert os.path.exists(cache_file)
+
+    # Re-loading should use the snapshot, and update any changed files
+    #   The modification time is set explicitly, as quick writes may share the same time
+    mtime = os.stat(TEST_FILE_PATH / 'test_json_c2.json').st_mtime_ns
+    save_json({'a' : 14, 'b' : 41}, 'test_json_c2', TEST_FILE_PATH)
+    os.utime(TEST_FILE_PATH / 'test_json_c2.json', ns=(mtime + 10**9, mtime + 10**9))
+    out2 = load_jsons_to_df(files, TEST_FILE_PATH, cache_file=cache_file)
+    assert len(out2) == len(files)
+    assert list(out2['a']) == [12, 14]
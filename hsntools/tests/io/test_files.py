@@ -1,9 +1,13 @@
 """Tests for hsntools.io.files"""
 
 import os
+import hashlib
 
 import numpy as np
 import pandas as pd
+import scipy.io as sio
+
+from hsntools.io.h5 import open_h5file
 
 from hsntools.tests.tsettings import TEST_FILE_PATH
 
@@ -49,6 +53,33 @@ def test_save_jsonlines():
     save_jsonlines(data, f_name, TEST_FILE_PATH)
     assert os.path.exists(TEST_FILE_PATH / (f_name + '.json'))
 
+def test_save_jsonlines_index():
+
+    data = [{'B1' : {'a' : 12, 'b' : 21}},
+            {'B2' : {'a' : 21, 'b' : 12}}]
+    f_name = 'test_jsonlines_index'
+
+    save_jsonlines(data, f_name, TEST_FILE_PATH, index=True)
+    assert os.path.exists(TEST_FILE_PATH / (f_name + '.json.idx'))
+
+    save_jsonlines([{'B3' : {'a' : 0}}], f_name, TEST_FILE_PATH, index=True)
+    assert load_jsonlines_key('B3', f_name, TEST_FILE_PATH) == {'a' : 0}
+
+def test_jsonlines_index_rewrite():
+
+    f_name = 'test_jsonlines_rewrite'
+    if os.path.exists(TEST_FILE_PATH / (f_name + '.json')):
+        os.remove(TEST_FILE_PATH / (f_name + '.json'))
+
+    save_jsonlines([{'C1' : {'a' : 1}}, {'C2' : {'a' : 2}}], f_name, TEST_FILE_PATH, index=True)
+    assert load_jsonlines_key('C2', f_name, TEST_FILE_PATH) == {'a' : 2}
+
+    # Rewrite the file to the same size, with entries in a different order
+    os.remove(TEST_FILE_PATH / (f_name + '.json'))
+    save_jsonlines([{'C2' : {'a' : 3}}, {'C1' : {'a' : 4}}], f_name, TEST_FILE_PATH)
+    assert load_jsonlines_key('C2', f_name, TEST_FILE_PATH) == {'a' : 3}
+    assert load_jsonlines_key('C1', f_name, TEST_FILE_PATH) == {'a' : 4}
+
 def test_load_jsonlines():
 
     f_name = 'test_jsonlines'
@@ -56,3 +87,97 @@ def test_load_jsonlines():
     assert data
     assert isinstance(data, dict)
     assert isinstance(data[list(data.keys())[0]], dict)
+
+def test_iter_jsonlines():
+
+    f_name = 'test_jsonlines'
+    for key, value in iter_jsonlines(f_name, TEST_FILE_PATH):
+        assert isinstance(key, str)
+        assert isinstance(value, dict)
+
+def test_index_jsonlines():
+
+    f_name = 'test_jsonlines'
+    offsets = index_jsonlines(f_name, TEST_FILE_PATH)
+    assert set(offsets.keys()) == {'A1', 'A2'}
+    assert os.path.exists(TEST_FILE_PATH / (f_name + '.json.idx'))
+
+def test_load_jsonlines_key():
+
+    f_name = 'test_jsonlines'
+    assert load_jsonlines_key('A2', f_name, TEST_FILE_PATH) == {'a' : 21, 'b' : 12}
+
+    # Check the index is updated for lines appended without indexing
+    save_jsonlines([{'A3' : {'a' : 0}}], f_name, TEST_FILE_PATH)
+    assert load_jsonlines_key('A3', f_name, TEST_FILE_PATH) == {'a' : 0}
+
+def test_get_matfile_version():
+
+    f_name = 'test_matfile'
+    sio.savemat(TEST_FILE_PATH / (f_name + '.mat'), {'x' : np.arange(3), 'y' : np.ones(2)})
+    assert get_matfile_version(f_name, TEST_FILE_PATH) == '5'
+
+def test_load_matfile(monkeypatch):
+
+    f_name = 'test_matfile'
+    data = load_matfile(f_name, TEST_FILE_PATH)
+    assert 'x' in data and 'y' in data
+
+    data = load_matfile(f_name, TEST_FILE_PATH, variables='x')
+    assert 'x' in data and 'y' not in data
+
+    # Test caching, checking that the second load gets the same data
+    data1 = load_matfile(f_name, TEST_FILE_PATH, cache_folder=TEST_FILE_PATH)
+    data2 = load_matfile(f_name, TEST_FILE_PATH, cache_folder=TEST_FILE_PATH)
+    assert np.array_equal(data1['x'], data2['x'])
+    assert data1.keys() == data2.keys()
+    for key in data1:
+        assert type(data1[key]) is type(data2[key])
+
+    # Check that load options are part of the cache key
+    data3 = load_matfile(f_name, TEST_FILE_PATH, cache_folder=TEST_FILE_PATH, squeeze_me=True)
+    assert data3['x'].shape != data1['x'].shape
+
+    # Check the cache file is named by a hash of the file contents, and loads without pickle
+    with open(TEST_FILE_PATH / (f_name + '.mat'), 'rb') as mat_file:
+        cache_file = TEST_FILE_PATH / (hashlib.sha1(mat_file.read()).hexdigest() + '.npz')
+    with np.load(cache_file, allow_pickle=False) as cached:
+        assert '__structure__' in cached.files
+
+    # Check that the file is not re-hashed if it is unchanged
+    monkeypatch.setattr('hsntools.io.files.hash_file', None)
+    data4 = load_matfile(f_name, TEST_FILE_PATH, cache_folder=TEST_FILE_PATH)
+    assert np.array_equal(data1['x'], data4['x'])
+
+def test_load_matfile_cache_cells():
+
+    f_name = 'test_matfile_cells'
+    cells = np.empty(2, dtype=object)
+    cells[0], cells[1] = np.arange(2), 'text'
+    sio.savemat(TEST_FILE_PATH / (f_name + '.mat'), {'cells' : cells})
+
+    cache_folder = TEST_FILE_PATH / 'test_matfile_cache'
+    os.makedirs(cache_folder, exist_ok=True)
+    data1 = load_matfile(f_name, TEST_FILE_PATH, cache_folder=cache_folder)
+    data2 = load_matfile(f_name, TEST_FILE_PATH, cache_folder=cache_folder)
+    assert data1['cells'].dtype == data2['cells'].dtype == object
+
+def test_load_matfile73():
+
+    # Create a minimal v7.3 matfile, as an HDF5 file with a matfile header
+    f_name = 'test_matfile73'
+    with open_h5file(f_name, TEST_FILE_PATH, mode='w', ext='.mat', userblock_size=512) as h5file:
+        for label in ['x', 'y']:
+            dset = h5file.create_dataset(label, data=np.arange(3.))
+            dset.attrs['MATLAB_class'] = np.bytes_('double')
+    with open(TEST_FILE_PATH / (f_name + '.mat'), 'r+b') as mat_file:
+        mat_file.write(b'MATLAB 7.3 MAT-file'.ljust(116) + bytes(8) + b'\x00\x02IM')
+
+    assert get_matfile_version(f_name, TEST_FILE_PATH) == '7.3'
+
+    data = load_matfile(f_name, TEST_FILE_PATH, variables=['x'])
+    assert list(data.keys()) == ['x']
+
+    h5file = load_matfile(f_name, TEST_FILE_PATH, lazy=True)
+    assert np.array_equal(h5file['y'][:], np.arange(3.))
+    h5file.close()
@@ -1,9 +1,16 @@
 """Tests for hsntools.io.nwb"""
 
 import os
+from datetime import datetime
+from dateutil.tz import tzlocal
+
+import numpy as np
+
+from pynwb import NWBFile
 
 from hsntools.tests.tsettings import TEST_FILE_PATH
 
+from hsntools.objects.electrodes import Electrodes
 from hsntools.io.nwb import *
 
 ###################################################################################################
@@ -20,3 +27,42 @@ def test_load_nwbfile():
     test_fname = 'test_nwbfile'
     tnwbfile = load_nwbfile(test_fname, TEST_FILE_PATH)
     assert tnwbfile
+
+def test_add_units_bulk(tunits):
+
+    nwbfile = NWBFile('session_desc', 'session_id', datetime.now(tzlocal()))
+    device = nwbfile.create_device('test_device')
+    group = nwbfile.create_electrode_group('test_group', 'desc', 'location', device)
+    for ind in range(4):
+        nwbfile.add_electrode(group=group, location='location')
+
+    n_spikes = len(tunits['times'])
+    times = np.concatenate([tunits['times'], tunits['times'] + n_spikes])
+    index = np.array([n_spikes, 2 * n_spikes])
+    waveforms = np.concatenate([tunits['waveforms'], tunits['waveforms']])
+
+    units = add_units_bulk(nwbfile, times, index, waveforms, channels=['chan_0', 'chan_2'],
+                           full_waveforms=True)
+    assert len(units) == 2
+    assert np.array_equal(units['spike_times'][1], tunits['times'] + n_spikes)
+    assert np.array_equal(units['waveform_mean'][0], np.ones(64))
+    assert np.array_equal(units['electrodes'].target.data, np.array([0, 2]))
+
+    test_fname = 'test_nwbfile_units'
+    save_nwbfile(nwbfile, test_fname, TEST_FILE_PATH)
+    loaded = load_nwbfile(test_fname, TEST_FILE_PATH)
+    assert np.array_equal(loaded.units['spike_times'][0], tunits['times'])
+
+def test_get_electrode_rows(telectrodes):
+
+    rows = get_electrode_rows(['chan_1', 3])
+    assert np.array_equal(rows, np.array([1, 3]))
+
+    rows = get_electrode_rows(['chan_1', 3], telectrodes)
+    assert np.array_equal(rows, np.array([1, 3]))
+
+    electrodes = Electrodes()
+    electrodes.add_bundle('tname1', channels=list(range(10, 18)))
+    electrodes.add_bundle('tname2', channels=list(range(0, 8)))
+    rows = get_electrode_rows(['chan_10', 'chan_0'], electrodes)
+    assert np.array_equal(rows, np.array([0, 8]))
@@ -3,6 +3,9 @@
 import os
 from copy import deepcopy
 
+import numpy as np
+import h5py
+
 from hsntools.tests.tsettings import TEST_FILE_PATH, TEST_SORTING_PATH, TEST_SORT
 
 from hsntools.io.sorting import *
@@ -16,6 +19,26 @@ def test_load_combinato_spike_file():
     for label in ['channel', 'polarity', 'times', 'waveforms', 'artifacts']:
         assert label in sdata
 
+def test_load_combinato_spike_data():
+
+    sdata = load_combinato_spike_data('test', TEST_SORTING_PATH)
+    assert sdata['thr'] is not None
+    for polarity in ['neg', 'pos']:
+        assert sdata[polarity]['polarity'] == polarity
+        for label in ['channel', 'polarity', 'times', 'waveforms', 'artifacts']:
+            assert label in sdata[polarity]
+
+    sdata = load_combinato_spike_data('test', TEST_SORTING_PATH, ['neg'], lazy_waveforms=True)
+    assert 'pos' not in sdata
+    assert sdata['neg']['waveforms'].shape[0] == len(sdata['neg']['times'])
+    sdata['neg']['waveforms'].file.close()
+
+    # Check that the file is closed if no requested polarity is in the file
+    n_open = len(h5py.h5f.get_obj_ids(types=h5py.h5f.OBJ_FILE))
+    sdata = load_combinato_spike_data('test', TEST_SORTING_PATH, ['other'], lazy_waveforms=True)
+    assert 'other' not in sdata
+    assert len(h5py.h5f.get_obj_ids(types=h5py.h5f.OBJ_FILE)) == n_open
+
 def test_load_combinato_sorting_file():
 
     sdata = load_combinato_sorting_file(TEST_SORT['channel'], TEST_SORTING_PATH,
@@ -23,6 +46,32 @@ def test_load_combinato_sorting_file():
     for label in ['channel', 'polarity', 'groups', 'index', 'classes']:
         assert label in sdata
 
+def test_scan_combinato_folder():
+
+    inventory = scan_combinato_folder(TEST_SORTING_PATH)
+    n_rows = len(inventory['channel'])
+    assert n_rows
+    for field in ['polarity', 'user', 'data_size', 'sort_size', 'n_spikes', 'n_sorted']:
+        assert len(inventory[field]) == n_rows
+
+    ind = [(pol, user) for pol, user in zip(inventory['polarity'], inventory['user'])].index(\
+        (TEST_SORT['polarity'], TEST_SORT['user']))
+    assert inventory['channel'][ind] == 'chan_' + TEST_SORT['channel']
+    assert inventory['data_size'][ind] > 0 and inventory['sort_size'][ind] > 0
+    sdata = load_combinato_sorting_file(TEST_SORT['channel'], TEST_SORTING_PATH,
+                                        TEST_SORT['polarity'], TEST_SORT['user'])
+    assert inventory['n_sorted'][ind] == len(sdata['index'])
+    assert inventory['n_spikes'][ind] > 0
+
+    inventory = scan_combinato_folder(TEST_SORTING_PATH, counts=False)
+    assert set(inventory['n_spikes']) == {None}
+
+    # Check that folders that are not named as sorting outputs are skipped
+    other_folder = TEST_SORTING_PATH / ('chan_' + TEST_SORT['channel']) / 'sort_neg'
+    os.makedirs(other_folder, exist_ok=True)
+    assert scan_combinato_folder(TEST_SORTING_PATH, counts=False)['user'] == inventory['user']
+    os.rmdir(other_folder)
+
 def test_save_units(tunits):
 
     tunits2 = deepcopy(tunits)
@@ -30,8 +79,8 @@ def test_save_units(tunits):
 
     units = [tunits, tunits2]
     save_units(units, TEST_FILE_PATH)
-    assert os.path.exists(TEST_FILE_PATH / 'times_chan_0_u0.h5')
-    assert os.path.exists(TEST_FILE_PATH / 'times_chan_0_u1.h5')
+    assert os.path.exists(TEST_FILE_PATH / 'times_chan_0_neg_u0.h5')
+    assert os.path.exists(TEST_FILE_PATH / 'times_chan_0_neg_u1.h5')
 
 def test_load_units():
 
@@ -42,3 +91,76 @@ def test_load_units():
     for unit in units:
         for field in ['ind', 'channel', 'polarity', 'times', 'waveforms', 'classes']:
             assert field in unit
+
+def test_save_units_quantized(tunits):
+
+    folder = TEST_FILE_PATH / 'test_units_quantized'
+    os.mkdir(folder)
+
+    tunit = deepcopy(tunits)
+    tunit['waveforms'] = np.random.default_rng(0).normal(0, 50, [10, 64])
+
+    for ind, (waveform_dtype, compression) in enumerate(\
+        [('int16', None), ('float16', None), (None, 'gzip'), ('int16', 'gzip')]):
+        tunit['ind'] = ind
+        save_units([tunit], folder, waveform_dtype=waveform_dtype, compression=compression)
+
+    units = load_units(folder)
+    for unit in units:
+        assert unit['waveforms'].dtype == tunit['waveforms'].dtype
+        assert unit['waveforms'].shape == tunit['waveforms'].shape
+        if unit['ind'] in [0, 3]:
+            gain = np.ptp(tunit['waveforms']) / (2 * 32767)
+            assert np.max(np.abs(unit['waveforms'] - tunit['waveforms'])) <= gain / 2 + 1e-9
+        if unit['ind'] == 2:
+            assert np.array_equal(unit['waveforms'], tunit['waveforms'])
+
+def test_kilosort_units():
+
+    folder = TEST_SORTING_PATH / 'kilosort'
+    os.mkdir(folder)
+
+    rng = np.random.default_rng(0)
+    n_spikes, n_templates = 100, 3
+    templates = np.zeros([n_templates, 82, 4])
+    templates[0, 40, 1] = -1.
+    templates[1, 40, 1] = -0.8
+    templates[2, 40, 3] = 1.
+
+    spike_templates = rng.integers(0, n_templates, n_spikes).astype(np.uint32)
+    np.save(folder / 'spike_times.npy', np.sort(rng.integers(0, 30000 * 10, n_spikes))[:, None])
+    np.save(folder / 'spike_templates.npy', spike_templates)
+    np.save(folder / 'spike_clusters.npy', np.where(spike_templates == 1, 0, spike_templates))
+    np.save(folder / 'templates.npy', templates)
+    np.save(folder / 'amplitudes.npy', rng.uniform(10, 20, n_spikes))
+    np.save(folder / 'channel_map.npy', np.array([[10], [11], [12], [13]]))
+    with open(folder / 'params.py', 'w') as params_file:
+        params_file.write("dat_path = 'data.bin'\nsample_rate = 30000.\n")
+    with open(folder / 'cluster_group.tsv', 'w') as groups_file:
+        groups_file.write('cluster_id\tgroup\n0\tgood\n2\tnoise\n')
+
+    units = load_kilosort_units(folder)
+    assert len(units) == 1
+    unit = units[0]
+    assert unit['ind'] == 0
+    assert unit['channel'] == '11'
+    assert unit['polarity'] == 'neg'
+    assert unit['waveforms'].shape == (len(unit['times']), 82)
+    assert set(unit['classes']) == {0, 1}
+    assert np.all(unit['times'] <= 10 * 1000)
+
+    units = list(iter_kilosort_units(folder, groups=None))
+    assert [unit['ind'] for unit in units] == [0, 2]
+    assert units[1]['polarity'] == 'pos'
+
+    # Check finding unit spikes in small chunks & batches gives the same units
+    spike_clusters = np.load(folder / 'spike_clusters.npy')
+    chunked = list(iter_kilosort_units(folder, groups=None, chunk_size=7, batch_size=1))
+    for unit, chunked_unit in zip(units, chunked):
+        assert unit['ind'] == chunked_unit['ind']
+        assert len(unit['times']) == np.sum(spike_clusters == unit['ind'])
+        for field in ['times', 'waveforms', 'classes']:
+            assert np.array_equal(unit[field], chunked_unit[field])
+
+    files = save_units(iter_kilosort_units(folder), TEST_SORTING_PATH / 'kilosort')
+    assert files == ['times_chan_11_neg_u0.h5']
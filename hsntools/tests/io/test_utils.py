@@ -1,5 +1,10 @@
 """Tests for hsntools.io.utils"""
 
+import os
+import re
+
+from hsntools.tests.tsettings import TEST_FILE_PATH
+
 from hsntools.io.utils import *
 
 ###################################################################################################
@@ -105,12 +110,58 @@ def test_missing_files():
     out = missing_files(files, compare)
     assert out == ['session3.nwb']
 
+def test_hash_file():
+
+    with open(TEST_FILE_PATH / 'test_hash.txt', 'w') as tfile:
+        tfile.write('test')
+
+    file_hash = hash_file('test_hash.txt', TEST_FILE_PATH)
+    assert isinstance(file_hash, str)
+    assert file_hash == hash_file(TEST_FILE_PATH / 'test_hash.txt')
+
 def test_get_files():
 
     out = get_files('.')
     assert isinstance(out, list)
 
+    out = get_files(TEST_FILE_PATH, pattern='*.json', cache=True)
+    assert out and all(file.endswith('.json') for file in out)
+    assert out == get_files(TEST_FILE_PATH, pattern=re.compile(r'\.json$'), cache=True)
+
 def test_get_subfolders():
 
     out = get_subfolders('.')
     assert isinstance(out, list)
+
+def test_scan_folder():
+
+    folder = TEST_FILE_PATH / 'test_scan'
+    os.mkdir(folder)
+    assert scan_folder(folder, cache=True) == []
+
+    # Check the cached listing is updated when the folder changes
+    os.mkdir(folder / 'sub')
+    assert scan_folder(folder, cache=True) == [('sub', True)]
+
+    clear_folder_cache()
+
+def test_scan_folder_relative(monkeypatch):
+
+    folder = TEST_FILE_PATH / 'test_scan_relative'
+    os.makedirs(folder / 'sub', exist_ok=True)
+
+    # Check that a relative path is not served a cached listing of a different folder
+    monkeypatch.chdir(folder)
+    assert scan_folder('.', cache=True) == [('sub', True)]
+    monkeypatch.chdir(folder / 'sub')
+    assert scan_folder('.', cache=True) == []
+
+    clear_folder_cache()
+
+def test_walk_files():
+
+    files = list(walk_files(TEST_FILE_PATH.parent, pattern='*.json'))
+    assert files
+    for entry in files:
+        assert entry.name.endswith('.json')
+        assert entry.stat().st_size >= 0
@@ -29,3 +29,24 @@ def test_check_dependency():
         pass
     with raises(ImportError):
         subfunc_bad()
+
+def test_lazy_import():
+
+    np = lazy_import('numpy')
+    assert isinstance(np, LazyModule)
+    assert np
+    assert np.array([1, 2]).sum() == 3
+
+    sio = lazy_import('.io', 'scipy')
+    assert sio.loadmat
+
+    bad = lazy_import('bad')
+    assert not bad
+    with raises(ImportError):
+        bad.func
+
+    @check_dependency(bad, 'bad')
+    def subfunc_bad():
+        pass
+    with raises(ImportError):
+        subfunc_bad()
@@ -0,0 +1,70 @@
+"""Tests for hsntools.modutils.instrument."""
+
+import io
+import json
+
+from pytest import raises
+
+from hsntools.tests.tsettings import TEST_FILE_PATH
+
+from hsntools.modutils.instrument import *
+
+###################################################################################################
+###################################################################################################
+
+def test_measure():
+
+    sink = add_sink(MemorySink())
+    with measure('test_op') as record:
+        sum(range(1000))
+    remove_sink(sink)
+
+    assert sink.records[0]['name'] == 'test_op'
+    for label in ['wall_time', 'cpu_time', 'peak_rss', 'read_bytes', 'write_bytes']:
+        assert label in record
+    assert record['wall_time'] >= 0
+
+def test_instrument():
+
+    @instrument('test_func')
+    def subfunc(fail=False):
+        if fail:
+            raise ValueError('test error')
+        return 1
+
+    # Check the function runs with no sinks
+    assert subfunc() == 1
+
+    sink = add_sink(MemorySink())
+    assert subfunc() == 1
+    with raises(ValueError):
+        subfunc(fail=True)
+    clear_sinks()
+
+    summary = sink.summary()
+    assert summary['test_func']['calls'] == 2
+    assert summary['test_func']['errors'] == 1
+    sink.print_summary()
+
+def test_sinks():
+
+    file_path = TEST_FILE_PATH / 'test_instrument.log'
+    add_sink(JSONLinesSink(file_path))
+    add_sink(LogSink())
+    with measure('test_op'):
+        pass
+    clear_sinks()
+
+    with open(file_path) as jsonlines_file:
+        assert json.loads(jsonlines_file.readline())['name'] == 'test_op'
+
+def test_get_io_counters(monkeypatch):
+
+    import hsntools.modutils.instrument as instrument_module
+
+    # Check the '/proc/self/io' fallback uses the same storage counters as psutil
+    proc_io = 'rchar: 100\nwchar: 200\nread_bytes: 10\nwrite_bytes: 20\n'
+    monkeypatch.setattr(instrument_module, 'psutil', None)
+    monkeypatch.setattr(instrument_module, 'open', lambda *args: io.StringIO(proc_io),
+                        raising=False)
+    assert instrument_module._get_io_counters() == {'read_bytes' : 10, 'write_bytes' : 20}
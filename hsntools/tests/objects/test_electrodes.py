@@ -1,16 +1,62 @@
 """Tests for hsntools.objects.electrodes"""
 
 import os
+import pickle
+from copy import deepcopy
 
+import numpy as np
 import pandas as pd
+from pytest import raises
 
 from hsntools.tests.tsettings import TEST_FILE_PATH
 
+import hsntools.objects.electrodes as electrodes_module
 from hsntools.objects.electrodes import *
 
 ###################################################################################################
 ###################################################################################################
 
+class _OldBundle():
+    """Bundle, as defined before it was immutable, used to make old style pickles."""
+
+    __module__ = electrodes_module.__name__
+    __qualname__ = 'Bundle'
+
+    def __init__(self, probe, hemisphere=None, lobe=None, region=None,
+                 subregion=None, channels=None):
+        self.probe = probe
+        self.hemisphere = hemisphere
+        self.lobe = lobe
+        self.region = region
+        self.subregion = subregion
+        self.channels = channels
+
+
+class _OldElectrodes():
+    """Electrodes, as defined before it had a per-electrode table, used to make old pickles."""
+
+    __module__ = electrodes_module.__name__
+    __qualname__ = 'Electrodes'
+
+    def __init__(self, subject=None, fs=None):
+        self.subject = subject
+        self.fs = fs
+        self.bundles = []
+
+
+def _dump_old(obj, monkeypatch):
+    """Pickle an object with old style classes, under the names of the current classes."""
+
+    for old_class in [_OldBundle, _OldElectrodes]:
+        monkeypatch.setattr(electrodes_module, old_class.__qualname__, old_class)
+    dumped = pickle.dumps(obj)
+    monkeypatch.undo()
+
+    return dumped
+
+###################################################################################################
+###################################################################################################
+
 def test_bundle():
 
     bundle = Bundle('probe', 'hemisphere', 'lobe', 'region')
@@ -18,6 +64,62 @@ def test_bundle():
 
     bdict = bundle.to_dict()
     assert isinstance(bdict, dict)
+    assert bundle.to_dict() is bdict
+    assert bundle.to_tuple() == tuple(bdict.values())
+
+    with raises(AttributeError):
+        bundle.region = 'new_region'
+
+def test_bundle_eq_hash():
+
+    bundle1 = Bundle('probe', 'hemisphere', 'lobe', 'region', channels=[0, 1])
+    bundle2 = Bundle('probe', 'hemisphere', 'lobe', 'region', channels=(0, 1))
+    bundle3 = Bundle('probe', 'hemisphere', 'lobe', 'other_region')
+
+    assert bundle1 == bundle2
+    assert bundle1 != bundle3
+    assert len({bundle1, bundle2, bundle3}) == 2
+    assert deepcopy(bundle1) == bundle1
+    assert pickle.loads(pickle.dumps(bundle1)) == bundle1
+
+def test_bundle_to_dict_channels():
+
+    bundle = Bundle('probe', channels=(0, 1))
+    assert bundle.to_dict()['channels'] == [0, 1]
+
+def test_bundle_load_old_pickle(monkeypatch):
+
+    old_bundle = _OldBundle('probe', region='region', channels=[0, 1])
+    bundle = pickle.loads(_dump_old(old_bundle, monkeypatch))
+
+    assert bundle == Bundle('probe', region='region', channels=[0, 1])
+    assert bundle.to_dict()['channels'] == [0, 1]
+
+def test_electrodes_load_old_pickle(monkeypatch):
+
+    old_electrodes = _OldElectrodes('subject', 30000)
+    old_electrodes.bundles.append(_OldBundle('probe', region='region', channels=list(range(8))))
+    electrodes = pickle.loads(_dump_old(old_electrodes, monkeypatch))
+
+    assert electrodes.n_bundles == 1
+    assert electrodes.n_electrodes == 8
+    assert electrodes.to_dict()['region'] == ['region'] * 8
+    assert electrodes.lookup('region', 3) == 'region'
+
+def test_electrodes_load_old_pickle_empty(monkeypatch):
+
+    electrodes = pickle.loads(_dump_old(_OldElectrodes('subject', 30000), monkeypatch))
+
+    assert electrodes.n_bundles == 0
+    assert electrodes.n_electrodes == 0
+    assert electrodes.to_dict()['region'] == []
+    assert len(electrodes.table['pin']) == 0
+    with raises(ValueError):
+        electrodes.get_rows(0)
+
+    electrodes.add_bundle('probe', region='region', channels=list(range(8)))
+    assert electrodes.n_electrodes == 8
+    assert electrodes.lookup('region', 1) == 'region'
 
 def test_electrodes():
 
@@ -97,3 +199,33 @@ def test_electrodes_to_csv(telectrodes):
     test_fname = 'test_electrodes_csv'
     telectrodes.to_csv(test_fname, TEST_FILE_PATH)
     assert os.path.exists(TEST_FILE_PATH / (test_fname + '.csv'))
+
+def test_electrodes_table():
+
+    electrodes = Electrodes('subject', 30000)
+    electrodes.add_bundle('tname1', region='tregion1', channels=list(range(8)))
+    assert electrodes.n_electrodes == 8
+    electrodes.add_bundle('tname2', region='tregion2', channels=list(range(8, 16)))
+    assert electrodes.n_electrodes == 16
+
+    table = electrodes.table
+    assert len(table['region']) == 16
+    assert table['channel'].dtype == int
+    assert table['label'][8] == 'tname21'
+
+def test_electrodes_lookup():
+
+    electrodes = Electrodes('subject', 30000)
+    electrodes.add_bundle('tname1', region='tregion1', channels=list(range(8)))
+    electrodes.add_bundle('tname2', region='tregion2', channels=list(range(10, 18)))
+
+    rows = electrodes.get_rows(np.array([0, 10, 17]))
+    assert np.array_equal(rows, [0, 8, 15])
+    assert electrodes.get_rows(11) == 9
+
+    regions = electrodes.lookup('region', np.array([[0, 12], [7, 17]]))
+    assert regions.shape == (2, 2)
+    assert list(regions.ravel()) == ['tregion1', 'tregion2', 'tregion1', 'tregion2']
+
+    with raises(ValueError):
+        electrodes.get_rows([0, 9])
@@ -0,0 +1,86 @@
+"""Tests for hsntools.paths.catalog"""
+
+import os
+import shutil
+
+import pandas as pd
+
+from hsntools.tests.tsettings import TEST_PROJECT_PATH
+
+from hsntools.paths.create import create_session_directory
+from hsntools.paths.catalog import *
+
+###################################################################################################
+###################################################################################################
+
+def test_catalog():
+
+    project_path = TEST_PROJECT_PATH / 'test_catalog'
+    os.mkdir(project_path)
+    os.mkdir(project_path / 'nwb')
+    create_session_directory(project_path, 'sub1', 'exp', [0, 1], verbose=False)
+
+    sorting_path = project_path / 'recordings' / 'sub1' / 'exp' / 'session_0' / '02_processing'
+    with open(sorting_path / 'sorting' / 'test_sort.txt', 'w') as tfile:
+        tfile.write('sorting')
+    with open(project_path / 'nwb' / 'exp_sub1_session_1.nwb', 'w') as tfile:
+        tfile.write('nwb')
+
+    catalog_file = scan_project(project_path, verbose=False)
+    assert os.path.exists(catalog_file)
+
+    assert get_catalog_sessions(catalog_file) == \
+        [('sub1', 'exp', 'session_0'), ('sub1', 'exp', 'session_1')]
+    assert get_catalog_sessions(catalog_file, has='sorting') == [('sub1', 'exp', 'session_0')]
+    assert get_catalog_sessions(catalog_file, missing='nwb') == [('sub1', 'exp', 'session_0')]
+
+    files = get_session_files(catalog_file, 'sub1', 'exp', 0)
+    assert len(files) == 1
+    assert files[0]['folder'] == '02_processing/sorting'
+    assert files[0]['size'] == len('sorting')
+
+    # Test an incremental rescan picks up a new file
+    with open(sorting_path / 'task' / 'test_task.txt', 'w') as tfile:
+        tfile.write('task')
+    scan_project(project_path, catalog_file, verbose=False)
+    assert get_catalog_sessions(catalog_file, has=['sorting', 'task']) == \
+        [('sub1', 'exp', 'session_0')]
+
+    df = load_catalog(catalog_file)
+    assert isinstance(df, pd.DataFrame)
+    assert list(df['n_files']) == [2, 0]
+
+    # Test a full rescan drops files from removed folders, with an unchanged parent folder
+    os.mkdir(sorting_path / 'sorting' / 'chan_1')
+    with open(sorting_path / 'sorting' / 'chan_1' / 'a.h5', 'w') as tfile:
+        tfile.write('a')
+    scan_project(project_path, catalog_file, verbose=False)
+    assert len(get_session_files(catalog_file, 'sub1', 'exp', 0)) == 3
+    shutil.rmtree(sorting_path / 'sorting' / 'chan_1')
+    scan_project(project_path, catalog_file, full=True, verbose=False)
+    files = get_session_files(catalog_file, 'sub1', 'exp', 0)
+    assert 'a.h5' not in [file['name'] for file in files]
+    assert len(files) == 2
+
+def test_catalog_glob_characters():
+
+    project_path = TEST_PROJECT_PATH / 'test_catalog_glob'
+    os.mkdir(project_path)
+    create_session_directory(project_path, 'sub1', 'exp', [0, 1], verbose=False)
+
+    # Add folders with GLOB wildcard characters in their names
+    recordings_path = project_path / 'recordings' / 'sub1' / 'exp'
+    for session, folder in [('session_0', 'sort[1]'), ('session_1', 'sortX')]:
+        os.mkdir(recordings_path / session / '02_processing' / folder)
+        with open(recordings_path / session / '02_processing' / folder / 'test.txt', 'w') as tfile:
+            tfile.write('test')
+
+    catalog_file = scan_project(project_path, verbose=False)
+    assert get_catalog_sessions(catalog_file, has='sort[1]') == [('sub1', 'exp', 'session_0')]
+    assert get_catalog_sessions(catalog_file, has='sort?') == []
+    assert get_catalog_sessions(catalog_file, has='sort*') == []
+
+    # Test that a removed folder with wildcard characters is dropped from the catalog
+    shutil.rmtree(recordings_path / 'session_0' / '02_processing' / 'sort[1]')
+    scan_project(project_path, catalog_file, verbose=False)
+    assert get_catalog_sessions(catalog_file, has='sort[1]') == []
@@ -89,3 +89,33 @@ def test_create_session_directory_recursive():
 
     for session in sessions:
         assert os.path.exists(TEST_PROJECT_PATH / recordings_name / subject / task / session)
+
+def test_create_session_directories():
+
+    project_path = TEST_PROJECT_PATH / 'test_batch'
+    os.mkdir(project_path)
+    manifest = {'sub1' : {'exp1' : [0, 1], 'exp2' : 0}, 'sub2' : {'exp1' : ['session_0']}}
+
+    # Test a dry run does not create any folders
+    report = create_session_directories(project_path, manifest, dry_run=True, verbose=False)
+    assert report['created'] and not report['existing']
+    assert not os.path.exists(project_path / 'recordings')
+
+    report = create_session_directories(project_path, manifest, n_jobs=2, verbose=False)
+    for folder in report['created']:
+        assert os.path.isdir(folder)
+    for subdir, subfolders in SESSION_FOLDERS.items():
+        for subfolder in subfolders:
+            assert os.path.exists(project_path / 'recordings' / 'sub1' / 'exp2' / \
+                'session_0' / subdir / subfolder)
+
+    # Test re-running reports existing folders
+    report = create_session_directories(project_path, [('sub1', 'exp1', 0)], verbose=False)
+    assert not report['created'] and report['existing']
+
+def test_create_session_directories_new_project():
+
+    project_path = TEST_PROJECT_PATH / 'test_batch_new' / 'project'
+    report = create_session_directories(project_path, [('sub1', 'exp1', 0)], verbose=False)
+    assert os.path.isdir(project_path / 'recordings' / 'sub1' / 'exp1' / 'session_0')
+    assert all(os.path.isdir(folder) for folder in report['created'])
@@ -1,5 +1,7 @@
 """Tests for hsntools.paths.paths"""
 
+from pytest import raises
+
 from hsntools.tests.tsettings import TEST_PROJECT_PATH
 
 from hsntools.paths.paths import *
@@ -17,6 +19,12 @@ def test_paths():
     # Test with minimal info
     paths = Paths(TEST_PROJECT_PATH)
     assert paths
+    with raises(TypeError):
+        paths.session
+
+    # Test without a session, for which the session folder is labelled as 'session_None'
+    paths = Paths(TEST_PROJECT_PATH, subject, task)
+    assert paths.session == paths.experiment / 'session_None'
 
     # Test with all info
     paths = Paths(TEST_PROJECT_PATH, subject, task, session,
@@ -78,3 +86,27 @@ def paths_get_checks(paths):
         assert isinstance(files, list)
         subfolders = paths.get_subfolders(subdir)
         assert isinstance(subfolders, list)
+
+def test_paths_aliases():
+
+    paths = Paths(TEST_PROJECT_PATH, 'test_subject', 'test_task', 0)
+    assert paths.sorting == paths.session / '02_processing' / 'sorting'
+    assert paths.processing == paths.session / '02_processing'
+    assert paths.nwb == paths.project / 'nwb'
+
+    # Check that aliases are exact matches
+    with raises(ValueError):
+        paths.sort
+
+    # Check ambiguous aliases raise an error
+    session_folders = {'01_raw' : ['neural'], '02_processing' : ['neural']}
+    paths = Paths(TEST_PROJECT_PATH, 'test_subject', 'test_task', 0,
+                  session_folders=session_folders)
+    assert paths.raw
+    with raises(ValueError):
+        paths.neural
+
+    # Check that changing the project path updates aliases
+    paths.project = TEST_PROJECT_PATH / 'other'
+    assert paths.raw == TEST_PROJECT_PATH / 'other' / 'recordings' / \
+        'test_subject' / 'test_task' / 'session_0' / '01_raw'
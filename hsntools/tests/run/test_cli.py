@@ -0,0 +1,95 @@
+"""Tests for hsntools.run.cli"""
+
+import os
+import shutil
+
+import numpy as np
+
+from hsntools.tests.tsettings import TEST_PROJECT_PATH, TEST_SORTING_PATH, TEST_SORT
+
+from hsntools.io.h5 import save_to_h5file, open_h5file
+from hsntools.io.files import load_json
+from hsntools.paths.create import create_session_directory
+
+from hsntools.run.cli import *
+from hsntools.run.cli import _get_channel_sizes
+
+###################################################################################################
+###################################################################################################
+
+def test_make_parser():
+
+    parser = make_parser()
+    args = parser.parse_args(['extract-units', 'project', '--user', 'tst', '--jobs', '2'])
+    assert args.command == 'extract-units'
+    assert args.jobs == 2
+    assert args.polarity == ['neg', 'pos']
+
+def test_select_items():
+
+    items = ['exp_sub1_session_0', 'exp_sub1_session_1', 'exp_sub2_session_0']
+    assert select_items(items) == items
+    assert select_items(items, include=['*sub1*']) == items[:2]
+    assert select_items(items, exclude=['*session_0']) == items[1:2]
+
+def test_get_channel_sizes():
+
+    inventory = {'channel' : ['chan_1', 'chan_1', 'chan_1', 'chan_2'],
+                 'polarity' : ['neg', 'pos', 'neg', None],
+                 'user' : ['usr', 'usr', 'oth', None],
+                 'data_size' : [100, 100, 100, 50],
+                 'sort_size' : [10, 20, 30, 0]}
+
+    sizes = _get_channel_sizes(inventory, 'usr', ['neg', 'pos'])
+    assert sizes == {'chan_1' : 130, 'chan_2' : 0}
+    assert _get_channel_sizes(inventory, 'usr', ['neg']) == {'chan_1' : 110, 'chan_2' : 0}
+
+def test_main():
+
+    project_path = TEST_PROJECT_PATH / 'test_cli'
+    os.mkdir(project_path)
+    create_session_directory(project_path, 'sub1', 'exp', [0, 1], verbose=False)
+
+    assert main(['scan-project', str(project_path), '--missing', 'nwb', '--quiet']) == 0
+    assert os.path.exists(project_path / 'info' / 'catalog.db')
+
+    align_path = project_path / 'recordings' / 'sub1' / 'exp' / 'session_0' / \
+        '02_processing' / 'alignment'
+    sync_behav = np.arange(0, 100, 10.)
+    save_to_h5file({'behavioral' : sync_behav, 'neural' : 2 * sync_behav + 5},
+                   'sync', align_path)
+
+    # Session 1 has no sync file, so fails the alignment
+    assert main(['align', str(project_path), '--quiet']) == 1
+    alignment = load_json('alignment', align_path)
+    assert np.isclose(alignment['coef'], 2.)
+
+    # Re-run, excluding the failing session
+    assert main(['align', str(project_path), '--exclude', '*session_1', '--quiet']) == 0
+
+def test_main_extract_units():
+
+    project_path = TEST_PROJECT_PATH / 'test_cli_extract'
+    os.mkdir(project_path)
+    create_session_directory(project_path, 'sub1', 'exp', [0], verbose=False)
+
+    channel = 'chan_' + TEST_SORT['channel']
+    sorting_path = project_path / 'recordings' / 'sub1' / 'exp' / 'session_0' / \
+        '02_processing' / 'sorting'
+    shutil.copytree(TEST_SORTING_PATH / channel, sorting_path / channel)
+    manifest_file = sorting_path / 'units' / 'units_manifest.json'
+
+    args = ['extract-units', str(project_path), '--user', TEST_SORT['user'],
+            '--polarity', TEST_SORT['polarity'], '--quiet']
+    assert main(args) == 0
+    with open(manifest_file) as manifest:
+        n_entries = len(manifest.readlines())
+    assert n_entries == 1
+
+    # Check that a re-curated channel is re-extracted, despite the previous checkpoint
+    sort_folder = 'sort_{}_{}'.format(TEST_SORT['polarity'], TEST_SORT['user'])
+    with open_h5file('sort_cat', sorting_path / channel / sort_folder, mode='a') as h5file:
+        h5file.attrs['edited'] = True
+    assert main(args) == 0
+    with open(manifest_file) as manifest:
+        assert len(manifest.readlines()) == n_entries + 1
@@ -0,0 +1,51 @@
+"""Tests for hsntools.run.pipeline"""
+
+import os
+
+from hsntools.tests.tsettings import TEST_FILE_PATH, TEST_ERRORS_PATH
+
+from hsntools.run.pipeline import *
+
+###################################################################################################
+###################################################################################################
+
+def _step_pass(item):
+    pass
+
+def _step_fail(item):
+    if item == 'bad':
+        raise ValueError('test error')
+
+def test_run_pipeline():
+
+    steps = [('step1', _step_pass), ('step2', _step_fail), ('step3', _step_pass)]
+    checkpoint_file = TEST_FILE_PATH / 'test_checkpoint.json'
+
+    status = run_pipeline(steps, ['good', 'bad'], checkpoint_file, TEST_ERRORS_PATH,
+                          retries=1, verbose=False)
+    assert status['good'] == {'step1' : 'success', 'step2' : 'success', 'step3' : 'success'}
+    assert status['bad'] == {'step1' : 'success', 'step2' : 'failed', 'step3' : None}
+    assert os.path.exists(TEST_ERRORS_PATH / 'bad_step2.txt')
+
+    checkpoint = load_checkpoint(checkpoint_file)
+    assert checkpoint['bad']['step2']['attempts'] == 2
+    assert checkpoint['bad']['step2']['error'] == 'ValueError: test error'
+    assert checkpoint['good']['step2']['error'] is None
+
+    # Re-run, in parallel, with only failed & not-run steps re-running
+    status = run_pipeline(steps, ['good', 'bad', 'new'], checkpoint_file, n_jobs=2,
+                          verbose=False)
+    assert status['new']['step3'] == 'success'
+    checkpoint = load_checkpoint(checkpoint_file)
+    assert checkpoint['bad']['step2']['attempts'] == 1
+    assert checkpoint['bad']['step2']['error'] == 'ValueError: test error'
+
+def test_make_item_label():
+
+    assert make_item_label('session_0') == 'session_0'
+    assert make_item_label(('sub', 'exp', 0)) == 'sub,exp,0'
+
+    # Check that tuples with separators in their elements get different labels
+    assert make_item_label(('a_b', 'c')) != make_item_label(('a', 'b_c'))
+    assert make_item_label(('a,b', 'c')) != make_item_label(('a', 'b,c'))
+    assert make_item_label('a,b') != make_item_label(('a', 'b'))
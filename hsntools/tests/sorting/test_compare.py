@@ -0,0 +1,54 @@
+"""Tests for hsntools.sorting.compare"""
+
+import os
+
+import numpy as np
+
+from hsntools.tests.tsettings import TEST_SORTING_PATH, TEST_SORT
+
+from hsntools.io.h5 import save_to_h5file
+from hsntools.sorting.compare import *
+
+###################################################################################################
+###################################################################################################
+
+def test_compute_confusion_matrix():
+
+    index1 = np.array([0, 1, 2, 3, 4, 5])
+    labels1 = np.array([1, 1, 1, 2, 2, 0])
+    index2 = np.array([1, 2, 3, 4, 5, 6])
+    labels2 = np.array([3, 3, 4, 4, 4, 4])
+
+    confusion, clusters1, clusters2 = compute_confusion_matrix(index1, labels1, index2, labels2)
+    assert np.array_equal(clusters1, [0, 1, 2])
+    assert np.array_equal(clusters2, [3, 4])
+    assert np.array_equal(confusion, [[0, 1], [2, 0], [0, 2]])
+
+def test_compute_agreement():
+
+    confusion = np.array([[0, 1], [2, 0], [0, 2]])
+    agreement = compute_agreement(confusion, np.array([0, 1, 2]), np.array([3, 4]))
+    assert agreement['n_clusters1'] == 2
+    assert agreement['n_clusters2'] == 2
+    assert agreement['matches'] == [(1, 3), (2, 4)]
+    assert agreement['agreement'] == 0.8
+
+def test_compare_users():
+
+    # Add a second user's sorting, with one group relabeled as artifact
+    sort_path = TEST_SORTING_PATH / 'chan_test' / 'sort_neg_tu2'
+    os.mkdir(sort_path)
+    save_to_h5file({'groups' : np.array([[0, 0], [1, 1], [2, -1]]),
+                    'index' : np.array([0, 1, 2, 3, 4]),
+                    'classes' : np.array([0, 1, 2, 0, 1])}, 'sort_cat', sort_path)
+
+    users = [TEST_SORT['user'], 'tu2']
+    comparisons = compare_users(TEST_SORT['channel'], TEST_SORTING_PATH, 'neg', users)
+    comparison = comparisons[tuple(users)]
+    assert comparison['n_shared'] == 5
+    assert comparison['confusion'].sum() == 5
+    assert comparison['n_matched'] == 0
+
+    summary = compare_session_users(TEST_SORTING_PATH, users)
+    assert summary['channel'] == ['chan_test']
+    assert summary['n_shared'] == [5]
@@ -0,0 +1,56 @@
+"""Tests for hsntools.sorting.correlograms"""
+
+import numpy as np
+
+from hsntools.objects.electrodes import Electrodes
+
+from hsntools.sorting.correlograms import *
+
+###################################################################################################
+###################################################################################################
+
+def _brute_force_correlograms(times, bin_size, n_half):
+    """Compute correlograms by checking all pairs of spikes."""
+
+    n_units = len(times)
+    correlograms = np.zeros([n_units, n_units, 2 * n_half], dtype=int)
+    for ind1 in range(n_units):
+        for ind2 in range(n_units):
+            lags = (times[ind2][None, :] - times[ind1][:, None]).ravel()
+            if ind1 == ind2:
+                lags = lags[~np.eye(len(times[ind1]), dtype=bool).ravel()]
+            lags = lags[np.abs(lags) < n_half * bin_size]
+            np.add.at(correlograms[ind1, ind2], n_half + lags // bin_size, 1)
+
+    return correlograms
+
+def test_compute_correlograms():
+
+    rng = np.random.default_rng(0)
+    times = [np.sort(rng.integers(0, 2000, n_spikes)) for n_spikes in [100, 50, 0, 80]]
+
+    correlograms, bins = compute_correlograms(times, 5, 50)
+    assert correlograms.shape == (4, 4, 20)
+    assert len(bins) == 21
+    assert bins[0] == -50 and bins[-1] == 50
+    assert np.array_equal(correlograms, _brute_force_correlograms(times, 5, 10))
+
+    # Check with times converted to samples
+    correlograms_fs, _ = compute_correlograms([cur / 10 for cur in times], 0.5, 5, fs=10)
+    assert np.array_equal(correlograms, correlograms_fs)
+
+def test_compute_unit_correlograms():
+
+    rng = np.random.default_rng(0)
+    units = [{'channel' : 'chan_{}'.format(chan), 'times' : np.sort(rng.uniform(0, 1000, 50))} \
+        for chan in [0, 1, 8, 9, 10]]
+
+    electrodes = Electrodes()
+    electrodes.add_bundle('b1', channels=list(range(8)))
+    electrodes.add_bundle('b2', channels=list(range(8, 16)))
+
+    correlograms, bins = compute_unit_correlograms(units, 1., 20., fs=32,
+                                                   electrodes=electrodes, n_jobs=2)
+    assert correlograms['b1']['units'] == [0, 1]
+    assert correlograms['b1']['correlograms'].shape == (2, 2, 40)
+    assert correlograms['b2']['correlograms'].shape == (3, 3, 40)
@@ -0,0 +1,45 @@
+"""Tests for hsntools.sorting.duplicates"""
+
+import numpy as np
+
+from hsntools.objects.electrodes import Electrodes
+
+from hsntools.sorting.duplicates import *
+
+###################################################################################################
+###################################################################################################
+
+def test_count_coincidences():
+
+    times = [np.array([1., 5., 10.]), np.array([1.2, 7., 10.1]), np.array([20.])]
+    coincidences = count_coincidences(times, 0.5)
+    assert np.array_equal(coincidences, [[0, 2, 0], [2, 0, 0], [0, 0, 0]])
+
+def test_find_duplicate_units(tunits_list):
+
+    duplicates = find_duplicate_units(tunits_list)
+    pairs = list(zip(duplicates['unit1'], duplicates['unit2']))
+    assert (0, 1) in pairs and (0, 3) in pairs and (1, 3) in pairs
+    assert (0, 5) not in pairs
+    assert not any(4 in pair for pair in pairs)
+
+    electrodes = Electrodes()
+    electrodes.add_bundle('b1', channels=list(range(8)))
+    electrodes.add_bundle('b2', channels=list(range(8, 16)))
+
+    duplicates = find_duplicate_units(tunits_list, electrodes, n_jobs=2)
+    assert list(zip(duplicates['unit1'], duplicates['unit2'])) == [(0, 1)]
+    assert duplicates['bundle'] == ['b1']
+    assert duplicates['n_coincident'][0] == 80
+    assert duplicates['n_expected'][0] < 20
+
+def test_find_duplicate_units_excess():
+
+    # Dense, independent units have many coincidences by chance, which are not in excess
+    rng = np.random.default_rng(0)
+    units = [{'channel' : 'chan_{}'.format(ind), 'times' : np.sort(rng.uniform(0, 1000, 2000))}
+             for ind in range(2)]
+
+    duplicates = find_duplicate_units(units, min_fraction=0.5)
+    assert not duplicates['unit1']
+    assert find_duplicate_units(units, min_fraction=0.)['n_coincident'][0] > 0.5 * 2000
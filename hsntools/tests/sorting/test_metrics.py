@@ -0,0 +1,43 @@
+"""Tests for hsntools.sorting.metrics"""
+
+import numpy as np
+
+from hsntools.sorting.utils import concatenate_units
+
+from hsntools.sorting.metrics import *
+
+###################################################################################################
+###################################################################################################
+
+def test_compute_unit_metrics(tunits_list):
+
+    units = concatenate_units(tunits_list)
+    times, index, waveforms = units['times'], units['index'], units['waveforms']
+    metrics = compute_unit_metrics(times, index, time_range=[0, 1000])
+
+    assert np.array_equal(metrics['n_spikes'], [100, 80, 3, 60, 0, 200])
+    assert np.allclose(metrics['firing_rate'], [0.1, 0.08, 0.003, 0.06, 0, 0.2])
+    assert metrics['isi_violations'][0] == 0
+    assert metrics['isi_violations'][2] == 0.5
+    assert np.isnan(metrics['isi_violations'][4])
+    assert metrics['presence_ratio'][0] == 1.
+    assert metrics['presence_ratio'][2] == 0.02
+    assert 0.4 < metrics['presence_ratio'][5] <= 0.5
+    assert 'snr' not in metrics
+
+    metrics = compute_unit_metrics(times, index, waveforms, chunk_size=33)
+    valid = [0, 1, 2, 3, 5]
+    assert np.all(metrics['snr'][valid] > 10)
+    assert np.isnan(metrics['snr'][4])
+    assert np.all((metrics['amplitude_cutoff'][valid] >= 0) & \
+                  (metrics['amplitude_cutoff'][valid] <= 0.5))
+
+def test_compute_unit_metrics_parallel(tunits_list):
+
+    units = concatenate_units(tunits_list)
+    times, index, waveforms = units['times'], units['index'], units['waveforms']
+    metrics = compute_unit_metrics(times, index, waveforms, time_range=[0, 1000])
+    metrics_par = compute_unit_metrics(times, index, waveforms, time_range=[0, 1000], n_jobs=2)
+
+    for label in metrics:
+        assert np.allclose(metrics[label], metrics_par[label], equal_nan=True)
@@ -1,9 +1,17 @@
 """Tests for hsntools.sorting.process"""
 
+import os
+
+import h5py
 import numpy as np
+from pytest import raises
 
 from hsntools.tests.tsettings import TEST_SORTING_PATH, TEST_SORT
 
+from hsntools.io.h5 import save_to_h5file, open_h5file
+from hsntools.io.files import save_jsonlines
+from hsntools.io.sorting import (load_combinato_spike_file, load_combinato_sorting_file,
+                                  load_units)
 from hsntools.sorting.process import *
 
 ###################################################################################################
@@ -54,3 +62,144 @@ def test_process_combinato_data():
     process_combinato_data(TEST_SORT['channel'], TEST_SORTING_PATH,
                            TEST_SORT['polarity'], TEST_SORT['user'],
                            TEST_SORTING_PATH / 'units')
+
+    process_combinato_data(TEST_SORT['channel'], TEST_SORTING_PATH,
+                           TEST_SORT['polarity'], TEST_SORT['user'],
+                           TEST_SORTING_PATH / 'units', lazy_waveforms=True)
+
+    # Test extracting both polarities in one pass
+    assert process_combinato_data(TEST_SORT['channel'], TEST_SORTING_PATH, ['neg', 'pos'],
+                                  TEST_SORT['user'], TEST_SORTING_PATH / 'units', verbose=False)
+
+def test_collect_all_sorting_h5():
+
+    spike_data = load_combinato_spike_file(TEST_SORT['channel'], TEST_SORTING_PATH,
+                                           TEST_SORT['polarity'])
+    sort_data = load_combinato_sorting_file(TEST_SORT['channel'], TEST_SORTING_PATH,
+                                            TEST_SORT['polarity'], TEST_SORT['user'])
+    out = collect_all_sorting(spike_data, sort_data)
+
+    lazy_data = load_combinato_spike_file(TEST_SORT['channel'], TEST_SORTING_PATH,
+                                          TEST_SORT['polarity'], lazy_waveforms=True)
+    try:
+        out_lazy = collect_all_sorting(lazy_data, sort_data)
+    finally:
+        lazy_data['waveforms'].file.close()
+
+    assert np.array_equal(out['waveforms'], out_lazy['waveforms'])
+    assert np.array_equal(out['times'], out_lazy['times'])
+
+def test_process_combinato_data_incremental():
+
+    units_folder = TEST_SORTING_PATH / 'units_incremental'
+    os.mkdir(units_folder)
+
+    args = [TEST_SORT['channel'], TEST_SORTING_PATH, TEST_SORT['polarity'], TEST_SORT['user'],
+            units_folder]
+    assert process_combinato_data(*args, incremental=True, verbose=False)
+    assert not process_combinato_data(*args, incremental=True, verbose=False)
+
+    # Mark an input as changed, with a stale units file, which should be re-extracted & removed
+    manifest = load_manifest(units_folder)
+    label, entry = list(manifest.items())[0]
+    for record in entry['inputs'].values():
+        record['size'] = -1
+    save_to_h5file({'times' : np.array([1, 2])}, 'times_chan_stale_u99', units_folder)
+    entry['units'].append('times_chan_stale_u99.h5')
+    save_jsonlines([{label : entry}], MANIFEST_NAME, units_folder)
+
+    assert process_combinato_data(*args, incremental=True, verbose=False)
+    assert not os.path.exists(units_folder / 'times_chan_stale_u99.h5')
+    assert not process_combinato_data(*args, incremental=True, verbose=False)
+
+def test_process_combinato_data_polarities():
+
+    units_folder = TEST_SORTING_PATH / 'units_polarities'
+    os.mkdir(units_folder)
+
+    args = [TEST_SORT['channel'], TEST_SORTING_PATH, ['neg', 'pos'], TEST_SORT['user'],
+            units_folder]
+    assert process_combinato_data(*args, incremental=True, verbose=False)
+
+    # Check units from both polarities are kept, including any with the same unit index
+    units = load_units(units_folder)
+    for polarity in ['neg', 'pos']:
+        sort_data = load_combinato_sorting_file(TEST_SORT['channel'], TEST_SORTING_PATH,
+                                                polarity, TEST_SORT['user'])
+        n_units = len(set(collect_all_sorting(\
+            load_combinato_spike_file(TEST_SORT['channel'], TEST_SORTING_PATH, polarity),
+            sort_data)['clusters']))
+        assert sum(unit['polarity'] == polarity for unit in units) == n_units
+
+    # Check that re-extracting one polarity does not remove the other polarity's units
+    manifest = load_manifest(units_folder)
+    label = 'chan_{}_neg_{}'.format(TEST_SORT['channel'], TEST_SORT['user'])
+    entry = manifest[label]
+    for record in entry['inputs'].values():
+        record['size'] = -1
+    save_jsonlines([{label : entry}], MANIFEST_NAME, units_folder)
+
+    assert process_combinato_data(*args, incremental=True, verbose=False)
+    assert len(load_units(units_folder)) == len(units)
+
+def test_process_combinato_data_hashes(monkeypatch):
+
+    import hsntools.sorting.process as process
+    hashed = []
+    hash_file = process.hash_file
+    def count_hash(file_path, *args, **kwargs):
+        hashed.append(file_path)
+        return hash_file(file_path, *args, **kwargs)
+    monkeypatch.setattr(process, 'hash_file', count_hash)
+
+    units_folder = TEST_SORTING_PATH / 'units_hashes'
+    os.mkdir(units_folder)
+
+    args = [TEST_SORT['channel'], TEST_SORTING_PATH, ['neg', 'pos'], TEST_SORT['user'],
+            units_folder]
+
+    # Check each input file, including the shared spike data file, is hashed once
+    assert process_combinato_data(*args, incremental=True, verbose=False)
+    assert len(hashed) == len(set(hashed))
+
+    # Check that inputs with an unchanged size & modification time are not re-hashed
+    hashed.clear()
+    assert not process_combinato_data(*args, incremental=True, verbose=False)
+    assert not hashed
+
+def test_process_combinato_data_legacy_units():
+
+    units_folder = TEST_SORTING_PATH / 'units_legacy'
+    os.mkdir(units_folder)
+
+    # Add units files with legacy names, for the test channel and another channel
+    legacy_file = 'times_chan_{}_u0.h5'.format(TEST_SORT['channel'])
+    save_to_h5file({'times' : np.array([1, 2])}, legacy_file, units_folder)
+    save_to_h5file({'times' : np.array([1, 2])}, 'times_chan_other_u0.h5', units_folder)
+
+    args = [TEST_SORT['channel'], TEST_SORTING_PATH, ['neg', 'pos'], TEST_SORT['user'],
+            units_folder]
+    assert process_combinato_data(*args, verbose=False)
+    assert not os.path.exists(units_folder / legacy_file)
+    assert os.path.exists(units_folder / 'times_chan_other_u0.h5')
+
+def test_process_combinato_data_missing_polarity():
+
+    input_folder = TEST_SORTING_PATH / 'missing_polarity'
+    chan_folder = input_folder / 'chan_{}'.format(TEST_SORT['channel'])
+    os.makedirs(chan_folder)
+    with open_h5file('data_chan_{}.h5'.format(TEST_SORT['channel']), chan_folder,
+                     mode='w') as h5file:
+        dgroup = h5file.create_group('neg')
+        dgroup.create_dataset('times', data=np.ones(5), dtype='f')
+        dgroup.create_dataset('spikes', data=np.ones([5, 64]), dtype='f')
+        dgroup.create_dataset('artifacts', data=np.ones(5), dtype='i')
+
+    n_open = len(h5py.h5f.get_obj_ids(types=h5py.h5f.OBJ_FILE))
+    for polarities in [['pos'], ['neg', 'pos']]:
+        args = [TEST_SORT['channel'], input_folder, polarities, TEST_SORT['user'], input_folder]
+        with raises(ValueError, match='pos'):
+            process_combinato_data(*args, verbose=False, lazy_waveforms=True)
+        assert len(h5py.h5f.get_obj_ids(types=h5py.h5f.OBJ_FILE)) == n_open
+        assert not process_combinato_data(*args, verbose=False, lazy_waveforms=True,
+                                          continue_on_fail=True)
@@ -55,3 +55,13 @@ def test_extract_clusters():
         assert cluster['waveforms'].shape[0] == counts[cluster['ind']]
         assert np.array_equal(cluster['times'],
                               sdata['times'][sdata['clusters'] == cluster['ind']])
+
+def test_concatenate_units(tunits):
+
+    units = [tunits, tunits]
+    out = concatenate_units(units)
+    n_spikes = len(tunits['times'])
+    assert np.array_equal(out['index'], np.array([n_spikes, 2 * n_spikes]))
+    assert len(out['times']) == 2 * n_spikes
+    assert out['waveforms'].shape == (2 * n_spikes, 64)
+    assert len(out['channel']) == len(units)
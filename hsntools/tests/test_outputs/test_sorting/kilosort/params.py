@@ -0,0 +1,2 @@
+dat_path = 'data.bin'
+sample_rate = 30000.
@@ -2,14 +2,16 @@
 
 import numpy as np
 
-from hsntools.modutils.dependencies import safe_import, check_dependency
+from hsntools.modutils.instrument import instrument
+from hsntools.modutils.dependencies import lazy_import, check_dependency
 
-sklearn = safe_import('sklearn')
-stats = safe_import('.stats', 'scipy')
+sklearn = lazy_import('sklearn')
+stats = lazy_import('.stats', 'scipy')
 
 ###################################################################################################
 ###################################################################################################
 
+@instrument()
 @check_dependency(sklearn, 'sklearn')
 def fit_sync_alignment(sync_behav, sync_neural, score_thresh=0.9999,
                        ignore_poor_alignment=False, return_model=False, verbose=False):
@@ -120,6 +122,7 @@ def predict_times_model(times, model):
     return model.predict(times.reshape(-1, 1))
 
 
+@instrument()
 @check_dependency(stats, 'scipy')
 def match_pulses(sync_behav, sync_neural, n_pulses, start_offset=None):
     """Match pulses to each other based on ISIs.
@@ -3,13 +3,15 @@
 import numpy as np
 
 from hsntools.timestamps.utils import convert_samples_to_time
-from hsntools.modutils.dependencies import safe_import, check_dependency
+from hsntools.modutils.instrument import instrument
+from hsntools.modutils.dependencies import lazy_import, check_dependency
 
-signal = safe_import('.signal', 'scipy')
+signal = lazy_import('.signal', 'scipy')
 
 ###################################################################################################
 ###################################################################################################
 
+@instrument()
 @check_dependency(signal, 'scipy')
 def detect_peaks(data, fs, height, distance=None, thresh=None):
     """Process peaks from a time series.
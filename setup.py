@@ -52,6 +52,9 @@ setup(
     download_url = 'https://github.com/HSNPipeline/hsntools/releases',
     keywords = ['neuroscience', 'single units', 'data management', 'neurodata without borders'],
     install_requires = install_requires,
+    entry_points = {
+        'console_scripts' : ['hsntools = hsntools.run.cli:main'],
+    },
     tests_require = ['pytest'],
     extras_require = {
         'plot' : ['matplotlib'],